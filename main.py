@@ -2,6 +2,7 @@ from src.http.http_server import http_server
 import traceback
 from src.http.routes.routeable import routeable
 from src.http.routes.mantella_route import mantella_route
+from src.http.routes.timeline_route import timeline_route
 import logging
 from src.setup import MantellaSetup
 from src.ui.start_ui import StartUI
@@ -28,7 +29,8 @@ def main():
             show_debug_messages=should_debug_http
         )
         ui = StartUI(config)
-        routes: list[routeable] = [conversation, ui]
+        timeline = timeline_route(config)
+        routes: list[routeable] = [conversation, ui, timeline]
         
         mantella_http_server.start(int(config.port), routes, config.play_startup_sound, should_debug_http)
 
@@ -193,6 +193,9 @@ class ConfigLoader:
             self.lip_generation = self.__definitions.get_string_value("lip_generation").strip().lower()
             self.fast_response_mode = self.__definitions.get_bool_value("fast_response_mode")
             self.fast_response_mode_volume = self.__definitions.get_int_value("fast_response_mode_volume")
+            self.early_clause_cut = self.__definitions.get_bool_value("early_clause_cut")
+            self.early_clause_cut_min_words = self.__definitions.get_int_value("early_clause_cut_min_words")
+            self.tts_parallel_workers = self.__definitions.get_int_value("tts_parallel_workers")
 
             #Added from xTTS implementation
             self.xtts_default_model = self.__definitions.get_string_value("xtts_default_model")
@@ -253,6 +256,16 @@ class ConfigLoader:
 LLM parameter list must follow the Python dictionary format: https://www.w3schools.com/python/python_dictionaries.asp""")
                 self.llm_params = None
 
+            self.llm_backup_endpoints: list[tuple[str, str]] = []
+            for line in self.__definitions.get_string_value("llm_backup_endpoints").splitlines():
+                if line.strip():
+                    api, _, model = line.partition('|')
+                    self.llm_backup_endpoints.append((api.strip(), model.strip()))
+            self.llm_hedge_delay = self.__definitions.get_float_value("llm_hedge_delay")
+            self.cache_friendly_prompt: bool = self.__definitions.get_bool_value("cache_friendly_prompt")
+            self.llm_response_cache: bool = self.__definitions.get_bool_value("llm_response_cache")
+            self.llm_response_cache_size: int = self.__definitions.get_int_value("llm_response_cache_size")
+
             # self.stop_llm_generation_on_assist_keyword: bool = self.__definitions.get_bool_value("stop_llm_generation_on_assist_keyword")
 
             self.narration_handling: NarrationHandlingEnum = self.__definitions.get_enum_value("narration_handling", NarrationHandlingEnum)
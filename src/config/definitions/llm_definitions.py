@@ -100,6 +100,39 @@ class LLMDefinitions:
 
     #LLM output parsing options
 
+    @staticmethod
+    def get_llm_backup_endpoints_config_value() -> ConfigValue:
+        description = """Backup LLMs to use when the main LLM is slow to respond or not available, one per line in the form `<LLM Service> | <Model>`, e.g. `KoboldCpp | local-model`.
+                        If the main LLM has not started its reply within the hedge delay, the request is also sent to the first backup, and so on. Whichever starts its reply first is used and the other requests are cancelled.
+                        Over time, the LLM that usually starts its reply the fastest is tried first.
+                        Leave empty to only use the main LLM."""
+        return ConfigValueString("llm_backup_endpoints", "Backup LLMs", description, "", tags=[ConfigValueTag.advanced])
+    
+    @staticmethod
+    def get_llm_hedge_delay_config_value() -> ConfigValue:
+        description = """Time to wait (in seconds) for an LLM to start its reply before the request is also sent to the next backup LLM.
+                        Only used if backup LLMs are set."""
+        return ConfigValueFloat("llm_hedge_delay", "Hedge Delay", description, 1.5, 0.1, 60, tags=[ConfigValueTag.advanced])
+    
+    @staticmethod
+    def get_cache_friendly_prompt_config_value() -> ConfigValue:
+        description = """Keeps the main prompt the same for the whole conversation so that LLM services supporting prompt caching can reuse it, which makes replies faster and cheaper.
+                        Prompt lines that change during a conversation (time, weather, location, trust and equipment) are sent in a separate short message after the latest messages instead.
+                        The share of prompt tokens served from the cache is logged after each reply, if the LLM service reports it."""
+        return ConfigValueBool("cache_friendly_prompt", "Cache Friendly Prompt", description, False, tags=[ConfigValueTag.advanced])
+    
+    @staticmethod
+    def get_llm_response_cache_config_value() -> ConfigValue:
+        description = """Stores the replies to summaries and vision descriptions on disk and reuses them when exactly the same request is sent again 
+                        (e.g. when the same conversation is reloaded or memories are summarized again), instead of asking the LLM again.
+                        NPC replies during a conversation are never reused."""
+        return ConfigValueBool("llm_response_cache", "Reuse LLM Responses", description, False, tags=[ConfigValueTag.advanced, ConfigValueTag.share_row])
+    
+    @staticmethod
+    def get_llm_response_cache_size_config_value() -> ConfigValue:
+        description = """The disk space (in MB) stored LLM replies may take up. Once it is full, the replies that have not been reused for the longest time are removed."""
+        return ConfigValueInt("llm_response_cache_size", "Response Cache Size (MB)", description, 50, 1, 10000, tags=[ConfigValueTag.advanced, ConfigValueTag.share_row])
+    
     @staticmethod
     def get_narration_handling() -> ConfigValue:
         description = """How to handle narrations in the output of the LLM.
@@ -91,6 +91,25 @@ If you have trouble installing the xVASynth version from Nexus, try installing i
         description = """Adjust the volume of the first delivered voiceline (from 1-100) if Fast Response Mode is enabled."""
         return ConfigValueInt("fast_response_mode_volume","Fast Response Mode Volume", description, 40, 1, 100, tags=[ConfigValueTag.advanced,ConfigValueTag.share_row])
     
+    @staticmethod
+    def get_early_clause_cut_config_value() -> ConfigValue:
+        description = """Whether to voice the first line of every response as soon as the first clause (up to a comma or dash) is complete, instead of waiting for the end of the whole sentence.
+                        Enable this setting to improve response times, especially for models that write long sentences."""
+        return ConfigValueBool("early_clause_cut","Early Clause Cut", description, False, tags=[ConfigValueTag.advanced,ConfigValueTag.share_row])
+    
+    @staticmethod
+    def get_early_clause_cut_min_words_config_value() -> ConfigValue:
+        description = """Minimum number of words the first clause needs to have before it is cut early if Early Clause Cut is enabled.
+                        Never lower than 'Number of Words TTS'."""
+        return ConfigValueInt("early_clause_cut_min_words","Early Clause Cut Min Words", description, 4, 1, 999, tags=[ConfigValueTag.advanced,ConfigValueTag.share_row])
+    
+    @staticmethod
+    def get_tts_parallel_workers_config_value() -> ConfigValue:
+        description = """How many voicelines of different speakers can be synthesized at the same time in group conversations.
+                        Each additional worker runs its own instance of the TTS service, so every speaker can keep their voice model loaded instead of swapping models on every line.
+                        Only supported by Piper. Each worker needs additional memory."""
+        return ConfigValueInt("tts_parallel_workers","Parallel TTS Workers", description, 1, 1, 4, tags=[ConfigValueTag.advanced])
+    
     # XTTS Section
 
     @staticmethod
@@ -47,6 +47,11 @@ class MantellaConfigValueDefinitionsNew:
         llm_category.add_config_value(LLMDefinitions.get_wait_time_buffer_config_value())
         # llm_category.add_config_value(LLMDefinitions.get_try_filter_narration())
         llm_category.add_config_value(LLMDefinitions.get_llm_params_config_value())
+        llm_category.add_config_value(LLMDefinitions.get_llm_backup_endpoints_config_value())
+        llm_category.add_config_value(LLMDefinitions.get_llm_hedge_delay_config_value())
+        llm_category.add_config_value(LLMDefinitions.get_cache_friendly_prompt_config_value())
+        llm_category.add_config_value(LLMDefinitions.get_llm_response_cache_config_value())
+        llm_category.add_config_value(LLMDefinitions.get_llm_response_cache_size_config_value())
         # llm_category.add_config_value(LLMDefinitions.get_stop_llm_generation_on_assist_keyword())
         llm_category.add_config_value(LLMDefinitions.get_narration_handling())
         llm_category.add_config_value(LLMDefinitions.get_narrator_voice())
@@ -68,6 +73,9 @@ class MantellaConfigValueDefinitionsNew:
         tts_category.add_config_value(TTSDefinitions.get_lip_generation_config_value())
         tts_category.add_config_value(TTSDefinitions.get_fast_response_mode_config_value())
         tts_category.add_config_value(TTSDefinitions.get_fast_response_mode_volume_config_value())
+        tts_category.add_config_value(TTSDefinitions.get_early_clause_cut_config_value())
+        tts_category.add_config_value(TTSDefinitions.get_early_clause_cut_min_words_config_value())
+        tts_category.add_config_value(TTSDefinitions.get_tts_parallel_workers_config_value())
         tts_category.add_config_value(TTSDefinitions.get_xtts_url_config_value())
         tts_category.add_config_value(TTSDefinitions.get_xtts_default_model_config_value())
         tts_category.add_config_value(TTSDefinitions.get_xtts_device_config_value())
@@ -1,4 +1,5 @@
 import logging
+import re
 from typing import Any, Hashable
 from src.conversation.action import Action
 from src.http.communication_constants import communication_constants
@@ -16,6 +17,11 @@ class Context:
     """Holds the context of a conversation
     """
     TOKEN_LIMIT_PERCENT: float = 0.45
+    # prompt variables that change during a conversation. In cache-friendly mode, lines using them are moved out of the system prompt into the situation
+    VOLATILE_PROMPT_VARIABLES: list[str] = ["trust", "equipment", "player_equipment", "location", "weather", "time", "time_group"]
+    __VOLATILE_PROMPT_VARIABLE_REG = re.compile(r"\{(" + "|".join(VOLATILE_PROMPT_VARIABLES) + r")\}")
+    # lines filled with these always stay in the system prompt, even if they also use a volatile variable
+    __PREFIX_PROMPT_VARIABLE_REG = re.compile(r"\{(bio|bios|conversation_summary|conversation_summaries|actions)\}")
 
     @utils.time_it
     def __init__(self, world_id: str, config: ConfigLoader, client: LLMClient, rememberer: Remembering, language: dict[Hashable, str]) -> None:
@@ -34,6 +40,7 @@ class Context:
         self.__vision_hints: str = ''
         self.__have_actors_changed: bool = False
         self.__game: GameEnum = config.game
+        self.__situation: str = ""
 
         self.__prev_location: str | None = None
         if self.__game.base_game == GameEnum.FALLOUT4:
@@ -69,6 +76,12 @@ class Context:
     def location(self, value: str):
         self.__location = value
 
+    @property
+    def situation(self) -> str:
+        """The volatile parts of the last generated prompt (time, weather, location, ...). Only set in cache-friendly prompt mode
+        """
+        return self.__situation
+
     @property
     def ingame_time(self) -> int:
         return self.__ingame_time
@@ -243,6 +256,26 @@ class Context:
                 trust = self.__get_trust(npc)
                 self.__ingame_events.append(f"{player_name} is now {trust} to {npc.name}.")
     
+    @staticmethod
+    def split_volatile_prompt(prompt: str) -> tuple[str, str]:
+        """Splits a prompt into the lines that stay the same for the whole conversation and the lines that use volatile variables.
+        Lines that also contain bios, summaries or actions are kept with the stable lines
+
+        Args:
+            prompt (str): The unfilled prompt
+
+        Returns:
+            tuple[str, str]: The stable and the volatile lines of the prompt
+        """
+        stable_lines: list[str] = []
+        volatile_lines: list[str] = []
+        for line in prompt.splitlines():
+            if Context.__VOLATILE_PROMPT_VARIABLE_REG.search(line) and not Context.__PREFIX_PROMPT_VARIABLE_REG.search(line):
+                volatile_lines.append(line.strip())
+            else:
+                stable_lines.append(line)
+        return "\n".join(stable_lines), "\n".join(volatile_lines)
+
     @staticmethod
     def format_listing(listing: list[str]) -> str:
         """Returns a list of string concatenated by ',' and 'and' to be used in a text
@@ -410,6 +443,25 @@ class Context:
         conversation_summaries = self.__rememberer.get_prompt_text(self.get_characters_excluding_player(), self.__world_id)
         actions = self.__get_action_texts(actions_for_prompt)
 
+        situation_prompt = ""
+        if self.__config.cache_friendly_prompt: # keep the system prompt an unchanging prefix that LLM providers can cache
+            prompt, situation_prompt = Context.split_volatile_prompt(prompt)
+        self.__situation = situation_prompt.format(
+            player_name = player_name,
+            player_description = player_description,
+            player_equipment = player_equipment,
+            name=name,
+            names=names,
+            names_w_player = names_w_player,
+            trust=trusts,
+            equipment = equipment,
+            location=location,
+            weather = weather,
+            time=time,
+            time_group=time_group,
+            language=self.__language['language'],
+            ).strip() if situation_prompt else ""
+
         removal_content: list[tuple[str, str]] = [(bios, conversation_summaries),(bios,""),("","")]
         have_bios_been_dropped = False
         have_summaries_been_dropped = False
@@ -0,0 +1,219 @@
+import bisect
+import itertools
+import logging
+from threading import Lock, Thread
+from typing import Callable
+from src.config.config_loader import ConfigLoader
+from src.llm.message_thread import message_thread
+from src.llm.messages import Message
+
+class ContextCompactor:
+    """Summarizes parts of a conversation in the background, while the conversation carries on.
+
+    Checkpoints save a summary of the completed messages every so often and leave them in the message_thread,
+    so that a crash loses at most the latest chunk and the summary at the end of the conversation only has to cover what is left.
+    Compactions summarize the oldest messages and, once the summary has been saved, swap them out of the message_thread between turns.
+    This keeps long conversations from ever reaching the stop-the-world reload at the end of the context window.
+    Messages are only ever summarized once, whichever of the two gets to them first. Messages a failed checkpoint or compaction could not save stay unsummarized,
+    so the next one or the summary at the end of the conversation picks them up.
+    Both only save summaries, the compactor keeps the messages it swaps out so the whole conversation can still be logged at the end
+    """
+    MIN_MESSAGES_TO_COMPACT: int = 5 # summaries are only written for at least this many messages
+    MIN_MESSAGES_TO_KEEP: int = 2 # the latest exchange is never summarized early, it may still be receiving sentences
+
+    def __init__(self, config: ConfigLoader) -> None:
+        self.__config: ConfigLoader = config
+        self.__lock = Lock()
+        self.__thread: Thread | None = None
+        self.__summarized: set[Message] = set() # the original messages that have already been saved in a summary
+        self.__saving: set[Message] = set() # the original messages the running checkpoint or compaction is saving
+        self.__compacted: list[Message] | None = None # snapshots of the messages that have been summarized but not yet swapped out
+        self.__swapped_out: list[Message] = [] # snapshots of the messages that have been swapped out since the conversation was last logged
+        self.__has_saved: bool = False # if any part of the conversation has been saved in a summary yet
+
+    @property
+    def is_running(self) -> bool:
+        with self.__lock:
+            return self.__thread is not None
+
+    @property
+    def has_saved(self) -> bool:
+        """True if any part of the conversation has been saved in a summary, so the summary at the end only continues it
+        """
+        with self.__lock:
+            return self.__has_saved
+
+    @property
+    def has_finished(self) -> bool:
+        """True if a compaction has finished and its messages are ready to be swapped out
+        """
+        with self.__lock:
+            return self.__compacted is not None
+
+    def start_checkpoint(self, messages: message_thread, min_messages: int, save_messages: Callable[[message_thread], None]) -> bool:
+        """Starts saving a summary of the messages that have not been summarized yet in the background, if there are at least min_messages of them.
+        The messages stay in the message_thread
+
+        Args:
+            messages (message_thread): The messages of the conversation
+            min_messages (int): How many messages need to have come together since the last summary
+            save_messages (Callable[[message_thread], None]): Saves the messages as a conversation summary. Runs on the background thread
+
+        Returns:
+            bool: True if a checkpoint has been started
+        """
+        with self.__lock:
+            if self.__thread or self.__compacted is not None: # a finished compaction is swapped out first
+                return False
+            to_save = self.__get_unsummarized(messages.get_talk_only()[:-self.MIN_MESSAGES_TO_KEEP])
+            if len(to_save) < max(min_messages, self.MIN_MESSAGES_TO_COMPACT):
+                return False
+            self.__start_thread(to_save, save_messages, None)
+        logging.log(23, f"Saving a summary checkpoint of {len(to_save)} messages in the background")
+        return True
+
+    def start(self, messages: message_thread, count_message_tokens: Callable[[Message], int], max_kept_tokens: float, save_messages: Callable[[message_thread], None]) -> bool:
+        """Starts summarizing the oldest messages of a message_thread in the background, unless a compaction is already under way.
+        Messages already saved by a checkpoint are not summarized again
+
+        Args:
+            messages (message_thread): The messages of the conversation
+            count_message_tokens (Callable[[Message], int]): Returns the (cached) token count of a single message
+            max_kept_tokens (float): How many tokens the newest messages, which are not compacted, can use in total
+            save_messages (Callable[[message_thread], None]): Saves the oldest messages, e.g. as a conversation summary. Runs on the background thread
+
+        Returns:
+            bool: True if a compaction has been started
+        """
+        with self.__lock:
+            if self.__thread or self.__compacted is not None:
+                return False
+            to_compact = self.__select_messages_to_compact(messages, count_message_tokens, max_kept_tokens)
+            if len(to_compact) < self.MIN_MESSAGES_TO_COMPACT:
+                return False
+            to_save = self.__get_unsummarized(to_compact)
+            if len(to_save) > 0:
+                self.__start_thread(to_save, save_messages, to_compact)
+            else:
+                self.__compacted = to_compact # checkpoints have already saved all of them
+        logging.log(23, f"Summarizing the oldest {len(to_compact)} messages of the conversation in the background")
+        return True
+
+    def wait(self):
+        """Blocks until a running checkpoint or compaction has finished
+        """
+        with self.__lock:
+            thread = self.__thread
+        if thread:
+            thread.join()
+
+    def apply(self, messages: message_thread, get_new_prompt: Callable[[], str]) -> bool:
+        """Swaps the summarized messages out of the message_thread, if a compaction has finished
+
+        Args:
+            messages (message_thread): The messages of the conversation
+            get_new_prompt (Callable[[], str]): Returns the new system prompt, which includes the new summary
+
+        Returns:
+            bool: True if messages have been swapped out
+        """
+        with self.__lock:
+            compacted = self.__compacted
+            self.__compacted = None
+            if compacted is None:
+                return False
+            self.__summarized.difference_update(message.original for message in compacted)
+            self.__swapped_out.extend(compacted)
+        messages.remove_summarized_messages(get_new_prompt(), compacted)
+        logging.log(23, f"Swapped the oldest {len(compacted)} messages of the conversation for their summary")
+        return True
+
+    def get_unsummarized_messages(self, messages: message_thread, include_saving: bool = False) -> message_thread:
+        """Returns the talk messages that no checkpoint or compaction has saved yet, nor is saving right now. 
+        This is all the summary at the end of a conversation needs to cover
+
+        Args:
+            messages (message_thread): The messages of the conversation
+            include_saving (bool, optional): Also returns the messages the running checkpoint or compaction is saving, in case it does not get to finish. Defaults to False.
+
+        Returns:
+            message_thread: The messages itself if nothing has been summarized yet, else a new message_thread with snapshots of the remaining messages
+        """
+        with self.__lock:
+            saving = self.__saving if not include_saving else set()
+            if len(self.__summarized) == 0 and len(saving) == 0:
+                return messages
+            talk_messages = messages.get_talk_only()
+            self.__summarized.intersection_update(message.original for message in talk_messages) # forget messages that have left the thread, e.g. by a reload
+            unsummarized = message_thread(self.__config, None)
+            for message in talk_messages:
+                if message.original not in self.__summarized and message.original not in saving:
+                    unsummarized.add_message(message)
+            return unsummarized
+
+    def get_messages_to_log(self, messages: message_thread) -> list[Message]:
+        """Returns the talk messages swapped out since the conversation was last logged, followed by the talk messages still in the message_thread
+
+        Args:
+            messages (message_thread): The messages of the conversation
+
+        Returns:
+            list[Message]: Snapshots of the messages in the order they have been said
+        """
+        with self.__lock:
+            return self.__swapped_out + messages.get_talk_only()
+
+    def mark_logged(self):
+        """Records that the messages returned by :func:`get_messages_to_log` have been logged
+        """
+        with self.__lock:
+            self.__swapped_out = []
+
+    def mark_summarized(self, messages: message_thread):
+        """Records that the talk messages of a message_thread have been saved in a summary outside of the compactor, e.g. by a reload.
+        Too few messages for a summary are not recorded, as no summary has been written for them
+
+        Args:
+            messages (message_thread): The messages that have been saved
+        """
+        talk_messages = messages.get_talk_only()
+        if len(talk_messages) < self.MIN_MESSAGES_TO_COMPACT:
+            return
+        with self.__lock:
+            self.__summarized.update(message.original for message in talk_messages)
+            self.__has_saved = True
+
+    def __get_unsummarized(self, talk_messages: list[Message]) -> list[Message]:
+        return [message for message in talk_messages if message.original not in self.__summarized and message.original not in self.__saving]
+
+    def __select_messages_to_compact(self, messages: message_thread, count_message_tokens: Callable[[Message], int], max_kept_tokens: float) -> list[Message]:
+        talk_messages = messages.get_talk_only()
+        # token counts of the last 1, 2, 3, ... talk messages, always increasing, so the longest suffix that fits can be found with a binary search
+        suffix_token_counts = list(itertools.accumulate(count_message_tokens(message) for message in reversed(talk_messages)))
+        messages_to_keep_count = max(bisect.bisect_right(suffix_token_counts, max_kept_tokens), self.MIN_MESSAGES_TO_KEEP)
+        return talk_messages[:-messages_to_keep_count]
+
+    def __start_thread(self, to_save: list[Message], save_messages: Callable[[message_thread], None], to_compact: list[Message] | None):
+        self.__saving = {message.original for message in to_save}
+        self.__thread = Thread(target=self.__save, args=(to_save, save_messages, to_compact), name="ContextCompaction", daemon=True)
+        self.__thread.start()
+
+    def __save(self, to_save: list[Message], save_messages: Callable[[message_thread], None], to_compact: list[Message] | None):
+        is_saved = False
+        try:
+            messages_to_save = message_thread(self.__config, None)
+            for message in to_save:
+                messages_to_save.add_message(message)
+            save_messages(messages_to_save)
+            is_saved = True
+        except Exception as e:
+            logging.error(f"Could not summarize messages of the conversation in the background, they will be summarized with the rest of the conversation: {e}")
+        finally:
+            with self.__lock:
+                if is_saved:
+                    self.__summarized.update(message.original for message in to_save)
+                    if to_compact is not None: # checkpoints leave their messages in the thread
+                        self.__compacted = to_compact
+                    self.__has_saved = True
+                self.__saving = set()
+                self.__thread = None
@@ -1,6 +1,6 @@
 from enum import Enum
 import logging
-from threading import Thread, Lock
+from threading import Lock
 import time
 from typing import Any
 from src.llm.ai_client import AIClient
@@ -11,14 +11,17 @@ from src.conversation.action import Action
 from src.llm.sentence_queue import SentenceQueue
 from src.llm.sentence import Sentence
 from src.remember.remembering import Remembering
+from src.remember.save_queue import SaveJob, SaveQueue
 from src.output_manager import ChatManager
-from src.llm.messages import AssistantMessage, SystemMessage, UserMessage
+from src.llm.messages import AssistantMessage, SituationMessage, SystemMessage, UserMessage
 from src.conversation.context import Context
+from src.conversation.context_compactor import ContextCompactor
 from src.llm.message_thread import message_thread
 from src.conversation.conversation_type import conversation_type, multi_npc, pc_to_npc, radiant
 from src.character_manager import Character
 from src.http.communication_constants import communication_constants as comm_consts
 from src.stt import Transcriber
+from src.turn_timeline import TurnTimeline, TurnTimelineRecorder
 import src.utils as utils
 
 class conversation_continue_type(Enum):
@@ -29,8 +32,11 @@ class conversation_continue_type(Enum):
 class Conversation:
     TOKEN_LIMIT_PERCENT: float = 0.9
     TOKEN_LIMIT_RELOAD_MESSAGES: float = 0.1
+    TOKEN_LIMIT_COMPACT_PERCENT: float = 0.7 # from here on, the oldest messages are summarized in the background
+    TOKEN_LIMIT_COMPACT_KEPT_MESSAGES: float = 0.3
+    SUMMARY_CHECKPOINT_MESSAGES: int = 20 # every this many messages, a summary of them is saved in the background
     """Controls the flow of a conversation."""
-    def __init__(self, context_for_conversation: Context, output_manager: ChatManager, rememberer: Remembering, llm_client: AIClient, stt: Transcriber | None, mic_input: bool, mic_ptt: bool) -> None:
+    def __init__(self, context_for_conversation: Context, output_manager: ChatManager, rememberer: Remembering, llm_client: AIClient, stt: Transcriber | None, mic_input: bool, mic_ptt: bool, save_queue: SaveQueue | None = None) -> None:
         
         self.__context: Context = context_for_conversation
         self.__mic_input: bool = mic_input
@@ -47,16 +53,19 @@ class Conversation:
         self.__messages: message_thread = message_thread(self.__context.config, None)
         self.__output_manager: ChatManager = output_manager
         self.__rememberer: Remembering = rememberer
+        self.__save_queue: SaveQueue | None = save_queue # if set, the end of the conversation is saved in the background
         self.__llm_client = llm_client
         self.__has_already_ended: bool = False
         self.__allow_mic_input: bool = True # this flag ensures mic input is disabled on conversation end
         self.__sentences: SentenceQueue = SentenceQueue()
-        self.__generation_thread: Thread | None = None
         self.__generation_start_lock: Lock = Lock()
+        self.__compactor: ContextCompactor = ContextCompactor(self.__context.config)
         # self.__actions: list[Action] = actions
         self.last_sentence_audio_length = 0
         self.last_sentence_start_time = time.time()
         self.__end_conversation_keywords = utils.parse_keywords(context_for_conversation.config.end_conversation_keyword)
+        if self.__stt:
+            self.__stt.set_speech_detected_callback(self.__output_manager.cancel_generation) # interrupt the NPC the moment the player starts talking
 
     @property
     def has_already_ended(self) -> bool:
@@ -115,9 +124,12 @@ class Conversation:
         """
         if self.has_already_ended:
             return comm_consts.KEY_REPLYTYPE_ENDCONVERSATION, None        
+        self.__apply_finished_compaction()
         if self.__llm_client.is_too_long(self.__messages, self.TOKEN_LIMIT_PERCENT):
             # Check if conversation too long and if yes initiate intermittent reload
             self.__initiate_reload_conversation()
+        elif self.__llm_client.is_too_long(self.__messages, self.TOKEN_LIMIT_COMPACT_PERCENT):
+            self.__start_compaction()
 
         # interrupt response if player has spoken
         if self.__stt and self.__stt.has_player_spoken:
@@ -141,13 +153,15 @@ class Conversation:
             if self.last_sentence_audio_length > 0:
                 logging.debug(f'Waiting {round(self.last_sentence_audio_length, 1)} seconds for last voiceline to play')
             # before immediately sending the next voiceline, give the player the chance to interrupt
-            while time.time() - self.last_sentence_start_time < self.last_sentence_audio_length:
-                if self.__stt and self.__stt.has_player_spoken:
+            remaining_audio_length = self.last_sentence_audio_length - (time.time() - self.last_sentence_start_time)
+            if remaining_audio_length > 0:
+                if self.__stt and self.__stt.wait_for_speech(remaining_audio_length):
                     self.__stop_generation()
                     self.__sentences.clear()
                     self.__is_player_interrupting = True
                     return comm_consts.KEY_REQUESTTYPE_TTS, None
-                time.sleep(0.01)
+                elif not self.__stt:
+                    time.sleep(remaining_audio_length)
             self.last_sentence_audio_length = next_sentence.voice_line_duration + self.__context.config.wait_time_buffer
             self.last_sentence_start_time = time.time()
             return comm_consts.KEY_REPLYTYPE_NPCTALK, next_sentence
@@ -157,6 +171,7 @@ class Conversation:
                 self.initiate_end_sequence()
                 return comm_consts.KEY_REPLYTYPE_NPCTALK, None
             else:
+                self.__start_summary_checkpoint()
                 #If not ended, ask the conversation type for an automatic user message. If there is None, signal the game that the player must provide it 
                 new_user_message = self.__conversation_type.get_user_message(self.__context, self.__messages)
                 if new_user_message:
@@ -196,6 +211,7 @@ class Conversation:
                 input_wait_start_time = time.time()
                 while not player_text:
                     player_text = self.__stt.get_latest_transcription()
+                TurnTimelineRecorder.get_shared().record(TurnTimeline.TRANSCRIPTION_FINAL, text=player_text)
                 if time.time() - input_wait_start_time >= self.__events_refresh_time:
                     # If too much time has passed, in-game events need to be updated
                     events_need_updating = True
@@ -280,7 +296,7 @@ class Conversation:
                 self.__messages: message_thread = message_thread(self.__context.config, new_prompt)
             else:
                 self.__conversation_type.adjust_existing_message_thread(new_prompt, self.__messages)
-                self.__messages.reload_message_thread(new_prompt, self.__llm_client.is_too_long, self.TOKEN_LIMIT_RELOAD_MESSAGES)
+                self.__messages.reload_message_thread(new_prompt, self.__llm_client.count_message_tokens, self.__llm_client.get_max_message_tokens(self.TOKEN_LIMIT_RELOAD_MESSAGES))
 
     @utils.time_it
     def update_game_events(self, message: UserMessage) -> UserMessage:
@@ -359,26 +375,28 @@ class Conversation:
         """Ends a conversation
         """
         self.__has_already_ended = True
+        if self.__stt:
+            self.__stt.set_speech_detected_callback(None)
         self.__stop_generation()
         self.__sentences.clear()
-        self.__save_conversation(is_reload=False)
+        if self.__save_queue:
+            self.__queue_save_conversation()
+        else:
+            self.__save_conversation(is_reload=False)
     
     @utils.time_it
     def __start_generating_npc_sentences(self):
-        """Starts a background Thread to generate sentences into the SentenceQueue"""    
+        """Starts generating sentences into the SentenceQueue on the background generation loop"""    
         with self.__generation_start_lock:
-            if not self.__generation_thread:
-                self.__sentences.is_more_to_come = True
-                self.__generation_thread = Thread(None, self.__output_manager.generate_response, None, [self.__messages, self.__context.npcs_in_conversation, self.__sentences, self.context.config.actions]).start()   
+            if self.__context.config.cache_friendly_prompt and self.__context.situation:
+                self.__messages.replace_or_add_message(SituationMessage(self.__context.situation, self.__context.config), SituationMessage)
+            self.__output_manager.start_generation(self.__messages, self.__context.npcs_in_conversation, self.__sentences, self.context.config.actions)
 
     @utils.time_it
     def __stop_generation(self):
         """Stops the current generation of sentences if there is one
         """
         self.__output_manager.stop_generation()
-        while self.__generation_thread and self.__generation_thread.is_alive():
-            time.sleep(0.1)
-        self.__generation_thread = None
 
     @utils.time_it
     def __prepare_eject_npc_from_conversation(self, npc: Character):
@@ -396,14 +414,75 @@ class Conversation:
         """Saves conversation log and state for each NPC in the conversation"""
         self.__save_conversations_for_characters(self.__context.npcs_in_conversation.get_all_characters(), is_reload)
 
+    @utils.time_it
+    def __queue_save_conversation(self):
+        """Hands the whole conversation for the log and the messages that have not been summarized yet to the save queue.
+        The messages a running checkpoint or compaction is saving are included in case it does not get to finish,
+        the queue waits for it and only summarizes what it has not saved"""
+        self.__apply_finished_compaction()
+        unsummarized_messages = self.__compactor.get_unsummarized_messages(self.__messages, include_saving=True)
+        log_messages = self.__compactor.get_messages_to_log(self.__messages)
+        is_continuation = self.__compactor.has_saved
+        job = SaveJob.from_conversation(self.__context.world_id, self.__context.npcs_in_conversation.get_all_characters(), unsummarized_messages, False, log_messages, is_continuation)
+        def before_save():
+            self.__compactor.wait()
+            remaining_messages = self.__compactor.get_unsummarized_messages(self.__messages)
+            job.messages = remaining_messages.transform_to_openai_messages(remaining_messages.get_talk_only())
+            job.is_continuation = self.__compactor.has_saved
+        if len(job.characters) > 0 and len(job.log_messages) > 0:
+            self.__save_queue.put(job, before_save)
+            self.__compactor.mark_logged()
+
     @utils.time_it
     def __save_conversations_for_characters(self, characters_to_save_for: list[Character], is_reload: bool):
+        # only what no checkpoint or compaction has summarized yet is saved, so running ones need to finish first
+        self.__compactor.wait()
+        self.__apply_finished_compaction()
+        unsummarized_messages = self.__compactor.get_unsummarized_messages(self.__messages)
+        log_messages = message_thread.transform_to_openai_messages(self.__compactor.get_messages_to_log(self.__messages))
+        for npc in characters_to_save_for:
+            if not npc.is_player_character:
+                conversation_log.save_conversation_log(npc, log_messages, self.__context.world_id)
+        self.__compactor.mark_logged()
+        try:
+            self.__save_summary_for_characters(unsummarized_messages, characters_to_save_for, is_reload, self.__compactor.has_saved)
+        except Exception as e:
+            logging.error(f"Could not summarize the conversation: {e}")
+            return
+        self.__compactor.mark_summarized(unsummarized_messages)
+
+    @utils.time_it
+    def __save_summary_for_characters(self, messages: message_thread, characters_to_save_for: list[Character], is_reload: bool, is_continuation: bool = False):
+        """Saves a summary of the messages for each NPC. The conversation log is only written once the conversation is saved as a whole"""
         characters_object = Characters()
         for npc in characters_to_save_for:
             if not npc.is_player_character:
                 characters_object.add_or_update_character(npc)
-                conversation_log.save_conversation_log(npc, self.__messages.transform_to_openai_messages(self.__messages.get_talk_only()), self.__context.world_id)
-        self.__rememberer.save_conversation_state(self.__messages, characters_object, self.__context.world_id, is_reload)
+        self.__rememberer.save_conversation_state(messages, characters_object, self.__context.world_id, is_reload, is_continuation)
+
+    @utils.time_it
+    def __start_compaction(self):
+        """Starts summarizing the oldest messages in the background, so they can be swapped for their summary long before a reload is needed"""
+        characters_to_save_for = self.__context.npcs_in_conversation.get_all_characters()
+        self.__compactor.start(self.__messages, 
+                               self.__llm_client.count_message_tokens, 
+                               self.__llm_client.get_max_message_tokens(self.TOKEN_LIMIT_COMPACT_KEPT_MESSAGES),
+                               lambda oldest_messages: self.__save_summary_for_characters(oldest_messages, characters_to_save_for, True))
+
+    @utils.time_it
+    def __start_summary_checkpoint(self):
+        """Saves a summary of the messages since the last one in the background, once enough of them have come together"""
+        characters_to_save_for = self.__context.npcs_in_conversation.get_all_characters()
+        self.__compactor.start_checkpoint(self.__messages,
+                                          self.SUMMARY_CHECKPOINT_MESSAGES,
+                                          lambda new_messages: self.__save_summary_for_characters(new_messages, characters_to_save_for, True))
+
+    @utils.time_it
+    def __apply_finished_compaction(self):
+        """Swaps the oldest messages for their summary once it has been saved. The generation start lock keeps this between turns"""
+        if self.__compactor.has_finished:
+            with self.__generation_start_lock:
+                self.__compactor.apply(self.__messages, lambda: self.__conversation_type.generate_prompt(self.__context))
 
     @utils.time_it
     def __initiate_reload_conversation(self):
@@ -427,7 +506,7 @@ class Conversation:
         self.__save_conversation(is_reload=True)
         # Reload
         new_prompt = self.__conversation_type.generate_prompt(self.__context)
-        self.__messages.reload_message_thread(new_prompt, self.__llm_client.is_too_long, self.TOKEN_LIMIT_RELOAD_MESSAGES)
+        self.__messages.reload_message_thread(new_prompt, self.__llm_client.count_message_tokens, self.__llm_client.get_max_message_tokens(self.TOKEN_LIMIT_RELOAD_MESSAGES))
 
     @utils.time_it
     def __has_conversation_ended(self, last_user_text: str) -> bool:
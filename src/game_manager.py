@@ -1,4 +1,5 @@
 import logging
+import os
 from typing import Any, Hashable
 import regex
 from src.config.definitions.llm_definitions import NarrationHandlingEnum
@@ -8,6 +9,7 @@ from src.games.gameable import Gameable
 from src.llm.sentence import Sentence
 from src.output_manager import ChatManager
 from src.remember.remembering import Remembering
+from src.remember.save_queue import SaveJob, SaveQueue
 from src.remember.summaries import Summaries
 from src.config.config_loader import ConfigLoader
 from src.llm.llm_client import LLMClient
@@ -17,6 +19,7 @@ from src.character_manager import Character
 import src.utils as utils
 from src.http.communication_constants import communication_constants as comm_consts
 from src.stt import Transcriber
+from src.turn_timeline import TurnTimeline, TurnTimelineRecorder
 
 class CharacterDoesNotExist(Exception):
     """Exception raised when NPC name cannot be found in skyrim_characters.csv/fallout4_characters.csv"""
@@ -25,6 +28,7 @@ class CharacterDoesNotExist(Exception):
 
 class GameStateManager:
     TOKEN_LIMIT_PERCENT: float = 0.45 # not used?
+    SAVE_WAIT_TIMEOUT_SECONDS: float = 30 # how long a conversation waits for the last one of its NPCs to be saved before it starts without the newest summary
     WORLD_ID_CLEANSE_REGEX: regex.Pattern = regex.compile('[^A-Za-z0-9]+')
 
     @utils.time_it
@@ -35,6 +39,7 @@ class GameStateManager:
         self.__client: LLMClient = client
         self.__chat_manager: ChatManager = chat_manager
         self.__rememberer: Remembering = Summaries(game, config, client, language_info['language'])
+        self.__save_queue: SaveQueue = SaveQueue(os.path.join(config.save_folder, 'data', 'pending_saves'), self.__save_job)
         self.__talk: Conversation | None = None
         self.__mic_input: bool = False
         self.__mic_ptt: bool = False # push-to-talk
@@ -62,7 +67,7 @@ class GameStateManager:
             self.process_stt_setup(input_json)
         
         context_for_conversation = Context(world_id, self.__config, self.__client, self.__rememberer, self.__language_info)
-        self.__talk = Conversation(context_for_conversation, self.__chat_manager, self.__rememberer, self.__client, self.__stt, self.__mic_input, self.__mic_ptt)
+        self.__talk = Conversation(context_for_conversation, self.__chat_manager, self.__rememberer, self.__client, self.__stt, self.__mic_input, self.__mic_ptt, self.__save_queue)
         self.__update_context(input_json)
         self.__try_preload_voice_model()
         self.__talk.start_conversation()
@@ -104,7 +109,9 @@ class GameStateManager:
         if sentence_to_play:
             if not sentence_to_play.error_message:
                 self.__game.prepare_sentence_for_game(sentence_to_play, self.__talk.context, self.__config, topicInfoID, self.__first_line)            
+                TurnTimelineRecorder.get_shared().record(TurnTimeline.PREPARED_FOR_GAME, speaker=sentence_to_play.speaker.name)
                 reply[comm_consts.KEY_REPLYTYPE_NPCTALK] = self.sentence_to_json(sentence_to_play, topicInfoID)
+                TurnTimelineRecorder.get_shared().record(TurnTimeline.HANDED_TO_GAME, speaker=sentence_to_play.speaker.name, text=sentence_to_play.text.strip())
                 self.__first_line = False
 
                 if comm_consts.ACTION_RELOADCONVERSATION in sentence_to_play.actions:
@@ -121,6 +128,7 @@ class GameStateManager:
             return self.error_message("No running conversation.")
         
         self.__first_line = True
+        TurnTimelineRecorder.get_shared().start_turn(TurnTimeline.PLAYER_INPUT_RECEIVED)
         
         player_text: str = input_json.get(comm_consts.KEY_REQUESTTYPE_PLAYERINPUT, '')
         self.__update_context(input_json)
@@ -161,6 +169,14 @@ class GameStateManager:
         logging.log(24, '\nWaiting for player to select an NPC...')
         return {comm_consts.KEY_REPLYTYPE: comm_consts.KEY_REPLYTYPE_ENDCONVERSATION}
     
+    def get_save_status(self) -> dict[str, Any]:
+        """Returns the conversations that are being saved in the background and the last ones that have been saved
+        """
+        return self.__save_queue.get_status()
+
+    def __save_job(self, job: SaveJob):
+        job.save(self.__config, self.__rememberer, lambda: self.__save_queue.save_progress(job))
+
     def process_stt_setup(self, input_json: dict[str, Any]):
         '''Process the STT setup (mic / text / push-to-talk) based on the settings passed in the input JSON'''
         if input_json[comm_consts.KEY_INPUTTYPE] in (comm_consts.KEY_INPUTTYPE_MIC, comm_consts.KEY_INPUTTYPE_PTT):
@@ -212,6 +228,9 @@ class GameStateManager:
                         actor: Character | None = self.load_character(actorJson)                
                         if actor:
                             actors_in_json.append(actor)
+                # summaries of the NPCs' last conversation end up in the prompt, so saving it has to finish first. Other NPCs' saves carry on
+                if not self.__save_queue.wait_for_characters([actor.ref_id for actor in actors_in_json if not actor.is_player_character], self.SAVE_WAIT_TIMEOUT_SECONDS):
+                    logging.warning(f"The last conversation has not been saved after {self.SAVE_WAIT_TIMEOUT_SECONDS} seconds. Continuing with the last saved summary")
                 self.__talk.add_or_update_character(actors_in_json)
             
             location = None
@@ -360,14 +379,6 @@ class GameStateManager:
         if not self.__talk.context.npcs_in_conversation.contains_multiple_npcs() and is_npc_speaking_first and not self.__conv_has_narrator:
             character_to_talk = self.__talk.context.npcs_in_conversation.last_added_character
             if character_to_talk:
-                self.__talk.output_manager.tts.change_voice(
-                    character_to_talk.tts_voice_model, 
-                    character_to_talk.in_game_voice_model, 
-                    character_to_talk.csv_in_game_voice_model, 
-                    character_to_talk.advanced_voice_model, 
-                    character_to_talk.voice_accent, 
-                    voice_gender=character_to_talk.gender, 
-                    voice_race=character_to_talk.race
-                )
+                self.__talk.output_manager.preload_voice(character_to_talk)
             else:
                 return self.error_message("Could not load initial character to talk to. Please try again.")
\ No newline at end of file
@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import Any, Hashable
+from typing import Any, Callable, Hashable
 
 from fastapi import FastAPI, Request
 from src.config.config_loader import ConfigLoader
@@ -58,9 +58,13 @@ class mantella_route(routeable):
         if self._config.tts_service == TTSEnum.PIPER:
             tts = Piper(self._config, game)
 
+        tts_factory: Callable[[int], TTSable] | None = None
+        if self._config.tts_service == TTSEnum.PIPER and self._config.tts_parallel_workers > 1: # every Piper instance runs its own piper.exe, so several can synthesize at the same time
+            tts_factory = lambda worker_id: Piper(self._config, game, worker_id)
+
         llm_client = LLMClient(self._config, self.__secret_key_file, self.__image_secret_key_file)
         
-        chat_manager = ChatManager(self._config, tts, llm_client)
+        chat_manager = ChatManager(self._config, tts, llm_client, tts_factory=tts_factory)
         self.__game = GameStateManager(game, chat_manager, self._config, self.__language_info, llm_client, self.__stt_secret_key_file, self.__secret_key_file)
 
     @utils.time_it
@@ -103,3 +107,9 @@ class mantella_route(routeable):
             if self._show_debug_messages:
                 logging.log(self._log_level_http_out, json.dumps(reply, indent=4))
             return reply
+
+        @app.get("/mantella/saves")
+        async def get_saves() -> dict[str, Any]:
+            if not self.__game:
+                return self.error_message("Game manager setup failed. There is most likely an issue with the config.ini.")
+            return self.__game.get_save_status()
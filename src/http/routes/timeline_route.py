@@ -0,0 +1,42 @@
+import os
+from typing import Any
+
+from fastapi import FastAPI, HTTPException
+from src.config.config_loader import ConfigLoader
+from src.http.routes.routeable import routeable
+from src.turn_timeline import TurnTimelineRecorder
+from src import utils
+
+class timeline_route(routeable):
+    """Route to inspect the latency timelines of the most recent conversation turns
+    """
+    DEFAULT_LIMIT: int = 20
+
+    def __init__(self, config: ConfigLoader, recorder: TurnTimelineRecorder | None = None) -> None:
+        super().__init__(config, False)
+        self.__recorder: TurnTimelineRecorder = recorder if recorder else TurnTimelineRecorder.get_shared()
+
+    @utils.time_it
+    def add_route_to_server(self, app: FastAPI):
+        @app.get("/timeline")
+        async def get_timelines(limit: int = self.DEFAULT_LIMIT) -> dict[str, Any]:
+            return {"turns": [timeline.to_dict() for timeline in self.__recorder.get_turns(limit)]}
+
+        @app.get("/timeline/{turn_id}")
+        async def get_timeline(turn_id: int) -> dict[str, Any]:
+            timeline = self.__recorder.get_turn(turn_id)
+            if not timeline:
+                raise HTTPException(status_code=404, detail=f"No timeline kept for turn {turn_id}")
+            return timeline.to_dict()
+
+        @app.post("/timeline/dump")
+        async def dump_timelines() -> dict[str, Any]:
+            file_path = self.get_dump_file_path()
+            count = self.__recorder.dump_jsonl(file_path)
+            return {"file": file_path, "turns": count}
+
+    def get_dump_file_path(self) -> str:
+        return os.path.join(self._config.save_folder, 'data', 'turn_timelines.jsonl')
+
+    def _setup_route(self):
+        pass
@@ -4,17 +4,32 @@ from typing import AsyncGenerator
 from src.llm.message_thread import message_thread
 from src.llm.messages import Message
 from src.llm.llm_model_list import LLMModelList
+from src.llm.request_lanes import RequestLaneEnum
 
 
 class AIClient(ABC):
 
     @abstractmethod
-    def request_call(self, messages: Message | message_thread) -> str | None:
+    def request_call(self, messages: Message | message_thread, lane: RequestLaneEnum = RequestLaneEnum.BACKGROUND) -> str | None:
         """A standard sync request call to the LLM. 
         This method generates a new client, calls 'client.chat.completions.create', returns the result and closes when finished
 
         Args:
             messages (conversation_thread): The message thread of the conversation
+            lane (RequestLaneEnum, optional): The lane the request waits in, see :class:`RequestLanes`. Defaults to RequestLaneEnum.BACKGROUND.
+
+        Returns:
+            str | None: The reply of the LLM
+        """
+        pass
+
+    @abstractmethod
+    async def arequest_call(self, messages: Message | message_thread, lane: RequestLaneEnum = RequestLaneEnum.BACKGROUND) -> str | None:
+        """The async version of :func:`request_call`. Does not block the calling thread or the event loop while waiting for the reply
+
+        Args:
+            messages (conversation_thread): The message thread of the conversation
+            lane (RequestLaneEnum, optional): The lane the request waits in, see :class:`RequestLanes`. Defaults to RequestLaneEnum.BACKGROUND.
 
         Returns:
             str | None: The reply of the LLM
@@ -50,6 +65,18 @@ class AIClient(ABC):
         """
         pass
 
+    @abstractmethod
+    def count_message_tokens(self, message: Message) -> int:
+        """Returns the number of tokens a single message adds to a list of messages
+        """
+        pass
+
+    @abstractmethod
+    def get_max_message_tokens(self, token_limit_percent: float) -> float:
+        """Returns how many tokens a list of messages can use before it is too long for token_limit_percent of the context size of the model
+        """
+        pass
+
     @staticmethod
     @abstractmethod
     def get_model_list(service: str, secret_key_file: str, default_model: str = "google/gemma-2-9b-it:free", is_vision: bool = False) -> LLMModelList:
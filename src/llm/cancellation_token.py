@@ -0,0 +1,81 @@
+import threading
+from typing import Callable
+
+class CancellationToken:
+    """Cancellation handle for a single generation of the LLM.
+
+    Every generation gets its own token, identified by a generation ID. Cancelling a token runs its registered callbacks straight away
+    (e.g. to abort the in-flight stream), and anyone waiting for the generation to wind down is woken through an event instead of polling.
+    """
+    def __init__(self, generation_id: int) -> None:
+        """
+        Args:
+            generation_id (int): The ID of the generation this token belongs to
+        """
+        self.__generation_id: int = generation_id
+        self.__cancelled: threading.Event = threading.Event()
+        self.__finished: threading.Event = threading.Event()
+        self.__callbacks: list[Callable[[], None]] = []
+        self.__lock: threading.Lock = threading.Lock()
+
+    @property
+    def generation_id(self) -> int:
+        return self.__generation_id
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.__finished.is_set()
+
+    def cancel(self):
+        """Cancels the generation and runs all registered callbacks. Cancelling more than once has no further effect
+        """
+        with self.__lock:
+            if self.__cancelled.is_set():
+                return
+            self.__cancelled.set()
+            callbacks = self.__callbacks.copy()
+            self.__callbacks.clear()
+        for callback in callbacks:
+            callback()
+
+    def add_cancel_callback(self, callback: Callable[[], None]):
+        """Registers a callback to run once the token is cancelled. Runs immediately if the token has already been cancelled
+
+        Args:
+            callback (Callable[[], None]): The callback to run. Must not block
+        """
+        with self.__lock:
+            if not self.__cancelled.is_set():
+                self.__callbacks.append(callback)
+                return
+        callback()
+
+    def remove_cancel_callback(self, callback: Callable[[], None]):
+        """Unregisters a callback previously added via :func:`add_cancel_callback`
+
+        Args:
+            callback (Callable[[], None]): The callback to remove
+        """
+        with self.__lock:
+            if callback in self.__callbacks:
+                self.__callbacks.remove(callback)
+
+    def mark_finished(self):
+        """Signals that the generation has wound down completely, waking up everyone waiting in :func:`wait_until_finished`
+        """
+        self.__finished.set()
+
+    def wait_until_finished(self, timeout: float | None = None) -> bool:
+        """Blocks until the generation has wound down
+
+        Args:
+            timeout (float | None, optional): Maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            bool: True if the generation has finished, False if the timeout ran out first
+        """
+        return self.__finished.wait(timeout)
@@ -1,15 +1,25 @@
-from threading import Lock
+import asyncio
+from threading import Thread
 from typing import AsyncGenerator, Any
-from openai import APIConnectionError, BadRequestError, OpenAI, AsyncOpenAI, RateLimitError
+from openai import APIConnectionError, AsyncStream, BadRequestError, OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletionChunk
+import httpx
 import logging
 import time
 import tiktoken
 import os
 from pathlib import Path
 from src.llm.ai_client import AIClient
+from src.llm.client_pool import ClientPool
+from src.llm.prompt_cache_stats import PromptCacheStats
+from src.llm.token_counter import ModelTokenizerCounter, TiktokenCounter, TokenCounter, TokenEstimator
+from src.llm.request_lanes import RequestLaneEnum, RequestLanes
+from src.llm.response_cache import ResponseCache
+from src.llm.request_scheduler import CircuitOpenError, RequestScheduler
 from src.llm.message_thread import message_thread
-from src.llm.messages import Message, ImageMessage, UserMessage
+from src.llm.messages import Message, UserMessage
 from src.llm.llm_model_list import LLMModelList
+from src.llm.model_catalogue import ModelCatalogue, ModelCatalogueEntry
 import src.utils as utils
 
 class ClientBase(AIClient):
@@ -18,7 +28,10 @@ class ClientBase(AIClient):
     Handles API key management, client generation (sync/async), request execution,
     token counting, endpoint resolution, and model list retrieval
     '''
-    api_token_limits = {}
+    KEEPALIVE_EXPIRY_SECONDS: float = 120 # keep idle connections open between NPC turns, httpx would otherwise drop them after 5 seconds
+    REPLY_PRIMING_TOKENS: int = 2 # every reply is primed with <im_start>assistant
+    MESSAGE_OVERHEAD_TOKENS: int = 4 # every message follows <im_start>{role/name}\n{content}<im_end>\n
+    RESPONSE_CACHE_FILE: str = os.path.join("data", "llm_response_cache.db") # inside the save folder
     tiktoken_cache_dir = "data"
     os.environ["TIKTOKEN_CACHE_DIR"] = tiktoken_cache_dir
 
@@ -32,12 +45,16 @@ class ClientBase(AIClient):
             secret_key_files (list[str]): A list of filenames to search for the API key, in order of priority
         '''
         super().__init__()
-        self._generation_lock: Lock = Lock()
         self._model_name: str = llm
         self._base_url = self.__get_endpoint(api_url)
+        self._client_pool: ClientPool = ClientPool.get_shared()
+        self._scheduler: RequestScheduler = RequestScheduler.get_shared()
+        self._request_lanes: RequestLanes = RequestLanes.get_shared()
         self._startup_async_client: AsyncOpenAI | None = None
         self._request_params: dict[str, Any] | None = llm_params
         self._image_client = None
+        self._prompt_cache_stats: PromptCacheStats = PromptCacheStats()
+        self._response_cache: ResponseCache | None = None # opt-in, replies of request_call / arequest_call are reused for identical requests
 
         if 'https' in self._base_url: # Cloud LLM
             self._is_local: bool = False
@@ -53,8 +70,12 @@ class ClientBase(AIClient):
         referer = "https://art-from-the-machine.github.io/Mantella/"
         xtitle = "Mantella"
         self._header: dict[str, str] = {"HTTP-Referer": referer, "X-Title": xtitle}
+        self._model_catalogue: ModelCatalogue = ModelCatalogue.get_shared()
+        if self._model_catalogue.is_stale(api_url): # the cached catalogue is used for the token limit right away, the next start gets the refreshed one
+            self._model_catalogue.refresh_in_background(api_url, self._api_key)
         self._token_limit: int = self.__get_token_limit(self._model_name, custom_token_count, self._is_local)
-        self._encoding = self.__get_model_encoding(api_url, self._model_name)
+        self._token_counter: TokenCounter = self.__get_token_counter(api_url, self._model_name)
+        self.__has_fallback_calibration_started: bool = False
 
 
     @property
@@ -69,6 +90,28 @@ class ClientBase(AIClient):
         """
         return self._model_name
     
+    def _set_up_response_cache(self, save_folder: str, max_megabytes: int):
+        '''Reuses the replies of request_call / arequest_call for identical requests, stored in the save folder
+
+        Args:
+            save_folder (str): The Mantella folder in 'My Games'
+            max_megabytes (int): The disk space the stored replies may take up
+        '''
+        try:
+            self._response_cache = ResponseCache(os.path.join(save_folder, self.RESPONSE_CACHE_FILE), max_megabytes * 1024 * 1024)
+        except Exception as e:
+            logging.error(f"Could not open the LLM response cache, responses will not be reused: {e}")
+
+    @property
+    def prompt_cache_stats(self) -> PromptCacheStats:
+        return self._prompt_cache_stats
+    
+    @property
+    def endpoint_name(self) -> str:
+        """Identifies the endpoint and model of this client, e.g. in the shared :class:`RequestScheduler`
+        """
+        return f"{self._base_url} | {self._model_name}"
+
     @property
     def is_local(self) -> bool:
         """Is the model run locally?
@@ -92,14 +135,33 @@ class ClientBase(AIClient):
         """Generates a new AsyncOpenAI client already setup to be used right away.
         Close the client after usage using 'await client.close()'
 
-        The client needs to be closed after every call (and a new one created for the next call) to avoid connection issues
+        The client's connections are bound to the event loop it is first used on. 
+        :func:`streaming_call` does not generate a client per call, but gets a long-lived one from the shared :class:`ClientPool`
 
         Use :func:`streaming_call` for a normal streaming call to the LLM
 
         Returns:
             AsyncOpenAI: The new async client object
         """
-        return AsyncOpenAI(api_key=self._api_key, base_url=self._base_url, default_headers=self._header)
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=self.KEEPALIVE_EXPIRY_SECONDS),
+            follow_redirects=True
+        )
+        # retries are left to the shared RequestScheduler
+        return AsyncOpenAI(api_key=self._api_key, base_url=self._base_url, default_headers=self._header, http_client=http_client, max_retries=0)
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        """Returns the long-lived async client of this endpoint for the running event loop
+
+        Returns:
+            AsyncOpenAI: The client to use. Must not be closed after the call
+        """
+        return self._client_pool.get_async_client(self._get_client_endpoint(), self.generate_async_client)
+
+    def _get_client_endpoint(self) -> tuple[str, str]:
+        """Returns what identifies the clients of this endpoint in the shared :class:`ClientPool`
+        """
+        return self._base_url, self._api_key
 
 
     @utils.time_it
@@ -107,72 +169,165 @@ class ClientBase(AIClient):
         """Generates a new OpenAI client already setup to be used right away.
         Close the client after usage using 'client.close()'
 
+        :func:`request_call` does not generate a client per call, but gets a long-lived one from the shared :class:`ClientPool`
+
         Use :func:`request_call` for a normal call to the LLM
 
         Returns:
             OpenAI: The new sync client object
         """
-        return OpenAI(api_key=self._api_key, base_url=self._base_url, default_headers=self._header)
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=self.KEEPALIVE_EXPIRY_SECONDS),
+            follow_redirects=True
+        )
+        # retries are left to the shared RequestScheduler
+        return OpenAI(api_key=self._api_key, base_url=self._base_url, default_headers=self._header, http_client=http_client, max_retries=0)
 
 
     @utils.time_it
-    def request_call(self, messages: Message | message_thread) -> str | None:
-        with self._generation_lock:
-            sync_client = self.generate_sync_client()        
+    def request_call(self, messages: Message | message_thread, lane: RequestLaneEnum = RequestLaneEnum.BACKGROUND) -> str | None:
+        openai_messages = ClientBase.__get_openai_messages(messages)
+        request_params = self._request_params if self._request_params else {}
+        cache_key, cached_reply = self.__get_cached_reply(openai_messages, request_params)
+        if cached_reply:
+            return cached_reply
+        with self._request_lanes.enter(self.endpoint_name, lane):
+            sync_client = self._client_pool.get_sync_client(self._get_client_endpoint(), self.generate_sync_client)
             chat_completion = None
             logging.log(28, 'Getting LLM response...')
 
-            if isinstance(messages, Message) or isinstance(messages, ImageMessage):
-                openai_messages = [messages.get_openai_message()]
-            else:
-                openai_messages = messages.get_openai_messages()
-            
-            if self._request_params:
-                request_params = self._request_params
-            else:
-                request_params: dict[str, Any] = {}
-            try:
-                chat_completion = sync_client.chat.completions.create(
-                    model=self.model_name,
-                    messages=openai_messages,
-                    **request_params,
-                )
-            except RateLimitError:
-                logging.warning('Could not connect to LLM API, retrying in 5 seconds...')
-                time.sleep(5)
-            finally:
-                sync_client.close()
-
-            if (
-                not chat_completion or 
-                not chat_completion.choices or 
-                chat_completion.choices.__len__() < 1 or 
-                not chat_completion.choices[0].message.content
-            ):
-                logging.info(f"LLM Response failed")
-                return None
-            
-            reply = chat_completion.choices[0].message.content
-            return reply
+            for attempt in range(1, self._scheduler.MAX_ATTEMPTS + 1):
+                try:
+                    self._scheduler.wait_for_turn(self.endpoint_name)
+                    chat_completion = sync_client.chat.completions.create(
+                        model=self.model_name,
+                        messages=openai_messages,
+                        **request_params,
+                    )
+                    self._scheduler.record_success(self.endpoint_name)
+                    break
+                except CircuitOpenError as e:
+                    logging.warning(f"Could not get LLM response: {e}")
+                    break
+                except Exception as e:
+                    retry_delay = self._scheduler.record_failure(self.endpoint_name, e)
+                    if not RequestScheduler.is_retryable(e):
+                        raise
+                    if isinstance(e, APIConnectionError) and self._client_pool.discard(sync_client): # the next attempt starts over with fresh connections
+                        sync_client.close()
+                        sync_client = self._client_pool.get_sync_client(self._get_client_endpoint(), self.generate_sync_client)
+                    if retry_delay is None or attempt == self._scheduler.MAX_ATTEMPTS:
+                        logging.warning(f"Could not get LLM response: {e}")
+                        break
+                    logging.warning(f"Could not connect to LLM API, retrying in {round(retry_delay, 1)} seconds...")
+                    time.sleep(retry_delay)
+
+            return self.__get_reply(openai_messages, chat_completion, cache_key)
+
+    @utils.time_it
+    async def arequest_call(self, messages: Message | message_thread, lane: RequestLaneEnum = RequestLaneEnum.BACKGROUND) -> str | None:
+        openai_messages = ClientBase.__get_openai_messages(messages)
+        request_params = self._request_params if self._request_params else {}
+        cache_key, cached_reply = self.__get_cached_reply(openai_messages, request_params)
+        if cached_reply:
+            return cached_reply
+        async with self._request_lanes.enter_async(self.endpoint_name, lane):
+            chat_completion = None
+            logging.log(28, 'Getting LLM response...')
+
+            for attempt in range(1, self._scheduler.MAX_ATTEMPTS + 1):
+                async_client = self._get_async_client()
+                try:
+                    await self._scheduler.wait_for_turn_async(self.endpoint_name)
+                    chat_completion = await async_client.chat.completions.create(
+                        model=self.model_name,
+                        messages=openai_messages,
+                        **request_params,
+                    )
+                    self._scheduler.record_success(self.endpoint_name)
+                    break
+                except CircuitOpenError as e:
+                    logging.warning(f"Could not get LLM response: {e}")
+                    break
+                except Exception as e:
+                    retry_delay = self._scheduler.record_failure(self.endpoint_name, e)
+                    if not RequestScheduler.is_retryable(e):
+                        raise
+                    if isinstance(e, APIConnectionError) and self._client_pool.discard(async_client): # the next attempt starts over with fresh connections
+                        await async_client.close()
+                    if retry_delay is None or attempt == self._scheduler.MAX_ATTEMPTS:
+                        logging.warning(f"Could not get LLM response: {e}")
+                        break
+                    logging.warning(f"Could not connect to LLM API, retrying in {round(retry_delay, 1)} seconds...")
+                    await asyncio.sleep(retry_delay)
+
+            return self.__get_reply(openai_messages, chat_completion, cache_key)
+
+    @staticmethod
+    def __get_openai_messages(messages: Message | message_thread) -> list:
+        if isinstance(messages, Message):
+            return [messages.get_openai_message()]
+        return messages.get_openai_messages()
+
+    def __get_cached_reply(self, openai_messages: list, request_params: dict[str, Any]) -> tuple[str | None, str | None]:
+        '''Looks up a request in the response cache, if it is used
+
+        Returns:
+            tuple[str | None, str | None]: The cache key of the request and the cached reply, if there is one
+        '''
+        if not self._response_cache:
+            return None, None
+        cache_key = ResponseCache.get_key(self.model_name, request_params, openai_messages)
+        cached_reply = self._response_cache.get(cache_key)
+        if cached_reply:
+            logging.log(23, 'Reusing the cached LLM response to an identical request')
+        return cache_key, cached_reply
+
+    def __get_reply(self, openai_messages: list, chat_completion: Any, cache_key: str | None = None) -> str | None:
+        '''Returns the reply of a (non-streaming) chat completion, records its token usage and stores it in the response cache
+
+        Args:
+            openai_messages (list): The messages sent with the request
+            chat_completion (Any): The chat completion, None if the request failed
+            cache_key (str | None, optional): The key to store the reply under in the response cache. Defaults to None.
+
+        Returns:
+            str | None: The reply of the LLM or None if there is none
+        '''
+        if (
+            not chat_completion or 
+            not chat_completion.choices or 
+            chat_completion.choices.__len__() < 1 or 
+            not chat_completion.choices[0].message.content
+        ):
+            logging.info(f"LLM Response failed")
+            return None
+        
+        self._prompt_cache_stats.record_usage(chat_completion.usage)
+        self.__calibrate_token_estimator(openai_messages, chat_completion.usage)
+        reply = chat_completion.choices[0].message.content
+        if self._response_cache and cache_key:
+            self._response_cache.put(cache_key, reply)
+        return reply
         
 
     @utils.time_it
     async def streaming_call(self, messages: Message | message_thread, is_multi_npc: bool) -> AsyncGenerator[str | None, None]:
-        with self._generation_lock:
+        async with self._request_lanes.enter_async(self.endpoint_name, RequestLaneEnum.INTERACTIVE):
             logging.log(28, 'Getting LLM response...')
 
-            if self._startup_async_client:
-                async_client = self._startup_async_client
-                self._startup_async_client = None # do not reuse the same client
-            else:
-                async_client = self.generate_async_client()
-
             if self._request_params:
                 request_params = self._request_params.copy() # copy of self._request_params to allow temporary override
             else:
                 request_params: dict[str, Any] = {}
             if is_multi_npc: # override max_tokens to be at least 250 in radiant / multi-NPC conversations
                 request_params["max_tokens"] = max(self.max_tokens_param, 250)
+            # ask for the token usage at the end of the streamed reply. It calibrates the token estimator and shows how much of the prompt was cached.
+            # Passed as extra_body, as the openai package in use does not know the stream_options parameter yet. Services that don't support it ignore it
+            request_params["extra_body"] = {**request_params.get("extra_body", {}), "stream_options": {"include_usage": True}}
+            stream = None
+            usage = None
+            openai_messages = []
             try:
                 # Prepare the messages including the image if provided
                 vision_hints = ''
@@ -186,15 +341,14 @@ class ClientBase(AIClient):
                     if isinstance(last_message, UserMessage):
                         vision_hints = last_message.get_ingame_events_text()
                 if self._image_client:
-                    openai_messages = self._image_client.add_image_to_messages(openai_messages, vision_hints)
+                    openai_messages = await self._image_client.add_image_to_messages(openai_messages, vision_hints)
 
-                async for chunk in await async_client.chat.completions.create(
-                    model=self.model_name, 
-                    messages=openai_messages, 
-                    stream=True,
-                    **request_params,
-                ):
+                stream = await self.__create_stream(openai_messages, request_params)
+                async for chunk in stream:
                     try:
+                        if chunk and getattr(chunk, "usage", None): # only sent with the last chunk
+                            usage = chunk.usage
+                            self._prompt_cache_stats.record_usage(usage)
                         if chunk and chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
                             yield chunk.choices[0].delta.content
                     except Exception as e:
@@ -219,7 +373,42 @@ class ClientBase(AIClient):
                 else:
                     logging.error(f"LLM API Error: {e}")
             finally:
-                await async_client.close()
+                if stream:
+                    await stream.close() # hands the connection back to the pool, also when the generation has been cancelled mid-stream
+                    self.__calibrate_token_estimator(openai_messages, usage)
+
+    async def __create_stream(self, openai_messages: list, request_params: dict[str, Any]) -> AsyncStream[ChatCompletionChunk]:
+        """Sends a streaming request to the LLM. Retryable errors are retried for as long as the shared :class:`RequestScheduler` allows
+
+        Raises:
+            CircuitOpenError: If the endpoint has been failing and is currently skipped
+            Exception: The error of the last attempt if the request could not be sent
+
+        Returns:
+            AsyncStream[ChatCompletionChunk]: The stream of the reply
+        """
+        attempt = 1
+        while True:
+            async_client = self._get_async_client()
+            await self._scheduler.wait_for_turn_async(self.endpoint_name)
+            try:
+                stream = await async_client.chat.completions.create(
+                    model=self.model_name, 
+                    messages=openai_messages, 
+                    stream=True,
+                    **request_params,
+                )
+                self._scheduler.record_success(self.endpoint_name)
+                return stream
+            except Exception as e:
+                retry_delay = self._scheduler.record_failure(self.endpoint_name, e)
+                if isinstance(e, APIConnectionError) and self._client_pool.discard(async_client): # the next attempt starts over with fresh connections
+                    await async_client.close()
+                if retry_delay is None or attempt >= self._scheduler.MAX_ATTEMPTS:
+                    raise
+                logging.warning(f"LLM API Error: {e}. Retrying in {round(retry_delay, 1)} seconds...")
+                await asyncio.sleep(retry_delay)
+                attempt += 1
 
 
     @utils.time_it
@@ -323,7 +512,7 @@ For more information, see here: https://art-from-the-machine.github.io/Mantella/
 
     @utils.time_it
     def __get_token_limit(self, llm, custom_token_count: int, is_local):
-        '''Determines the token limit for the given LLM, using known values, manual overrides, or a default
+        '''Determines the token limit for the given LLM, using the cached model catalogue, known values if the model is not in the catalogue, or a default
 
         Args:
             llm (str): The name of the language model
@@ -333,14 +522,17 @@ For more information, see here: https://art-from-the-machine.github.io/Mantella/
         Returns:
             token_limit (int): The determined token limit for the model
         '''
-        manual_limits = utils.get_model_token_limits()
-        token_limit_dict = {**self.api_token_limits, **manual_limits}
+        catalogue_limit = self._model_catalogue.get_context_length(llm)
+        openai_limits = {model.id: model.model_extra["context_length"] for model in utils.get_openai_model_list().data}
+        manual_limits = {**openai_limits, **utils.get_model_token_limits()}
 
         if '/' in llm:
             llm = llm.split('/')[-1]
 
-        if llm in token_limit_dict:
-            token_limit = token_limit_dict[llm]
+        if catalogue_limit:
+            token_limit = catalogue_limit
+        elif llm in manual_limits:
+            token_limit = manual_limits[llm]
         else:
             logging.log(23, f"Could not find number of available tokens for {llm}. Defaulting to token count of {custom_token_count}. This number can be changed via the `Large Language Model`->`Custom Token Count` / `Vision`->`Custom Vision Model Token Count` settings in the Mantella UI")
             try:
@@ -357,48 +549,102 @@ For more information, see here: https://art-from-the-machine.github.io/Mantella/
     
 
     @utils.time_it
-    def __get_model_encoding(self, api_url: str, llm: str) -> tiktoken.Encoding:
-        '''Gets the appropriate tiktoken encoding for the specified model or a sensible default
+    def __get_token_counter(self, api_url: str, llm: str) -> TokenCounter:
+        '''Gets the token counter for the specified model.
+        OpenAI models are counted exactly with their tiktoken encoding. The tokenizers of other models are not known, 
+        so their tokens are estimated and the estimate is calibrated with the token usage the LLM service reports
 
         Args:
             api_url (str): The API service/URL being used
             llm (str): The name of the language model
 
         Returns:
-            tiktoken.Encoding: The encoding object for token counting
+            TokenCounter: The counter used for all token counts of this client
         '''
-        chosenmodel = llm
-        # if using an alternative API to OpenAI, use encoding for GPT-3.5 by default
-        # NOTE: this encoding may not be the same for all models, leading to incorrect token counts
-        #       this can lead to the token limit of the given model being overrun
+        if api_url != 'OpenAI':
+            return TokenEstimator()
         try:
-            if api_url == 'OpenAI':
-                encoding = tiktoken.encoding_for_model(chosenmodel) # get encoding for specific model
-            else:
-                encoding = tiktoken.get_encoding('cl100k_base') # get generic encoding
+            encoding = tiktoken.encoding_for_model(llm) # get encoding for specific model
         except:
             try:
                 encoding = tiktoken.get_encoding('cl100k_base') # try loading a generic encoding
             except:
                 logging.error('Error loading model. If you are using an alternative to OpenAI, please find the setting `Large Language Model`->`LLM Service` in the Mantella UI and follow the instructions to change this setting')
                 raise
-        
-        return encoding
+        return TiktokenCounter(encoding)
+    
+    def __calibrate_token_estimator(self, openai_messages: list, usage: Any):
+        '''Calibrates the token estimator with the prompt tokens the LLM service reported for a request.
+        If the service does not report them, the estimator is calibrated once with a tokenizer instead, in the background
+
+        Args:
+            openai_messages (list): The messages sent with the request
+            usage (Any): The `usage` of the reply, None if the service did not send one
+        '''
+        if not isinstance(self._token_counter, TokenEstimator):
+            return
+        prompt = ClientBase.__get_prompt_text(openai_messages)
+        if not prompt:
+            return
+        text, message_count = prompt
+        prompt_tokens = TokenEstimator.get_prompt_tokens(usage) if usage else None
+        if prompt_tokens:
+            self._token_counter.calibrate(len(text), prompt_tokens - message_count * self.MESSAGE_OVERHEAD_TOKENS - self.REPLY_PRIMING_TOKENS)
+        elif not self._token_counter.is_calibrated and not self.__has_fallback_calibration_started:
+            self.__has_fallback_calibration_started = True
+            Thread(target=self.__calibrate_with_tokenizer, args=(self._token_counter, text), daemon=True).start()
+
+    def __calibrate_with_tokenizer(self, estimator: TokenEstimator, text: str):
+        tokenizer = ModelTokenizerCounter(self._model_name)
+        try:
+            exact_counter: TokenCounter = tokenizer if tokenizer.is_available else TiktokenCounter(tiktoken.get_encoding('cl100k_base'))
+            if not estimator.is_calibrated: # a reply with usage could have come in while the tokenizer loaded
+                estimator.calibrate(len(text), exact_counter.count(text))
+                logging.debug(f"Calibrated the token estimate of '{self._model_name}' with {exact_counter.name}: {estimator.chars_per_token} characters per token")
+        except Exception as e:
+            logging.debug(f"Could not calibrate the token estimate of '{self._model_name}': {e}")
+
+    @staticmethod
+    def __get_prompt_text(openai_messages: list) -> tuple[str, int] | None:
+        '''Returns the text content of the messages of a request and their number, or None if the messages contain images, 
+        as their tokens can not be told apart from the tokens of the text
+        '''
+        text = ""
+        for message in openai_messages:
+            for key, value in message.items():
+                if isinstance(value, str) and key != "role":
+                    text += value
+                elif isinstance(value, list):
+                    for part in value:
+                        if part.get("type") != "text":
+                            return None
+                        text += part.get("text", "")
+        return (text, len(openai_messages)) if openai_messages else None
     
     @utils.time_it
     def get_count_tokens(self, messages: message_thread | list[Message] | Message | str) -> int:
         if isinstance(messages, message_thread | list) :
             return self.__num_tokens_from_messages(messages)
         elif isinstance(messages, Message):
-            return self.__num_tokens_from_message(messages)
+            return self.count_message_tokens(messages)
         else:
-            return len(self._encoding.encode(messages))
+            return self._token_counter.count(messages)
 
     @utils.time_it
     def is_too_long(self, messages: message_thread | list[Message] | Message | str, token_limit_percent: float) -> bool:
         countTokens: int = self.get_count_tokens(messages)
         return countTokens > self.token_limit * token_limit_percent
 
+    def count_message_tokens(self, message: Message) -> int:
+        """Returns the number of tokens a single message adds to a list of messages. Cached by the message until it changes
+        """
+        return message.get_token_count(self._token_counter.name, self.__count_message_tokens)
+
+    def get_max_message_tokens(self, token_limit_percent: float) -> float:
+        """Returns how many tokens a list of messages can use before it is too long for token_limit_percent of the context size of the model
+        """
+        return self.token_limit * token_limit_percent - self.REPLY_PRIMING_TOKENS
+
     @utils.time_it
     def __num_tokens_from_messages(self, messages: message_thread | list[Message]) -> int:
         '''Calculates token count for a list of messages formatted for OpenAI API calls
@@ -409,47 +655,32 @@ For more information, see here: https://art-from-the-machine.github.io/Mantella/
         Returns:
             num_tokens (int): The estimated total token count
         '''
-        messages_to_check = []
         if isinstance(messages, message_thread):
-            messages_to_check = messages.get_openai_messages()
+            num_tokens = messages.get_token_count(self._token_counter.name, self.__count_message_tokens)
         else:
+            num_tokens = 0
             for m in messages:
-                messages_to_check.append(m.get_openai_message())
-
-        # note: this calculation is based on GPT-3.5, future models may deviate from this
-        num_tokens = 0
-        for message in messages_to_check:
-            num_tokens += 4  # every message follows <im_start>{role/name}\n{content}<im_end>\n
-            for key, value in message.items():
-                if isinstance(value, str):
-                    num_tokens += len(self._encoding.encode(value))
-                    if key == "name":  # if there's a name, the role is omitted
-                        num_tokens += -1  # role is always required and always 1 token
-        num_tokens += 2  # every reply is primed with <im_start>assistant
+                num_tokens += self.count_message_tokens(m)
+        num_tokens += self.REPLY_PRIMING_TOKENS
         return num_tokens
-    
-    @utils.time_it
-    def __num_tokens_from_message(self, message_to_measure: Message | str) -> int:
-        '''Calculates the approximate token count for a single Message object or string,
-        considering the overhead of the message structure
+
+    def __count_message_tokens(self, message: Message) -> int:
+        '''Calculates the token count of a single message as it is sent to the OpenAI API.
+        Only called by Message.get_token_count if the message has changed since it was last counted
 
         Args:
-            message_to_measure (Message | str): The message or string content
+            message (Message): The message to count tokens for
 
         Returns:
-            num_tokens (int): Estimated token count
+            num_tokens (int): The estimated token count, including the overhead of the message structure
         '''
-        text: str = ""
-        if isinstance(message_to_measure, Message):
-            text = message_to_measure.get_formatted_content()
-        else:
-            text = message_to_measure
-
-        num_tokens = 4 # every message follows <im_start>{role/name}\n{content}<im_end>\n
-        num_tokens += len(text)
-        if isinstance(message_to_measure, Message) and message_to_measure.get_openai_message().__contains__("name"):# if there's a name, the role is omitted
-            num_tokens += -1# role is always required and always 1 token
-        
+        # note: this calculation is based on GPT-3.5, future models may deviate from this
+        num_tokens = self.MESSAGE_OVERHEAD_TOKENS
+        for key, value in message.get_openai_message().items():
+            if isinstance(value, str):
+                num_tokens += self._token_counter.count(value)
+                if key == "name":  # if there's a name, the role is omitted
+                    num_tokens += -1  # role is always required and always 1 token
         return num_tokens
     
     @staticmethod
@@ -459,7 +690,7 @@ For more information, see here: https://art-from-the-machine.github.io/Mantella/
         try:
             if service == "OpenAI":
                 default_model = "gpt-4o-mini"
-                models = utils.get_openai_model_list()
+                models = [ModelCatalogueEntry.from_model_extra(model.id, model.model_extra) for model in utils.get_openai_model_list().data]
                 # OpenAI models are not a "live" list, so manual input needs to be allowed for when new models not listed are released
                 allow_manual_model_input = True
             elif service == "OpenRouter":
@@ -468,32 +699,20 @@ For more information, see here: https://art-from-the-machine.github.io/Mantella/
                 secret_key = ClientBase._get_api_key(secret_key_files, not is_vision)
                 if not secret_key:
                     return LLMModelList([(f"No secret key found in {secret_key_file}", "Custom model")], "Custom model", allows_manual_model_input=True)
-                # NOTE: while a secret key is not needed for this request, this may change in the future
-                client = OpenAI(api_key=secret_key, base_url='https://openrouter.ai/api/v1')
-                # don't log initial 'HTTP Request: GET https://openrouter.ai/api/v1/models "HTTP/1.1 200 OK"'
-                logging.getLogger('openai').setLevel(logging.ERROR)
-                logging.getLogger("httpx").setLevel(logging.ERROR)
-                models = client.models.list()
-                logging.getLogger('openai').setLevel(logging.INFO)
-                logging.getLogger("httpx").setLevel(logging.INFO)
-                client.close()
+                catalogue = ModelCatalogue.get_shared()
+                cached_models = catalogue.get_models(service, secret_key) # a stale cache is shown right away and refreshed in the background
+                models = cached_models if cached_models is not None else catalogue.refresh(service, secret_key)
                 allow_manual_model_input = False
 
             options = []
             multiplier = 1_000_000
-            for model in models.data:
-                try:
-                    if model.model_extra:
-                        context_size: int = model.model_extra["context_length"]
-                        prompt_cost: float = float(model.model_extra["pricing"]["prompt"]) * multiplier
-                        completion_cost: float = float(model.model_extra["pricing"]["completion"]) * multiplier
-                        vision_available: str = ' | Vision Available' if model.model_extra["architecture"]["modality"] == 'text+image->text' else ''
-                        model_display_name = f"{model.id} | Context: {utils.format_context_size(context_size)} | Cost per 1M tokens: Prompt: {utils.format_price(prompt_cost)}. Completion: {utils.format_price(completion_cost)}{vision_available}"
-                        
-                        ClientBase.api_token_limits[model.id.split('/')[-1]] = context_size
-                    else:
-                        model_display_name = model.id
-                except:
+            for model in models:
+                if model.context_length is not None and model.prompt_price is not None and model.completion_price is not None:
+                    prompt_cost: float = model.prompt_price * multiplier
+                    completion_cost: float = model.completion_price * multiplier
+                    vision_available: str = ' | Vision Available' if model.is_vision_available else ''
+                    model_display_name = f"{model.id} | Context: {utils.format_context_size(model.context_length)} | Cost per 1M tokens: Prompt: {utils.format_price(prompt_cost)}. Completion: {utils.format_price(completion_cost)}{vision_available}"
+                else:
                     model_display_name = model.id
                 options.append((model_display_name, model.id))
             
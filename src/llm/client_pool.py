@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from threading import Lock
+from typing import Callable
+from openai import AsyncOpenAI, OpenAI
+
+class ClientPool:
+    """Keeps long-lived OpenAI clients for every endpoint, so calls reuse the keep-alive connections of earlier calls
+    instead of paying for DNS, TCP and TLS again.
+
+    There is one sync client per endpoint, which can be used from any thread. Async clients are bound to the event loop they are
+    first used on, so there is one per endpoint and event loop. Every client is health checked before it is handed out:
+    a client that has been closed or whose event loop has closed is dropped and replaced by a new one.
+    Callers that run into a connection error discard the client, so a client with dead connections is not handed out again.
+    """
+    __shared: 'ClientPool | None' = None
+    __shared_lock: Lock = Lock()
+
+    def __init__(self) -> None:
+        self.__sync_clients: dict[tuple[str, str], OpenAI] = {}
+        self.__async_clients: dict[tuple[str, str], dict[asyncio.AbstractEventLoop, AsyncOpenAI]] = {}
+        self.__unbound_async_clients: dict[tuple[str, str], AsyncOpenAI] = {} # created in advance, not used on any event loop yet
+        self.__created_count: int = 0
+        self.__lock = Lock()
+
+    @staticmethod
+    def get_shared() -> 'ClientPool':
+        """Returns the pool shared by all LLM clients of the server, creating it on first use
+        """
+        with ClientPool.__shared_lock:
+            if not ClientPool.__shared:
+                ClientPool.__shared = ClientPool()
+            return ClientPool.__shared
+
+    @property
+    def created_count(self) -> int:
+        """How many clients this pool has created so far
+        """
+        return self.__created_count
+
+    def get_sync_client(self, endpoint: tuple[str, str], create: Callable[[], OpenAI]) -> OpenAI:
+        """Returns the sync client of an endpoint, creating it if there is no healthy one
+
+        Args:
+            endpoint (tuple[str, str]): The base URL and API key the client connects with
+            create (Callable[[], OpenAI]): Creates a new client for the endpoint
+
+        Returns:
+            OpenAI: The client. Must not be closed after the call
+        """
+        with self.__lock:
+            client = self.__sync_clients.get(endpoint)
+            if not client or client.is_closed():
+                client = self.__create(create)
+                self.__sync_clients[endpoint] = client
+            return client
+
+    def prepare_async_client(self, endpoint: tuple[str, str], create: Callable[[], AsyncOpenAI]) -> AsyncOpenAI:
+        """Creates an async client for an endpoint in advance, so the first call does not have to wait for it.
+        The client is bound to the first event loop that asks for a client of the endpoint
+
+        Args:
+            endpoint (tuple[str, str]): The base URL and API key the client connects with
+            create (Callable[[], AsyncOpenAI]): Creates a new client for the endpoint
+
+        Returns:
+            AsyncOpenAI: The prepared client
+        """
+        with self.__lock:
+            client = self.__unbound_async_clients.get(endpoint)
+            if not client:
+                client = self.__create(create)
+                self.__unbound_async_clients[endpoint] = client
+            return client
+
+    def get_async_client(self, endpoint: tuple[str, str], create: Callable[[], AsyncOpenAI]) -> AsyncOpenAI:
+        """Returns the async client of an endpoint for the running event loop, creating it if there is no healthy one.
+        Needs to be called from within the event loop the client is going to be used on
+
+        Args:
+            endpoint (tuple[str, str]): The base URL and API key the client connects with
+            create (Callable[[], AsyncOpenAI]): Creates a new client for the endpoint
+
+        Returns:
+            AsyncOpenAI: The client. Must not be closed after the call
+        """
+        loop = asyncio.get_running_loop()
+        with self.__lock:
+            clients_by_loop = self.__async_clients.setdefault(endpoint, {})
+            for client_loop in [client_loop for client_loop in clients_by_loop if client_loop.is_closed()]:
+                del clients_by_loop[client_loop] # the connections of a client used on a closed loop are dead and cannot be closed anymore
+            client = clients_by_loop.get(loop)
+            if not client or client.is_closed():
+                client = self.__unbound_async_clients.pop(endpoint, None)
+                if not client or client.is_closed():
+                    client = self.__create(create)
+                clients_by_loop[loop] = client
+            return client
+
+    def discard(self, client: OpenAI | AsyncOpenAI) -> bool:
+        """Removes a client from the pool, e.g. after a connection error. The next call to the endpoint gets a new client.
+        The caller is responsible for closing the discarded client
+
+        Args:
+            client (OpenAI | AsyncOpenAI): The client to remove
+
+        Returns:
+            bool: True if the client was part of the pool
+        """
+        with self.__lock:
+            for endpoint, sync_client in list(self.__sync_clients.items()):
+                if sync_client is client:
+                    del self.__sync_clients[endpoint]
+                    return True
+            for clients_by_loop in self.__async_clients.values():
+                for loop, async_client in list(clients_by_loop.items()):
+                    if async_client is client:
+                        del clients_by_loop[loop]
+                        return True
+            for endpoint, async_client in list(self.__unbound_async_clients.items()):
+                if async_client is client:
+                    del self.__unbound_async_clients[endpoint]
+                    return True
+        return False
+
+    def close(self):
+        """Closes the sync clients and forgets all clients. Async clients are left to be cleaned up with their event loops
+        """
+        with self.__lock:
+            for client in self.__sync_clients.values():
+                try:
+                    client.close()
+                except Exception as e:
+                    logging.debug(f"Error closing LLM client: {e}")
+            self.__sync_clients.clear()
+            self.__async_clients.clear()
+            self.__unbound_async_clients.clear()
+
+    def __create(self, create: Callable):
+        self.__created_count += 1
+        return create()
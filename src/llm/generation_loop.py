@@ -0,0 +1,81 @@
+import asyncio
+import concurrent.futures
+import logging
+from threading import Lock, Thread
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar('T')
+
+class GenerationLoop:
+    """A single asyncio event loop running on a background thread for as long as the server lives.
+
+    Generation jobs are submitted as coroutines from any thread. Running all of them on the same loop means
+    the loop does not have to be built and torn down for every NPC turn, and async HTTP clients bound to this loop
+    can keep their connections alive between turns.
+    """
+    __shared: 'GenerationLoop | None' = None
+    __shared_lock: Lock = Lock()
+
+    def __init__(self, name: str = "MantellaGenerationLoop") -> None:
+        """
+        Args:
+            name (str, optional): Name of the background thread. Defaults to "MantellaGenerationLoop".
+        """
+        self.__loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self.__thread: Thread = Thread(target=self.__run, name=name, daemon=True)
+        self.__thread.start()
+
+    @staticmethod
+    def get_shared() -> 'GenerationLoop':
+        """Returns the loop shared by the whole server, starting it on first use
+
+        Returns:
+            GenerationLoop: The shared generation loop
+        """
+        with GenerationLoop.__shared_lock:
+            if not GenerationLoop.__shared or not GenerationLoop.__shared.is_running:
+                GenerationLoop.__shared = GenerationLoop()
+            return GenerationLoop.__shared
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self.__loop
+
+    @property
+    def is_running(self) -> bool:
+        return self.__thread.is_alive() and not self.__loop.is_closed()
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        """Schedules a coroutine on the loop. Safe to call from any thread other than the loop's own
+
+        Args:
+            coroutine (Coroutine[Any, Any, T]): The job to run
+
+        Returns:
+            concurrent.futures.Future[T]: Resolves to the result of the coroutine
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.__loop)
+
+    def stop(self):
+        """Stops the loop after cancelling every job still running on it and waits for the background thread to end
+        """
+        if not self.is_running:
+            return
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+
+    def __run(self):
+        asyncio.set_event_loop(self.__loop)
+        try:
+            self.__loop.run_forever()
+        finally:
+            try:
+                pending = asyncio.all_tasks(self.__loop)
+                for task in pending:
+                    task.cancel()
+                self.__loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                self.__loop.run_until_complete(self.__loop.shutdown_asyncgens())
+            except Exception as e:
+                logging.error(f"Error shutting down generation loop: {e}")
+            finally:
+                self.__loop.close()
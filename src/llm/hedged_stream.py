@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from threading import Lock
+import time
+from typing import AsyncGenerator, Callable
+
+class EndpointLatencyStats:
+    """Keeps an exponentially weighted moving average of the time to first token of every LLM endpoint.
+    Decides in which order the endpoints are tried: the fastest first, endpoints without any measurement in their configured order after that
+    """
+    SMOOTHING: float = 0.3 # weight of the newest measurement
+    FAILURE_PENALTY_SECONDS: float = 10 # counted as the time to first token of a request that failed
+
+    def __init__(self) -> None:
+        self.__average_first_token: dict[str, float] = {}
+        self.__lock = Lock()
+
+    def get_average_first_token(self, endpoint: str) -> float | None:
+        """Returns the average time to first token of an endpoint in seconds or None if it has not been measured yet
+        """
+        with self.__lock:
+            return self.__average_first_token.get(endpoint)
+
+    def record_first_token(self, endpoint: str, seconds: float):
+        """Records how long an endpoint took to send the first token of a reply
+        """
+        with self.__lock:
+            average = self.__average_first_token.get(endpoint)
+            self.__average_first_token[endpoint] = seconds if average is None else average + self.SMOOTHING * (seconds - average)
+
+    def record_no_first_token(self, endpoint: str, waited_seconds: float):
+        """Records that an endpoint had not sent its first token after waiting this long when another endpoint won the race.
+        Only raises the average, as the actual time to first token would have been even longer
+        """
+        average = self.get_average_first_token(endpoint)
+        if average is None or waited_seconds > average:
+            self.record_first_token(endpoint, waited_seconds)
+
+    def record_failure(self, endpoint: str):
+        """Records that a request to an endpoint failed before sending any token
+        """
+        self.record_first_token(endpoint, self.FAILURE_PENALTY_SECONDS)
+
+    def order(self, endpoints: list[str]) -> list[str]:
+        """Returns the endpoints in the order they should be tried
+        """
+        def sort_key(indexed_endpoint: tuple[int, str]) -> tuple[bool, float, int]:
+            index, endpoint = indexed_endpoint
+            average = self.get_average_first_token(endpoint)
+            return average is None, average if average is not None else 0, index
+        return [endpoint for _, endpoint in sorted(enumerate(endpoints), key=sort_key)]
+
+
+class HedgedStream:
+    """Streams the reply of whichever of several LLM endpoints sends its first token first.
+
+    The request goes to the endpoint with the best average time to first token. If it has not sent its first token within the hedge delay,
+    the same request also goes to the next endpoint, and so on. An endpoint whose stream ends without any token (failed) is replaced by the next one right away.
+    As soon as one of the endpoints sends its first token, all other requests are cancelled and the reply of the winner is streamed.
+    """
+    def __init__(self, stats: EndpointLatencyStats, hedge_delay: float) -> None:
+        """
+        Args:
+            stats (EndpointLatencyStats): The latency statistics that decide the order of the endpoints and are updated with the results of the race
+            hedge_delay (float): Seconds to wait for the first token of an endpoint before also sending the request to the next one
+        """
+        self.__stats: EndpointLatencyStats = stats
+        self.__hedge_delay: float = hedge_delay
+
+    async def stream(self, endpoints: dict[str, Callable[[], AsyncGenerator[str | None, None]]]) -> AsyncGenerator[str | None, None]:
+        """Races the endpoints and streams the reply of the winner
+
+        Args:
+            endpoints (dict[str, Callable[[], AsyncGenerator[str | None, None]]]): Name of each endpoint and a function starting the streaming call to it, in their configured order
+
+        Yields:
+            str | None: The reply of the endpoint that sent its first token first. Nothing if all endpoints failed
+        """
+        waiting = self.__stats.order(list(endpoints.keys()))
+        # first token task -> (endpoint, its stream, start time)
+        racing: dict[asyncio.Task, tuple[str, AsyncGenerator[str | None, None], float]] = {}
+        winner: tuple[str, AsyncGenerator[str | None, None]] | None = None
+        first_content: str | None = None
+        try:
+            while winner is None and (racing or waiting):
+                if waiting and (not racing or self.__is_hedge_due(racing)):
+                    endpoint = waiting.pop(0)
+                    response = endpoints[endpoint]()
+                    racing[asyncio.ensure_future(self.__get_first_content(response))] = (endpoint, response, time.perf_counter())
+                    if len(racing) > 1:
+                        logging.log(28, f"No reply from the LLM yet, also sending the request to '{endpoint}'")
+                timeout = self.__time_until_hedge(racing) if waiting else None
+                done, _ = await asyncio.wait(racing.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    endpoint, response, start = racing.pop(task)
+                    content = task.result() if not task.exception() else None
+                    if content is None:
+                        self.__stats.record_failure(endpoint)
+                        await response.aclose()
+                    elif winner is None:
+                        self.__stats.record_first_token(endpoint, time.perf_counter() - start)
+                        winner = endpoint, response
+                        first_content = content
+                    else: # a second endpoint answered in the same moment, the first one found wins
+                        await response.aclose()
+        finally:
+            await self.__cancel(racing, winner is not None)
+
+        if winner is None:
+            return
+        endpoint, response = winner
+        if len(endpoints) > 1:
+            logging.debug(f"Streaming the reply of '{endpoint}'")
+        try:
+            yield first_content
+            async for content in response:
+                yield content
+        finally:
+            await response.aclose()
+
+    def __is_hedge_due(self, racing: dict[asyncio.Task, tuple[str, AsyncGenerator[str | None, None], float]]) -> bool:
+        return self.__time_until_hedge(racing) <= 0
+
+    def __time_until_hedge(self, racing: dict[asyncio.Task, tuple[str, AsyncGenerator[str | None, None], float]]) -> float:
+        if not racing:
+            return 0
+        last_start = max(start for _, _, start in racing.values())
+        return max(0, last_start + self.__hedge_delay - time.perf_counter())
+
+    async def __cancel(self, racing: dict[asyncio.Task, tuple[str, AsyncGenerator[str | None, None], float]], has_winner: bool):
+        """Cancels the requests that lost the race (or all of them if the race itself got cancelled)
+        """
+        for task, (endpoint, response, start) in racing.items():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await response.aclose()
+            if has_winner:
+                self.__stats.record_no_first_token(endpoint, time.perf_counter() - start)
+
+    @staticmethod
+    async def __get_first_content(response: AsyncGenerator[str | None, None]) -> str | None:
+        async for content in response:
+            if content:
+                return content
+        return None
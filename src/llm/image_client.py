@@ -1,3 +1,4 @@
+import asyncio
 import src.utils as utils
 import logging
 from openai.types.chat import ChatCompletionMessageParam
@@ -21,6 +22,8 @@ class ImageClient(ClientBase):
             setup_values = {'api_url': config.llm_api, 'llm': config.llm, 'llm_params': config.llm_params, 'custom_token_count': config.custom_token_count}
         
         super().__init__(**setup_values, secret_key_files=[image_secret_key_file, secret_key_file])
+        if config.llm_response_cache: # descriptions of identical frames are reused
+            self._set_up_response_cache(config.save_folder, config.llm_response_cache_size)
 
         if self.__custom_vision_model:
             if self._is_local:
@@ -44,8 +47,9 @@ class ImageClient(ClientBase):
                                                 config.game_path)
     
     @utils.time_it
-    def add_image_to_messages(self, openai_messages: list[ChatCompletionMessageParam], vision_hints: str) -> list[ChatCompletionMessageParam]:
-        '''Adds a captured image to the latest user message
+    async def add_image_to_messages(self, openai_messages: list[ChatCompletionMessageParam], vision_hints: str) -> list[ChatCompletionMessageParam]:
+        '''Adds a captured image to the latest user message. 
+        Capturing the image and transcribing it with a custom vision model do not block the event loop the NPC replies are streamed on
 
         Args:
             openai_messages (list[ChatCompletionMessageParam]): The existing list of messages in the OpenAI format
@@ -53,7 +57,7 @@ class ImageClient(ClientBase):
         Returns:
             list[ChatCompletionMessageParam]: The updated list of messages with the image added
         '''
-        image = self.__image_manager.get_image()
+        image = await asyncio.to_thread(self.__image_manager.get_image)
         if image is None:
             return openai_messages
         
@@ -78,7 +82,7 @@ class ImageClient(ClientBase):
             else:
                 vision_prompt = self.__vision_prompt
             image_msg_instance = ImageMessage(self.__config, image, vision_prompt, self.__detail, True)
-            image_transcription = self.request_call(image_msg_instance)
+            image_transcription = await self.arequest_call(image_msg_instance)
             if image_transcription:
                 last_punctuation = max(image_transcription.rfind(p) for p in self.__end_of_sentence_chars)
                 # filter transcription to full sentences
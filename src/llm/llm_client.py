@@ -1,9 +1,13 @@
+from typing import AsyncGenerator
 import src.utils as utils
 import logging
 from openai import AsyncOpenAI
 from src.config.config_loader import ConfigLoader
 from src.llm.image_client import ImageClient
 from src.llm.client_base import ClientBase
+from src.llm.hedged_stream import EndpointLatencyStats, HedgedStream
+from src.llm.message_thread import message_thread
+from src.llm.messages import Message
 
 class LLMClient(ClientBase):
     '''LLM class to handle NPC responses
@@ -17,8 +21,41 @@ class LLMClient(ClientBase):
         else:
             logging.log(23, f"Running Mantella with '{config.llm}'. The language model can be changed in the Mantella UI: http://localhost:4999/ui")
 
-        self._startup_async_client: AsyncOpenAI | None = self.generate_async_client() # initialize first client in advance of sending first LLM request to save time
+        if config.llm_response_cache:
+            self._set_up_response_cache(config.save_folder, config.llm_response_cache_size)
+        self._startup_async_client: AsyncOpenAI | None = self._client_pool.prepare_async_client(self._get_client_endpoint(), self.generate_async_client) # initialize first client in advance of sending first LLM request to save time
 
         if config.vision_enabled:
             logging.info(f"Setting up vision language model...")
-            self._image_client: ImageClient | None = ImageClient(config, secret_key_file, image_secret_key_file)
\ No newline at end of file
+            self._image_client: ImageClient | None = ImageClient(config, secret_key_file, image_secret_key_file)
+
+        self.__backup_clients: list[ClientBase] = []
+        for api_url, model in config.llm_backup_endpoints if config.llm_backup_endpoints else []:
+            try:
+                backup_client = ClientBase(api_url, model if model else config.llm, config.llm_params, config.custom_token_count, [secret_key_file])
+                self.__backup_clients.append(backup_client)
+                logging.info(f"Using '{model}' via '{api_url}' as backup LLM")
+            except Exception as e:
+                logging.error(f"Could not set up backup LLM '{model}' via '{api_url}': {e}")
+        self.__latency_stats: EndpointLatencyStats = EndpointLatencyStats()
+        self.__hedged_stream: HedgedStream = HedgedStream(self.__latency_stats, config.llm_hedge_delay if config.llm_hedge_delay else 1.5)
+
+    @property
+    def latency_stats(self) -> EndpointLatencyStats:
+        """The time to first token of the main and backup LLMs
+        """
+        return self.__latency_stats
+
+    async def streaming_call(self, messages: Message | message_thread, is_multi_npc: bool) -> AsyncGenerator[str | None, None]:
+        """A streaming call to the LLM. If backup LLMs are set, the call is hedged across the main and the backup LLMs, see :class:`HedgedStream`
+        """
+        if not self.__backup_clients:
+            async for content in super().streaming_call(messages, is_multi_npc):
+                yield content
+            return
+
+        endpoints = {self.endpoint_name: lambda: super(LLMClient, self).streaming_call(messages, is_multi_npc)}
+        for backup_client in self.__backup_clients:
+            endpoints[backup_client.endpoint_name] = lambda client=backup_client: client.streaming_call(messages, is_multi_npc)
+        async for content in self.__hedged_stream.stream(endpoints):
+            yield content
@@ -3,6 +3,7 @@ from src.llm.llm_model_list import LLMModelList
 from src.llm.ai_client import AIClient
 from src.llm.message_thread import message_thread
 from src.llm.messages import Message
+from src.llm.request_lanes import RequestLaneEnum
 
 
 class LLMTestClient(AIClient):
@@ -33,7 +34,7 @@ class LLMTestClient(AIClient):
             for word in reply:
                 yield word + " "
 
-    def request_call(self, messages: Message | message_thread) -> str | None:
+    def request_call(self, messages: Message | message_thread, lane: RequestLaneEnum = RequestLaneEnum.BACKGROUND) -> str | None:
         """A standard sync request call to the LLM. 
         This method generates a new client, calls 'client.chat.completions.create', returns the result and closes when finished
 
@@ -44,6 +45,11 @@ class LLMTestClient(AIClient):
             str | None: The reply of the LLM
         """
         pass
+
+    async def arequest_call(self, messages: Message | message_thread, lane: RequestLaneEnum = RequestLaneEnum.BACKGROUND) -> str | None:
+        """The async version of request_call
+        """
+        return self.request_call(messages, lane)
     
     def get_count_tokens(self, messages: message_thread | list[Message] | Message | str) -> int:
         """Returns the number of tokens used by a list of messages
@@ -55,6 +61,16 @@ class LLMTestClient(AIClient):
         """
         return False
 
+    def count_message_tokens(self, message: Message) -> int:
+        """Returns the number of tokens a single message adds to a list of messages
+        """
+        return 0
+
+    def get_max_message_tokens(self, token_limit_percent: float) -> float:
+        """Returns how many tokens a list of messages can use before it is too long for token_limit_percent of the context size of the model
+        """
+        return float('inf')
+
     @staticmethod
     def get_model_list(service: str, secret_key_file: str, default_model: str = "google/gemma-2-9b-it:free", is_vision: bool = False) -> LLMModelList:
         """Returns a list of available LLM models
@@ -1,4 +1,5 @@
-from copy import deepcopy
+import bisect
+import itertools
 from src.config.config_loader import ConfigLoader
 from src.llm.messages import Message, SystemMessage, UserMessage, AssistantMessage, ImageMessage, ImageDescriptionMessage
 from typing import Callable
@@ -12,11 +13,16 @@ class message_thread():
     def __init__(self, config: ConfigLoader, initial_system_message: str | SystemMessage | None) -> None:
         self.__messages: list[Message] = []
         self.__config = config
+        # running token count of the thread, see get_token_count. A message is expected to be in a thread at most once
+        self.__token_counter_key: str | None = None
+        self.__token_total: int = 0
+        self.__token_counts: dict[int, int] = {} # id(message) -> the count included in __token_total
+        self.__uncounted: dict[int, Message] = {} # messages added or changed since the last count
         if not initial_system_message:
             return
         if isinstance(initial_system_message, str):
             initial_system_message = SystemMessage(initial_system_message, config)
-        self.__messages.append(initial_system_message)
+        self.__append(initial_system_message)
     
     def __len__(self) -> int:
         return self.__messages.__len__()
@@ -34,10 +40,7 @@ class message_thread():
     def transform_to_text(messages: list[Message]) -> str:
         result = ""
         for m in messages:
-            original_is_multi = m.is_multi_npc_message
-            m.is_multi_npc_message = True
-            result += f"{m.get_formatted_content()}\n"
-            m.is_multi_npc_message = original_is_multi
+            result += f"{m.get_multi_npc_formatted_content()}\n"
         return result
     
     @staticmethod
@@ -55,8 +58,63 @@ class message_thread():
     def get_openai_messages(self) -> list[ChatCompletionMessageParam]:
         return message_thread.transform_to_openai_messages(self.__messages)
 
+    def get_token_count(self, counter_key: str, count_message_tokens: Callable[[Message], int]) -> int:
+        """Returns the sum of the token counts of all messages in the thread.
+        The thread keeps a running total that is adjusted when messages are added, removed or changed, 
+        so only messages that have been added or changed since the last call are counted
+
+        Args:
+            counter_key (str): Identifies the way of counting, e.g. the name of the encoding. Counts of a different counter_key are not reused
+            count_message_tokens (Callable[[Message], int]): Counts the tokens of a single message
+
+        Returns:
+            int: The total token count of the messages
+        """
+        if counter_key != self.__token_counter_key:
+            self.__token_counter_key = counter_key
+            self.__token_total = 0
+            self.__token_counts = {}
+            self.__uncounted = {id(message): message for message in self.__messages}
+        # swapped out first, so that a message changed by another thread while counting is counted again next time
+        uncounted, self.__uncounted = self.__uncounted, {}
+        for key, message in uncounted.items():
+            count = message.get_token_count(counter_key, count_message_tokens)
+            self.__token_total += count - self.__token_counts.get(key, 0)
+            self.__token_counts[key] = count
+        return self.__token_total
+
+    def _on_message_modified(self, message: Message):
+        """Called by a message of this thread whenever it has changed
+        """
+        self.__uncounted[id(message)] = message
+
+    def __append(self, message: Message):
+        self.__messages.append(message)
+        message._add_owner(self)
+        self.__uncounted[id(message)] = message
+
+    def __forget(self, message: Message):
+        message._remove_owner(self)
+        key = id(message)
+        self.__token_total -= self.__token_counts.pop(key, 0)
+        self.__uncounted.pop(key, None)
+
+    def __set_messages(self, messages: list[Message]):
+        """Replaces the messages of the thread, keeping the running token count of the messages that stay
+        """
+        kept = {id(message) for message in messages}
+        for message in self.__messages:
+            if id(message) not in kept:
+                self.__forget(message)
+        current = {id(message) for message in self.__messages}
+        for message in messages:
+            if id(message) not in current:
+                message._add_owner(self)
+                self.__uncounted[id(message)] = message
+        self.__messages = messages
+
     def add_message(self, new_message: UserMessage | AssistantMessage | ImageMessage | ImageDescriptionMessage):
-        self.__messages.append(new_message)
+        self.__append(new_message)
 
     @utils.time_it
     def add_non_system_messages(self, new_messages: list[Message]):
@@ -67,35 +125,49 @@ class message_thread():
         """
         for new_message in new_messages:
             if not isinstance(Message, SystemMessage):
-                self.__messages.append(new_message)
+                self.__append(new_message)
     
     @utils.time_it
-    def reload_message_thread(self, new_prompt: str, is_too_long: Callable[[list[Message], float], bool], percent_modifier: float):
-        """Reloads this message_thread with a new system_message prompt and drops all but the last X messages
+    def reload_message_thread(self, new_prompt: str, count_message_tokens: Callable[[Message], int], max_tokens: float):
+        """Reloads this message_thread with a new system_message prompt and keeps as many of the last talk messages as fit into max_tokens
 
         Args:
             new_prompt (str): the new prompt for the system_message
-            last_messages_to_keep (int): how many of the last messages to keep
+            count_message_tokens (Callable[[Message], int]): returns the (cached) token count of a single message
+            max_tokens (float): how many tokens the kept messages can use in total
         """
-        result: list[Message] = []
-        result.append(SystemMessage(new_prompt, self.__config))
-        messages_to_keep: list[Message]  = []
-        for talk_message in reversed(self.get_talk_only()):
-            messages_to_keep.append(talk_message)
-            if is_too_long(messages_to_keep, percent_modifier):
-                messages_to_keep = messages_to_keep[:-1]
-                break
-            
-        messages_to_keep.reverse()
-        result.extend(messages_to_keep)
-        self.__messages = result
+        talk_messages = [message for message in self.__messages if isinstance(message, (AssistantMessage, UserMessage)) and not message.is_system_generated_message]
+        # token counts of the last 1, 2, 3, ... talk messages, always increasing, so the longest suffix that fits can be found with a binary search
+        suffix_token_counts = list(itertools.accumulate(count_message_tokens(message) for message in reversed(talk_messages)))
+        messages_to_keep_count = bisect.bisect_right(suffix_token_counts, max_tokens)
+
+        result: list[Message] = [SystemMessage(new_prompt, self.__config)]
+        if messages_to_keep_count > 0:
+            result.extend(talk_messages[-messages_to_keep_count:])
+        self.__set_messages(result)
+
+    @utils.time_it
+    def remove_summarized_messages(self, new_prompt: str, summarized_messages: list[Message]):
+        """Removes messages that have been summarized and sets a new prompt for the system_message, which is expected to contain the summary.
+        Messages are recognized by identity, so snapshots of them (see get_talk_only) can be passed in.
+        Messages that have already left the thread in the meantime are ignored
+
+        Args:
+            new_prompt (str): the new prompt for the system_message
+            summarized_messages (list[Message]): the messages (or snapshots of them) that are covered by the summary
+        """
+        summarized = {id(message.original) for message in summarized_messages}
+        self.__set_messages([message for message in self.__messages if id(message) not in summarized])
+        if len(self.__messages) > 0 and isinstance(self.__messages[0], SystemMessage):
+            self.__messages[0].text = new_prompt
 
     @utils.time_it
     def get_talk_only(self, include_system_generated_messages: bool = False) -> list[Message]:
-        """Returns a deepcopy of the messages in the conversation thread without the system_message
+        """Returns read-only snapshots of the messages in the conversation thread without the system_message.
+        Snapshots share their sentences and speaking Characters with the thread, and unchanged messages hand out the same snapshot on every call
 
         Args:
-            include_system_generated_messages (bool): if true, does not include user- and assistant_messages that are flagged as system messages
+            include_system_generated_messages (bool): if false, does not include user- and assistant_messages that are flagged as system messages
 
         Returns:
             list[message]: the selection of messages in question
@@ -103,10 +175,8 @@ class message_thread():
         result = []
         for message in self.__messages:
             if isinstance(message, (AssistantMessage, UserMessage)):
-                if include_system_generated_messages:
-                    result.append(deepcopy(message)) # TODO: Once assistant_message uses Character instead of str, this needs to be improved, don't want deepcopies of Character
-                elif not message.is_system_generated_message:
-                    result.append(deepcopy(message))
+                if include_system_generated_messages or not message.is_system_generated_message:
+                    result.append(message.snapshot())
         return result
     
     @utils.time_it
@@ -142,6 +212,7 @@ class message_thread():
                 m.is_multi_npc_message = multi_npc_conversation
             for m in messages_to_remove:
                 self.__messages.remove(m)
+                self.__forget(m)
     
     def has_message_type(self, message_type: type) -> bool:
         """Checks if there is any message of the specified type in the messages.
@@ -163,9 +234,10 @@ class message_thread():
         """
         for idx, msg in enumerate(self.__messages):
             if isinstance(msg, message_type):
-                self.__messages[idx] = new_message
-                # Move the new message to the end of the list
-                self.__messages.append(self.__messages.pop(idx))
+                self.__messages.pop(idx)
+                self.__forget(msg)
+                # Add the new message to the end of the list
+                self.__append(new_message)
                 break
             
     def delete_all_message_type(self, message_type: type):
@@ -174,7 +246,7 @@ class message_thread():
         Args:
             message_type (type): The type of messages to delete.
         """
-        self.__messages = [msg for msg in self.__messages if not isinstance(msg, message_type)]
+        self.__set_messages([msg for msg in self.__messages if not isinstance(msg, message_type)])
 
     def replace_or_add_message(self, message_instance, message_type: type):
         if self.has_message_type(message_type):
@@ -1,4 +1,8 @@
 from abc import ABC, abstractmethod
+from copy import copy
+import itertools
+import weakref
+from typing import Any, Callable
 from openai.types.chat import ChatCompletionMessageParam
 from src.config.definitions.llm_definitions import NarrationIndicatorsEnum
 from src.config.config_loader import ConfigLoader
@@ -10,11 +14,23 @@ from src import utils
 
 class Message(ABC):
     """Base class for messages 
+
+    A message can hand out read-only snapshots of itself (see `snapshot`). Snapshots share everything they don't own, like the `Character` speaking a sentence, 
+    and trying to change one raises a TypeError
     """
+    __modification_counter = itertools.count(1)
+
     def __init__(self, text: str, config: ConfigLoader, is_system_generated_message: bool = False):
+        self.__version: int = 0
+        self.__token_count_cache: tuple[str, int, int] | None = None # (counter_key, version, count)
+        self.__owners: weakref.WeakSet | None = None # the message_threads holding this message, told about every change. Created with the first one
+        self.__render_cache: tuple[int, dict[str, Any]] = (0, {}) # (version, {render name: rendered value})
         self.__text: str = text
         self.__is_multi_npc_message: bool = False
         self.__is_system_generated_message = is_system_generated_message
+        self.__is_frozen: bool = False
+        self.__snapshot: Message | None = None # the latest snapshot, reused as long as its version matches
+        self.__original: Message | None = None # the message a snapshot has been taken of
         if config.narration_indicators == NarrationIndicatorsEnum.BRACKETS:
             self.__narration_start: str = "["
             self.__narration_end: str = "]"
@@ -31,7 +47,9 @@ class Message(ABC):
     
     @text.setter
     def text(self, text: str):
+        self._check_mutable()
         self.__text = text
+        self._mark_modified()
 
     @property
     def narration_start(self) -> str:
@@ -47,7 +65,10 @@ class Message(ABC):
     
     @is_multi_npc_message.setter
     def is_multi_npc_message(self, is_multi_npc_message: bool):
-        self.__is_multi_npc_message = is_multi_npc_message
+        if is_multi_npc_message != self.__is_multi_npc_message:
+            self._check_mutable()
+            self.__is_multi_npc_message = is_multi_npc_message
+            self._mark_modified()
 
     @property
     def is_system_generated_message(self) -> bool:
@@ -55,7 +76,139 @@ class Message(ABC):
     
     @is_system_generated_message.setter
     def is_system_generated_message(self, is_system_generated_message: bool):
-        self.__is_system_generated_message = is_system_generated_message
+        if is_system_generated_message != self.__is_system_generated_message:
+            self._check_mutable()
+            self.__is_system_generated_message = is_system_generated_message
+            self._mark_modified()
+
+    @property
+    def is_frozen(self) -> bool:
+        """True if this message is a read-only snapshot
+        """
+        return self.__is_frozen
+
+    @property
+    def original(self) -> 'Message':
+        """The message this snapshot has been taken of, or the message itself if it is not a snapshot
+        """
+        return self.__original if self.__original else self
+
+    def __getstate__(self) -> dict[str, Any]:
+        # copies (snapshots, deep copies, ...) are not held by the threads holding this message
+        state = self.__dict__.copy()
+        del state["_Message__owners"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        self.__owners = None
+
+    def _mark_modified(self):
+        """Needs to be called whenever something changes that ends up in the formatted content of the message. Invalidates the cached token count
+        and lets the message_threads holding the message know that it needs to be counted again
+        """
+        self.__version = next(Message.__modification_counter)
+        if self.__owners:
+            for owner in list(self.__owners):
+                owner._on_message_modified(self)
+
+    def _add_owner(self, owner):
+        """Called by a message_thread the message is added to. The thread is only referenced weakly
+        """
+        if self.__owners is None:
+            self.__owners = weakref.WeakSet()
+        self.__owners.add(owner)
+
+    def _remove_owner(self, owner):
+        """Called by a message_thread the message is removed from
+        """
+        if self.__owners is not None:
+            self.__owners.discard(owner)
+
+    def _check_mutable(self):
+        """Needs to be called before anything about the message is changed
+
+        Raises:
+            TypeError: If this message is a read-only snapshot
+        """
+        if self.__is_frozen:
+            raise TypeError(f"Can't modify a snapshot of a {type(self).__name__}")
+
+    def _copy_state(self):
+        """Called on a fresh shallow copy made by `snapshot`. Subclasses replace the containers they append to with copies of their own,
+        so that later changes to the original don't show up in the snapshot
+        """
+        pass
+
+    def snapshot(self) -> 'Message':
+        """Returns a read-only copy of this message as it is right now. The snapshot is a shallow copy: strings, sentences and 
+        the `Character`s speaking them are shared with the original instead of being copied.
+        As long as the message doesn't change, every call returns the same snapshot
+
+        Returns:
+            Message: A frozen message of the same type
+        """
+        if self.__is_frozen:
+            return self
+        snapshot = self.__snapshot
+        if snapshot and snapshot.__version == self.__version:
+            return snapshot
+        snapshot = copy(self)
+        snapshot._copy_state()
+        snapshot.__snapshot = None
+        snapshot.__original = self
+        snapshot.__is_frozen = True
+        self.__snapshot = snapshot
+        return snapshot
+
+    def _get_memoized(self, name: str, render: Callable[[], Any]) -> Any:
+        """Returns a rendered form of the message (formatted text, openai message, ...), rendering it only if the message has changed since it was last rendered.
+        Every change that calls `_mark_modified` invalidates all rendered forms
+
+        Args:
+            name (str): Identifies the rendered form
+            render (Callable[[], Any]): Renders the form if there is no valid cached one
+
+        Returns:
+            Any: The cached or freshly rendered form. Must not be changed by the caller
+        """
+        version, renders = self.__render_cache
+        if version != self.__version:
+            renders = {}
+            self.__render_cache = (self.__version, renders)
+        elif name in renders:
+            return renders[name]
+        rendered = render()
+        renders[name] = rendered
+        return rendered
+
+    def get_multi_npc_formatted_content(self) -> str:
+        """Returns the formatted content as it would look in a multi-NPC conversation, without changing the message
+        """
+        if self.__is_multi_npc_message:
+            return self.get_formatted_content()
+        view = copy(self)
+        view.__is_multi_npc_message = True
+        view.__render_cache = (0, {})
+        return view.get_formatted_content()
+
+    def get_token_count(self, counter_key: str, count_tokens: Callable[['Message'], int]) -> int:
+        """Returns the token count of this message. The count is cached and only calculated again if the message has changed since
+
+        Args:
+            counter_key (str): Identifies the way of counting, e.g. the name of the encoding. A cached count of a different counter_key is not reused
+            count_tokens (Callable[[Message], int]): Counts the tokens of the message if there is no valid cached count
+
+        Returns:
+            int: The token count of the message
+        """
+        cache = self.__token_count_cache
+        version = self.__version
+        if cache and cache[0] == counter_key and cache[1] == version:
+            return cache[2]
+        count = count_tokens(self)
+        self.__token_count_cache = (counter_key, version, count)
+        return count
 
     @abstractmethod
     def get_openai_message(self) -> ChatCompletionMessageParam:
@@ -85,11 +238,18 @@ class SystemMessage(Message):
         return self.text
 
     def get_openai_message(self) -> ChatCompletionMessageParam:
-        return {"role":"system", "content": self.get_formatted_content(),}
+        return dict(self._get_memoized("openai_message", self.__render_openai_message)) # a copy, callers may change it
     
     def get_dict_formatted_string(self) -> str:
-        dictionary = {"role":"system", "content": self.get_formatted_content(),}
-        return f"{dictionary}"
+        return self._get_memoized("dict_formatted_string", lambda: f"{self.__render_openai_message()}")
+
+    def __render_openai_message(self) -> ChatCompletionMessageParam:
+        return {"role":"system", "content": self.get_formatted_content(),}
+
+class SituationMessage(SystemMessage):
+    """A small system message holding the volatile context of a conversation (time, weather, location, ...). 
+    Sent after the latest messages so that the main system prompt and the conversation so far stay an unchanged prefix that LLM providers can cache
+    """
         
 class AssistantMessage(Message):
     """An assistant message containing the response of an LLM to a request.
@@ -98,11 +258,19 @@ class AssistantMessage(Message):
     def __init__(self, config: ConfigLoader, is_system_generated_message: bool = False):
         super().__init__("", config, is_system_generated_message)
         self.__sentences: list[SentenceContent] = []
+
+    def _copy_state(self):
+        self.__sentences = self.__sentences.copy()
     
     def add_sentence(self, new_sentence: Sentence):
+        self._check_mutable()
         self.__sentences.append(new_sentence.content)
+        self._mark_modified()
 
     def get_formatted_content(self) -> str:
+        return self._get_memoized("formatted_content", self.__format_content)
+
+    def __format_content(self) -> str:
         if len(self.__sentences) < 1:
             return ""
         
@@ -126,11 +294,13 @@ class AssistantMessage(Message):
         return result
 
     def get_openai_message(self) -> ChatCompletionMessageParam:
-        return {"role":"assistant", "content": self.get_formatted_content(),}
+        return dict(self._get_memoized("openai_message", self.__render_openai_message)) # a copy, callers may change it
     
     def get_dict_formatted_string(self) -> str:
-        dictionary = {"role":"assistant", "content": self.get_formatted_content(),}
-        return f"{dictionary}"
+        return self._get_memoized("dict_formatted_string", lambda: f"{self.__render_openai_message()}")
+
+    def __render_openai_message(self) -> ChatCompletionMessageParam:
+        return {"role":"assistant", "content": self.get_formatted_content(),}
 
 class UserMessage(Message):
     """A user message sent to the LLM. Contains the text from the player and optionally it's name.
@@ -141,9 +311,14 @@ class UserMessage(Message):
         self.__player_character_name: str = player_character_name
         self.__ingame_events: list[str] = []
         self.__time: tuple[str,str] | None = None
-        
+
+    def _copy_state(self):
+        self.__ingame_events = self.__ingame_events.copy()
 
     def get_formatted_content(self) -> str:
+        return self._get_memoized("formatted_content", self.__format_content)
+
+    def __format_content(self) -> str:
         result = ""
         result += self.get_ingame_events_text()
         if self.__time:
@@ -157,16 +332,20 @@ class UserMessage(Message):
         return result
     
     def get_openai_message(self) -> ChatCompletionMessageParam:
-        return {"role":"user", "content": self.get_formatted_content(),}
+        return dict(self._get_memoized("openai_message", self.__render_openai_message)) # a copy, callers may change it
     
     def get_dict_formatted_string(self) -> str:
-        dictionary = {"role":"user", "content": self.get_formatted_content(),}
-        return f"{dictionary}"
+        return self._get_memoized("dict_formatted_string", lambda: f"{self.__render_openai_message()}")
+
+    def __render_openai_message(self) -> ChatCompletionMessageParam:
+        return {"role":"user", "content": self.get_formatted_content(),}
 
     def add_event(self, events: list[str]):
+        self._check_mutable()
         for event in events:
             if len(event) > 0:
                 self.__ingame_events.append(event)
+        self._mark_modified()
     
     def count_ingame_events(self) -> int:
         return len(self.__ingame_events)
@@ -178,7 +357,9 @@ class UserMessage(Message):
         return result
     
     def set_ingame_time(self, time: str, time_group: str):
+        self._check_mutable()
         self.__time = time, time_group
+        self._mark_modified()
 
 
 class ImageMessage(Message):
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+from threading import Lock, Thread
+import time
+from typing import Any
+from openai import OpenAI
+
+class ModelCatalogueEntry:
+    """A model offered by an LLM service, with what the service tells about it
+    """
+    def __init__(self, id: str, context_length: int | None = None, prompt_price: float | None = None, completion_price: float | None = None, modality: str | None = None) -> None:
+        """
+        Args:
+            id (str): The id of the model, e.g. 'google/gemma-2-9b-it:free'
+            context_length (int | None, optional): The context size of the model in tokens. Defaults to None.
+            prompt_price (float | None, optional): Price per prompt token in dollars, negative if unknown. Defaults to None.
+            completion_price (float | None, optional): Price per completion token in dollars, negative if unknown. Defaults to None.
+            modality (str | None, optional): The in- and outputs of the model, e.g. 'text+image->text'. Defaults to None.
+        """
+        self.id: str = id
+        self.context_length: int | None = context_length
+        self.prompt_price: float | None = prompt_price
+        self.completion_price: float | None = completion_price
+        self.modality: str | None = modality
+
+    @property
+    def is_vision_available(self) -> bool:
+        return self.modality == 'text+image->text'
+
+    @staticmethod
+    def from_model_extra(id: str, model_extra: dict[str, Any] | None) -> 'ModelCatalogueEntry':
+        """Reads an entry from a model of the `models.list()` response of OpenRouter, whose details are in its `model_extra`
+        """
+        if not model_extra:
+            return ModelCatalogueEntry(id)
+        try:
+            return ModelCatalogueEntry(id,
+                                       int(model_extra["context_length"]),
+                                       float(model_extra["pricing"]["prompt"]),
+                                       float(model_extra["pricing"]["completion"]),
+                                       model_extra["architecture"]["modality"])
+        except (KeyError, TypeError, ValueError):
+            return ModelCatalogueEntry(id)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"id": self.id, "context_length": self.context_length, "prompt_price": self.prompt_price, "completion_price": self.completion_price, "modality": self.modality}
+
+    @staticmethod
+    def from_dict(values: dict[str, Any]) -> 'ModelCatalogueEntry':
+        return ModelCatalogueEntry(values["id"], values.get("context_length"), values.get("prompt_price"), values.get("completion_price"), values.get("modality"))
+
+
+class ModelCatalogue:
+    """The models offered by LLM services with a live model list (OpenRouter), persisted to a cache file.
+
+    Reading the catalogue never waits for the network: the models are read from the cache file, and if it is older than TTL_SECONDS,
+    it is refreshed in the background for the next read. Only if there is no cache at all does a read have to fetch the list right away.
+    """
+    CACHE_FILE: str = os.path.join("data", "model_catalogue_cache.json")
+    TTL_SECONDS: float = 24 * 60 * 60
+    SERVICE_URLS: dict[str, str] = {"OpenRouter": "https://openrouter.ai/api/v1"}
+    __shared: 'ModelCatalogue | None' = None
+    __shared_lock: Lock = Lock()
+
+    def __init__(self, cache_file: str = CACHE_FILE) -> None:
+        self.__cache_file: str = cache_file
+        self.__lock = Lock()
+        self.__refresh_locks: dict[str, Lock] = {} # service -> held while its models are fetched
+        self.__services: dict[str, dict[str, Any]] = self.__load() # service -> {"fetched_at": timestamp, "models": [entry dicts]}
+
+    @staticmethod
+    def get_shared() -> 'ModelCatalogue':
+        """Returns the catalogue shared by the whole server, loading the cache file on first use
+        """
+        with ModelCatalogue.__shared_lock:
+            if not ModelCatalogue.__shared:
+                ModelCatalogue.__shared = ModelCatalogue()
+            return ModelCatalogue.__shared
+
+    def is_stale(self, service: str) -> bool:
+        with self.__lock:
+            cached = self.__services.get(service)
+            return not cached or time.time() - cached.get("fetched_at", 0) > self.TTL_SECONDS
+
+    def get_models(self, service: str, secret_key: str | None = None) -> list[ModelCatalogueEntry] | None:
+        """Returns the cached models of a service straight away and refreshes a stale cache in the background.
+        If nothing has been cached yet, nothing is fetched; the caller can wait for `refresh` instead
+
+        Args:
+            service (str): The LLM service, e.g. 'OpenRouter'
+            secret_key (str | None, optional): The API key used for the refresh. Defaults to None.
+
+        Returns:
+            list[ModelCatalogueEntry] | None: The cached models or None if the service has never been fetched
+        """
+        with self.__lock:
+            cached = self.__services.get(service)
+        if not cached:
+            return None
+        if self.is_stale(service):
+            self.refresh_in_background(service, secret_key)
+        return [ModelCatalogueEntry.from_dict(model) for model in cached["models"]]
+
+    def get_context_length(self, model: str) -> int | None:
+        """Returns the context size of a model from the cache of any service. Models are also found by their name without the vendor, e.g. 'gemma-2-9b-it:free'
+        """
+        name = model.split('/')[-1]
+        with self.__lock:
+            for cached in self.__services.values():
+                for entry in cached["models"]:
+                    if entry["context_length"] and (entry["id"] == model or entry["id"].split('/')[-1] == name):
+                        return entry["context_length"]
+        return None
+
+    def refresh(self, service: str, secret_key: str | None = None) -> list[ModelCatalogueEntry]:
+        """Fetches the models of a service and writes them to the cache file.
+        If a refresh of the service is already running, waits for it and returns its models instead of fetching them again
+
+        Raises:
+            Exception: If the models could not be fetched
+        """
+        requested_at = time.time()
+        with self.__get_refresh_lock(service):
+            with self.__lock:
+                cached = self.__services.get(service)
+            if cached and cached.get("fetched_at", 0) >= requested_at: # fetched by the refresh that was running when this one was requested
+                return [ModelCatalogueEntry.from_dict(model) for model in cached["models"]]
+            models = ModelCatalogue.fetch_models(service, secret_key)
+            with self.__lock:
+                self.__services[service] = {"fetched_at": time.time(), "models": [model.to_dict() for model in models]}
+                self.__save()
+        return models
+
+    def refresh_in_background(self, service: str, secret_key: str | None = None):
+        """Starts a refresh of the models of a service on a background thread, unless one is already running or the service has no live model list
+        """
+        if service not in self.SERVICE_URLS or self.__get_refresh_lock(service).locked():
+            return
+        def refresh():
+            try:
+                self.refresh(service, secret_key)
+            except Exception as e:
+                logging.debug(f"Could not refresh the list of models of {service}: {e}")
+        Thread(target=refresh, name=f"ModelCatalogueRefresh{service}", daemon=True).start()
+
+    @staticmethod
+    def fetch_models(service: str, secret_key: str | None) -> list[ModelCatalogueEntry]:
+        """Fetches the models of a service with a live model list
+        """
+        # NOTE: while a secret key is not needed for this request, this may change in the future
+        client = OpenAI(api_key=secret_key if secret_key else 'abc123', base_url=ModelCatalogue.SERVICE_URLS[service])
+        # don't log initial 'HTTP Request: GET https://openrouter.ai/api/v1/models "HTTP/1.1 200 OK"'
+        logging.getLogger('openai').setLevel(logging.ERROR)
+        logging.getLogger("httpx").setLevel(logging.ERROR)
+        try:
+            models = client.models.list()
+        finally:
+            logging.getLogger('openai').setLevel(logging.INFO)
+            logging.getLogger("httpx").setLevel(logging.INFO)
+            client.close()
+        return [ModelCatalogueEntry.from_model_extra(model.id, model.model_extra) for model in models.data]
+
+    def __get_refresh_lock(self, service: str) -> Lock:
+        with self.__lock:
+            return self.__refresh_locks.setdefault(service, Lock())
+
+    def __load(self) -> dict[str, dict[str, Any]]:
+        if not os.path.exists(self.__cache_file):
+            return {}
+        try:
+            with open(self.__cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.debug(f"Could not read the model catalogue cache {self.__cache_file}: {e}")
+            return {}
+
+    def __save(self):
+        try:
+            directory = os.path.dirname(self.__cache_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_file = f"{self.__cache_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.__services, f)
+            os.replace(temp_file, self.__cache_file) # never leaves a half written cache behind
+        except Exception as e:
+            logging.debug(f"Could not write the model catalogue cache {self.__cache_file}: {e}")
@@ -25,3 +25,9 @@ class actions_parser(output_parser):
     
     def get_cut_indicators(self) -> list[str]:
         return [":"]
+
+    def get_cut_triggers(self) -> list[str] | None:
+        return []
+
+    def get_modify_triggers(self) -> list[str] | None:
+        return [":"]
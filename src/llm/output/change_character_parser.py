@@ -57,3 +57,9 @@ class change_character_parser(output_parser):
     
     def get_cut_indicators(self) -> list[str]:
         return [":"]
+
+    def get_cut_triggers(self) -> list[str] | None:
+        return [":"]
+
+    def get_modify_triggers(self) -> list[str] | None:
+        return []
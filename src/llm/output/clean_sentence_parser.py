@@ -4,6 +4,11 @@ from src.llm.sentence_content import SentenceContent
 
 class clean_sentence_parser(output_parser):
     """Class to track narrations in the current output of the LLM."""
+    # single characters that are swapped for others, done in one pass via str.translate
+    __REPLACEMENTS: dict[int, str] = str.maketrans({'\n': ' ', '[': '(', ']': ')', '{': '(', '}': ')'})
+    # characters whose presence can change the cleaned text
+    REWRITTEN_CHARS: list[str] = ['\r', '\n', '[', ']', '{', '}', '*']
+
     def __init__(self) -> None:
         super().__init__()
 
@@ -23,16 +28,17 @@ class clean_sentence_parser(output_parser):
             sentence = sentence.replace('Well, well, well', 'Well well well')
 
         sentence = remove_as_a(sentence)
-        sentence = sentence.replace('\r\n', ' ')
-        sentence = sentence.replace('\n', ' ')
-        sentence = sentence.replace('[', '(')
-        sentence = sentence.replace(']', ')')
-        sentence = sentence.replace('{', '(')
-        sentence = sentence.replace('}', ')')
+        if '\r\n' in sentence:
+            sentence = sentence.replace('\r\n', ' ')
+        sentence = sentence.translate(self.__REPLACEMENTS)
         # local models sometimes get the idea in their head to use double asterisks **like this** in sentences instead of single
         # this converts double asterisks to single so that they can be filtered out appropriately
-        sentence = sentence.replace('**','*')
+        if '**' in sentence:
+            sentence = sentence.replace('**','*')
         return sentence
 
     def modify_sentence_content(self, cut_content: SentenceContent, last_content: SentenceContent | None, settings: sentence_generation_settings) -> tuple[SentenceContent | None, SentenceContent | None]:
-        return cut_content, last_content
\ No newline at end of file
+        return cut_content, last_content
+
+    def get_modify_triggers(self) -> list[str] | None:
+        return []
\ No newline at end of file
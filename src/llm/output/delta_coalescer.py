@@ -0,0 +1,68 @@
+import re
+import time
+
+
+class delta_coalescer:
+    """Batches the small deltas streamed by the LLM before they are handed to the sentence_accumulator.
+
+    Cleaning and scanning the output has a fixed cost per call, so instead of paying it for every single token a fast backend streams,
+    deltas are collected until one of them contains a character a sentence could be cut at. As no sentence can be cut before such a character arrives,
+    holding back the deltas in between does not make any sentence later. A small time and size budget bounds how much is held back regardless.
+    """
+    def __init__(self, trigger_chars: list[str], max_delay: float = 0.05, max_chars: int = 256, lookahead_chars: list[str] = []) -> None:
+        """
+        Args:
+            trigger_chars (list[str]): Characters that release the batch right away, usually the cut indicators of the accumulator
+            max_delay (float, optional): Seconds after which a batch is released even without a trigger. Defaults to 0.05.
+            max_chars (int, optional): Length after which a batch is released even without a trigger. Defaults to 256.
+            lookahead_chars (list[str], optional): Characters the accumulator only cuts at once the next character has arrived, usually its lookahead cut indicators.
+                If a batch ends in one of them, the next delta is released right away. Defaults to [].
+        """
+        chars = sorted(set("".join(trigger_chars)))
+        self.__trigger_reg = re.compile("[" + "".join(re.escape(char) for char in chars) + "]") if chars else None
+        self.__lookahead_chars: frozenset[str] = frozenset("".join(lookahead_chars))
+        self.__is_waiting_for_lookahead: bool = False
+        self.__max_delay: float = max_delay
+        self.__max_chars: int = max_chars
+        self.__deltas: list[str] = []
+        self.__length: int = 0
+        self.__first_delta_time: float = 0
+
+    @property
+    def has_pending(self) -> bool:
+        return self.__length > 0
+
+    def push(self, delta: str) -> str | None:
+        """Adds a delta to the current batch
+
+        Args:
+            delta (str): The next delta of the LLM
+
+        Returns:
+            str | None: The whole batch if it should be processed now, None if it is held back
+        """
+        if not delta:
+            return None
+        if not self.__deltas:
+            self.__first_delta_time = time.monotonic()
+        self.__deltas.append(delta)
+        self.__length += len(delta)
+        if (self.__trigger_reg is None
+                or self.__is_waiting_for_lookahead
+                or self.__trigger_reg.search(delta)
+                or self.__length >= self.__max_chars
+                or time.monotonic() - self.__first_delta_time >= self.__max_delay):
+            return self.flush()
+        return None
+
+    def flush(self) -> str:
+        """Releases everything held back, e.g. at the end of the stream
+
+        Returns:
+            str: The batched deltas, empty if there were none
+        """
+        batch = "".join(self.__deltas)
+        self.__deltas = []
+        self.__length = 0
+        self.__is_waiting_for_lookahead = len(batch) > 0 and batch[-1] in self.__lookahead_chars
+        return batch
@@ -0,0 +1,48 @@
+import re
+import unicodedata
+from src.llm.output.output_parser import output_parser, sentence_generation_settings
+from src.llm.sentence_content import SentenceContent
+
+
+class early_clause_parser(output_parser):
+    """Class to cut the first line of a response at the end of its first clause, so it can be voiced before the LLM has finished the whole sentence.
+
+    Only cuts as long as no other sentence of the response has been cut yet. Needs to come after the sentence_end_parser,
+    so a complete sentence always takes precedence over a clause.
+    """
+    def __init__(self, min_words: int, clause_end_chars: list[str] = [',', ';', '—', '–', '，', '、', '；']) -> None:
+        super().__init__()
+        self.__min_words: int = min_words
+        self.__clause_end_chars = [unicodedata.normalize('NFKC', char) for char in clause_end_chars]
+        # A clause end needs to be followed by whitespace so numbers like "1,000" are not cut. The end of the output so far does not count,
+        # the rest of the number may still be streaming in. The clause end chars are lookahead indicators, so the accumulator passes on the whitespace
+        self.__clause_end_reg = re.compile("[" + "".join(re.escape(char) for char in self.__clause_end_chars) + r"]+(?=\s)")
+        self.__is_active: bool = True
+
+    @property
+    def is_active(self) -> bool:
+        return self.__is_active
+
+    def cut_sentence(self, output: str, current_settings: sentence_generation_settings) -> tuple[SentenceContent | None, str]:
+        if not self.__is_active:
+            return None, output
+
+        for match in self.__clause_end_reg.finditer(output):
+            clause = output[:match.end()]
+            if len(clause.split()) >= self.__min_words:
+                self.__is_active = False
+                return SentenceContent(current_settings.current_speaker, clause, current_settings.sentence_type, False), output[match.end():]
+        return None, output
+
+    def modify_sentence_content(self, cut_content: SentenceContent, last_content: SentenceContent | None, settings: sentence_generation_settings) -> tuple[SentenceContent | None, SentenceContent | None]:
+        self.__is_active = False # the first line of the response has been cut, whichever parser it was
+        return cut_content, last_content
+
+    def get_cut_indicators(self) -> list[str]:
+        return self.__clause_end_chars
+
+    def get_lookahead_cut_indicators(self) -> list[str]:
+        return self.__clause_end_chars
+
+    def get_cut_triggers(self) -> list[str] | None:
+        return self.__clause_end_chars
@@ -22,6 +22,8 @@ class narration_parser(output_parser):
         
         self.__speech_start_chars: list[str] = speech_start_chars
         self.__speech_end_chars: list[str] = speech_end_chars
+        all_indicator_chars = sorted(set("".join(narration_start_chars + narration_end_chars + speech_start_chars + speech_end_chars)))
+        self.__any_indicator_reg = re.compile("[" + "".join(re.escape(char) for char in all_indicator_chars) + "]") if all_indicator_chars else never_match_anything_regex
         if len(speech_start_chars) > 0 and len(speech_end_chars) > 0:
             self.__start_speech_reg = re.compile(base_regex_def.format(chars = "\\" + "\\".join(speech_start_chars))) #Should look like ^.*?[\*\(\[]
             self.__end_speech_reg = re.compile(base_regex_def.format(chars = "\\" + "\\".join(speech_end_chars))) #Should look like ^.*?[\*\)\]]
@@ -34,6 +36,8 @@ class narration_parser(output_parser):
 
     def cut_sentence(self, output: str, current_settings: sentence_generation_settings) -> tuple[SentenceContent | None, str]:
         output = output.lstrip()
+        if not self.__any_indicator_reg.search(output): #None of the regexes below can match without an indicator char
+            return None, output
         while True: #loop will only be run a maximum of two times
             if current_settings.current_text_state == MarkedTextStateEnum.UNMARKED: #If we are currently in unmarked text, which is the default
                 match = self.__start_narration_reg.match(output) #First, try to locate a start of a narration. The default assumption is that unmarked text is speech
@@ -102,4 +106,7 @@ class narration_parser(output_parser):
         return False
     
     def modify_sentence_content(self, cut_content: SentenceContent, last_content: SentenceContent | None, settings: sentence_generation_settings) -> tuple[SentenceContent | None, SentenceContent | None]:
-        return cut_content, last_content
\ No newline at end of file
+        return cut_content, last_content
+
+    def get_modify_triggers(self) -> list[str] | None:
+        return []
\ No newline at end of file
@@ -82,3 +82,30 @@ class output_parser(ABC):
     
     def get_cut_indicators(self) -> list[str]:
         return []
+
+    def get_lookahead_cut_indicators(self) -> list[str]:
+        """Cut indicators that only end a sentence depending on the character after them, e.g. a comma followed by whitespace.
+        The accumulator holds back a run of them until that character has arrived and passes it on as part of the raw sentence
+
+        Returns:
+            list[str]: The lookahead indicators. Each of them also needs to be one of the cut indicators
+        """
+        return []
+
+    def get_cut_triggers(self) -> list[str] | None:
+        """Characters of which at least one needs to be in the output for :func:`cut_sentence` to change anything.
+        The parser_chain skips :func:`cut_sentence` for outputs without any of them
+
+        Returns:
+            list[str] | None: The trigger characters. None if :func:`cut_sentence` needs to run for every output (default), an empty list if it never needs to run
+        """
+        return None
+
+    def get_modify_triggers(self) -> list[str] | None:
+        """Characters of which at least one needs to be in the text of a cut sentence for :func:`modify_sentence_content` to change anything.
+        The parser_chain skips :func:`modify_sentence_content` for sentences without any of them
+
+        Returns:
+            list[str] | None: The trigger characters. None if :func:`modify_sentence_content` needs to run for every sentence (default), an empty list if it never needs to run
+        """
+        return None
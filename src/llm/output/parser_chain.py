@@ -0,0 +1,85 @@
+import re
+from typing import Callable
+from src.llm.output.output_parser import output_parser, sentence_generation_settings
+from src.llm.sentence_content import SentenceContent
+
+class parser_chain:
+    """Runs the raw sentences of the accumulator through a chain of output_parsers.
+
+    The chain is compiled once per response: steps of parsers that declare they never change anything are dropped,
+    and steps with trigger characters are only called if one of their triggers is in the text.
+    Parsers that do not declare triggers (e.g. custom parsers) are always called.
+    """
+    def __init__(self, parsers: list[output_parser]) -> None:
+        """
+        Args:
+            parsers (list[output_parser]): The parsers in the order they should be applied
+        """
+        self.__parsers: list[output_parser] = parsers
+        self.__steps: list[tuple[Callable | None, Callable | None, Callable | None, Callable | None]] = []
+        for parser in parsers:
+            cut_triggers = parser.get_cut_triggers()
+            modify_triggers = parser.get_modify_triggers()
+            cut = parser.cut_sentence if cut_triggers is None or len(cut_triggers) > 0 else None
+            modify = parser.modify_sentence_content if modify_triggers is None or len(modify_triggers) > 0 else None
+            if cut or modify:
+                self.__steps.append((cut, parser_chain.__compile_triggers(cut_triggers), modify, parser_chain.__compile_triggers(modify_triggers)))
+        cut_indicators: list[str] = []
+        lookahead_cut_indicators: list[str] = []
+        for parser in parsers:
+            for indicator in parser.get_cut_indicators():
+                if indicator not in cut_indicators:
+                    cut_indicators.append(indicator)
+            for indicator in parser.get_lookahead_cut_indicators():
+                if indicator not in lookahead_cut_indicators:
+                    lookahead_cut_indicators.append(indicator)
+        self.__cut_indicators: list[str] = cut_indicators
+        self.__lookahead_cut_indicators: list[str] = lookahead_cut_indicators
+
+    @property
+    def parsers(self) -> list[output_parser]:
+        return self.__parsers
+
+    def get_cut_indicators(self) -> list[str]:
+        """Returns the combined cut indicators of all parsers in the chain
+        """
+        return self.__cut_indicators
+
+    def get_lookahead_cut_indicators(self) -> list[str]:
+        """Returns the combined lookahead cut indicators of all parsers in the chain
+        """
+        return self.__lookahead_cut_indicators
+
+    def process(self, output: str, pending_sentence: SentenceContent | None, settings: sentence_generation_settings) -> tuple[SentenceContent | None, SentenceContent | None, str]:
+        """Tries to cut a sentence from the output and applies the modifications of all parsers to it
+
+        Args:
+            output (str): The raw sentence coming from the accumulator
+            pending_sentence (SentenceContent | None): The sentence currently held back by the parsers, e.g. for merging
+            settings (sentence_generation_settings): The settings shared by the parsers
+
+        Returns:
+            tuple[SentenceContent | None, SentenceContent | None, str]: The cut sentence (if any), the new pending sentence and the remaining output that could not be parsed
+        """
+        parsed_sentence: SentenceContent | None = None
+        for cut, cut_triggers, modify, modify_triggers in self.__steps:
+            has_run = False
+            if parsed_sentence is None:  # Try to extract a complete sentence
+                if cut is None or (cut_triggers is not None and cut_triggers(output) is None):
+                    continue
+                parsed_sentence, output = cut(output, settings)
+                has_run = True
+            if parsed_sentence is not None and modify is not None and (modify_triggers is None or modify_triggers(parsed_sentence.text) is not None):  # Apply modifications if we already have a sentence
+                parsed_sentence, pending_sentence = modify(parsed_sentence, pending_sentence, settings)
+                has_run = True
+            if has_run and settings.stop_generation: # only a parser that has run can stop the generation
+                break
+        return parsed_sentence, pending_sentence, output
+
+    @staticmethod
+    def __compile_triggers(triggers: list[str] | None) -> Callable[[str], re.Match | None] | None:
+        """Compiles the trigger characters of a step into a single search over the text
+        """
+        if not triggers:
+            return None
+        return re.compile("[" + "".join(re.escape(char) for char in sorted(set("".join(triggers)))) + "]").search
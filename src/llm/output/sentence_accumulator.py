@@ -5,41 +5,68 @@ from src.llm.output.clean_sentence_parser import clean_sentence_parser
 
 class sentence_accumulator:
     """Accumulates the token-wise output of an LLM into raw sentences.
+
+    A raw sentence is everything up to and including the first run of cut indicators.
+    The output is kept as a list of chunks and every chunk is only scanned once, so long stretches of output without any cut indicator do not get rescanned with every new token.
+    A run of only lookahead indicators is held back until the next character has arrived. If that is whitespace, it becomes part of the raw sentence.
     """
-    def __init__(self, cut_indicators: list[str]) -> None:
+    def __init__(self, cut_indicators: list[str], lookahead_cut_indicators: list[str] = []) -> None:
         self.__cut_indicators = cut_indicators
-        self.__cleaned_llm_output: str = ""
-        base_regex_def = "^.*?[{sentence_end_chars}]+"
-        self.__sentence_end_reg = re.compile(base_regex_def.format(sentence_end_chars = "\\" + "\\".join(cut_indicators)))
+        self.__cut_chars: frozenset[str] = frozenset("".join(cut_indicators))
+        self.__lookahead_chars: frozenset[str] = frozenset("".join(lookahead_cut_indicators))
+        self.__cut_char_reg = re.compile("[" + "".join(re.escape(char) for char in sorted(self.__cut_chars)) + "]")
+        self.__chunks: list[str] = []
+        self.__scanned_chunks: int = 0 # chunks before this index are known to not contain any cut indicator
         self.__unparseable: str = ""
         self.__prepared_match: str = ""
         self.__cleaner = clean_sentence_parser()
-    
+
     def has_next_sentence(self) -> bool:
         if len(self.__prepared_match) > 0:
             return True
-        
-        match = self.__sentence_end_reg.match(self.__cleaned_llm_output)
-        if not match:
-            return False
-        else:
-            self.__prepared_match = match.group()
-            self.__cleaned_llm_output = self.__cleaned_llm_output.removeprefix(self.__prepared_match)
-            return True
-    
+
+        for index in range(self.__scanned_chunks, len(self.__chunks)):
+            match = self.__cut_char_reg.search(self.__chunks[index])
+            if match:
+                if not self.__prepare_match(index, match.start()):
+                    self.__scanned_chunks = index # rescan the chunk once the next character has arrived
+                    return False
+                return True
+        self.__scanned_chunks = len(self.__chunks)
+        return False
+
     def get_next_sentence(self) -> str:
         result = self.__unparseable + self.__prepared_match
         self.__unparseable = ""
         self.__prepared_match = ""
         return result
-    
+
     def accumulate(self, llm_output: str):
         llm_output = self.__cleaner.clean_sentence(llm_output)
-        self.__cleaned_llm_output += llm_output
-    
+        if llm_output:
+            self.__chunks.append(llm_output)
+
     def refuse(self, refused_text: str):
         self.__unparseable = refused_text
-    
 
+    def __prepare_match(self, chunk_index: int, cut_position: int) -> bool:
+        """Splits the accumulated output after the run of cut indicators starting at `cut_position` of chunk `chunk_index`
 
-    
+        Returns:
+            bool: False if the run only holds lookahead indicators and nothing has arrived after it yet
+        """
+        head = "".join(self.__chunks[:chunk_index])
+        tail = "".join(self.__chunks[chunk_index:]) # only holds chunks that have not been scanned yet
+        end = cut_position + 1
+        while end < len(tail) and tail[end] in self.__cut_chars:
+            end += 1
+        if all(char in self.__lookahead_chars for char in tail[cut_position:end]):
+            if end == len(tail):
+                return False
+            if tail[end].isspace():
+                end += 1
+        self.__prepared_match = head + tail[:end]
+        rest = tail[end:]
+        self.__chunks = [rest] if rest else []
+        self.__scanned_chunks = 0
+        return True
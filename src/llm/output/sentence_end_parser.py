@@ -18,7 +18,7 @@ class sentence_end_parser(output_parser):
             return None, output
         
         matched_text = match.group()
-        rest = output.removeprefix(matched_text)
+        rest = output[match.end():]
         return SentenceContent(current_settings.current_speaker, matched_text, current_settings.sentence_type, False), rest
 
     def modify_sentence_content(self, cut_content: SentenceContent, last_content: SentenceContent | None, settings: sentence_generation_settings) -> tuple[SentenceContent | None, SentenceContent | None]:
@@ -26,3 +26,9 @@ class sentence_end_parser(output_parser):
     
     def get_cut_indicators(self) -> list[str]:
         return self.__end_of_sentence_chars
+
+    def get_cut_triggers(self) -> list[str] | None:
+        return self.__end_of_sentence_chars
+
+    def get_modify_triggers(self) -> list[str] | None:
+        return []
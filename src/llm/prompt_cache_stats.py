@@ -0,0 +1,85 @@
+import logging
+from threading import Lock
+from typing import Any
+
+class PromptCacheStats:
+    """Adds up how many of the prompt tokens sent to an LLM service were served from its prompt cache, as reported in the `usage` of its replies
+    """
+    def __init__(self) -> None:
+        self.__prompt_tokens: int = 0
+        self.__cached_tokens: int = 0
+        self.__reply_count: int = 0
+        self.__lock = Lock()
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self.__prompt_tokens
+
+    @property
+    def cached_tokens(self) -> int:
+        return self.__cached_tokens
+
+    @property
+    def reply_count(self) -> int:
+        """The number of replies that reported their cached tokens
+        """
+        return self.__reply_count
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of prompt tokens that were served from the cache, between 0 and 1
+        """
+        with self.__lock:
+            return self.__cached_tokens / self.__prompt_tokens if self.__prompt_tokens > 0 else 0
+
+    def record(self, prompt_tokens: int, cached_tokens: int):
+        with self.__lock:
+            self.__prompt_tokens += prompt_tokens
+            self.__cached_tokens += min(cached_tokens, prompt_tokens)
+            self.__reply_count += 1
+
+    def record_usage(self, usage: Any) -> bool:
+        """Records the `usage` of a reply, if it reports its cached tokens
+
+        Args:
+            usage (Any): The `usage` of a chat completion or of the last chunk of a stream
+
+        Returns:
+            bool: True if the usage reported cached tokens and has been recorded
+        """
+        tokens = PromptCacheStats.parse_usage(usage)
+        if not tokens:
+            return False
+        prompt_tokens, cached_tokens = tokens
+        self.record(prompt_tokens, cached_tokens)
+        logging.log(23, f"{cached_tokens} of {prompt_tokens} prompt tokens were cached. Prompt cache hit rate so far: {round(self.hit_rate * 100, 1)}%")
+        return True
+
+    @staticmethod
+    def parse_usage(usage: Any) -> tuple[int, int] | None:
+        """Reads the prompt tokens and the cached prompt tokens from the `usage` of a reply.
+        Understands `prompt_tokens_details.cached_tokens` (OpenAI, OpenRouter and most compatible services) and `prompt_cache_hit_tokens` (DeepSeek)
+
+        Args:
+            usage (Any): The `usage` of a reply, either as the openai object or as a plain dict
+
+        Returns:
+            tuple[int, int] | None: The prompt tokens and the cached tokens, or None if the usage does not report cached tokens
+        """
+        prompt_tokens = PromptCacheStats.__get_value(usage, "prompt_tokens")
+        if not isinstance(prompt_tokens, int):
+            return None
+        cached_tokens = PromptCacheStats.__get_value(PromptCacheStats.__get_value(usage, "prompt_tokens_details"), "cached_tokens")
+        if not isinstance(cached_tokens, int):
+            cached_tokens = PromptCacheStats.__get_value(usage, "prompt_cache_hit_tokens")
+        if not isinstance(cached_tokens, int):
+            return None
+        return prompt_tokens, cached_tokens
+
+    @staticmethod
+    def __get_value(container: Any, key: str) -> Any:
+        if container is None:
+            return None
+        if isinstance(container, dict):
+            return container.get(key)
+        return getattr(container, key, None)
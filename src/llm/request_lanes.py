@@ -0,0 +1,112 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from enum import Enum, auto
+from threading import Lock
+from typing import AsyncIterator, Iterator
+
+class RequestLaneEnum(Enum):
+    INTERACTIVE = auto() # replies of NPCs the player is waiting for
+    BACKGROUND = auto() # summaries, vision transcriptions and other utility calls
+
+
+class RequestLanes:
+    """Limits how many requests run against an endpoint at the same time, separately for every :class:`RequestLaneEnum`.
+
+    Replaces a single lock per client: a summary of the last conversation no longer waits for the greeting of the next one
+    to finish streaming (or the other way round), while requests within a lane still queue up in order.
+    Can be entered both from threads (:func:`enter`) and from coroutines (:func:`enter_async`) without blocking the event loop.
+    Both wait in the same queue per lane: a place that becomes free is handed to the waiter that has been waiting the longest
+    """
+    LANE_LIMITS: dict[RequestLaneEnum, int] = {
+        RequestLaneEnum.INTERACTIVE: 1,
+        RequestLaneEnum.BACKGROUND: 2,
+    }
+    __shared: 'RequestLanes | None' = None
+    __shared_lock: Lock = Lock()
+
+    def __init__(self) -> None:
+        self.__running: dict[tuple[str, RequestLaneEnum], int] = {}
+        self.__waiters: dict[tuple[str, RequestLaneEnum], deque[Future[None]]] = {} # resolved in arrival order when a place is handed to them
+        self.__lock = Lock()
+
+    @staticmethod
+    def get_shared() -> 'RequestLanes':
+        """Returns the lanes shared by all LLM clients of the server, creating them on first use
+        """
+        with RequestLanes.__shared_lock:
+            if not RequestLanes.__shared:
+                RequestLanes.__shared = RequestLanes()
+            return RequestLanes.__shared
+
+    def get_running_count(self, endpoint: str, lane: RequestLaneEnum) -> int:
+        with self.__lock:
+            return self.__running.get((endpoint, lane), 0)
+
+    @contextmanager
+    def enter(self, endpoint: str, lane: RequestLaneEnum) -> Iterator[None]:
+        """Blocks the calling thread until the lane of the endpoint has room, and keeps the place until the block is left
+        """
+        waiter = self.__queue_up(endpoint, lane)
+        if waiter:
+            waiter.result()
+        try:
+            yield
+        finally:
+            self.__leave(endpoint, lane)
+
+    @asynccontextmanager
+    async def enter_async(self, endpoint: str, lane: RequestLaneEnum) -> AsyncIterator[None]:
+        """Waits until the lane of the endpoint has room, and keeps the place until the block is left. Safe to cancel while waiting
+        """
+        waiter = self.__queue_up(endpoint, lane)
+        if waiter:
+            try:
+                await asyncio.wrap_future(waiter)
+            except asyncio.CancelledError:
+                self.__give_up(endpoint, lane, waiter)
+                raise
+        try:
+            yield
+        finally:
+            self.__leave(endpoint, lane)
+
+    def __queue_up(self, endpoint: str, lane: RequestLaneEnum) -> Future[None] | None:
+        """Takes a place in the lane right away if it has room and nobody is waiting for it yet, else queues up
+
+        Returns:
+            Future[None] | None: Resolves once a place has been handed over. None if a place has been taken right away
+        """
+        key = (endpoint, lane)
+        with self.__lock:
+            waiters = self.__waiters.setdefault(key, deque())
+            if len(waiters) == 0 and self.__running.get(key, 0) < self.LANE_LIMITS[lane]:
+                self.__running[key] = self.__running.get(key, 0) + 1
+                return None
+            waiter: Future[None] = Future()
+            waiters.append(waiter)
+            return waiter
+
+    def __give_up(self, endpoint: str, lane: RequestLaneEnum, waiter: Future[None]):
+        """Leaves the queue of a lane. If a place has already been handed over in the meantime, passes it on to the next waiter
+        """
+        with self.__lock:
+            waiters = self.__waiters[(endpoint, lane)]
+            if waiter in waiters:
+                waiters.remove(waiter)
+                return
+            is_handed_over = not waiter.cancelled()
+        if is_handed_over:
+            self.__leave(endpoint, lane)
+
+    def __leave(self, endpoint: str, lane: RequestLaneEnum):
+        key = (endpoint, lane)
+        with self.__lock:
+            waiters = self.__waiters.get(key)
+            while waiters:
+                waiter = waiters.popleft()
+                if waiter.set_running_or_notify_cancel(): # False if the waiter has been cancelled in the meantime
+                    waiter.set_result(None) # the place goes straight to the waiter, so nobody arriving later can take it first
+                    return
+            self.__running[key] -= 1
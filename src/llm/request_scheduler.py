@@ -0,0 +1,204 @@
+import asyncio
+from enum import Enum, auto
+import logging
+import random
+from threading import Lock
+import time
+from openai import APIConnectionError, APIStatusError, InternalServerError, RateLimitError
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to an endpoint that has been failing, until the endpoint is tried again
+    """
+    def __init__(self, endpoint: str, seconds_until_retry: float) -> None:
+        super().__init__(f"'{endpoint}' has been failing, skipping requests to it for another {round(seconds_until_retry, 1)} seconds")
+        self.endpoint: str = endpoint
+        self.seconds_until_retry: float = seconds_until_retry
+
+
+class CircuitStateEnum(Enum):
+    CLOSED = auto() # requests go through
+    OPEN = auto() # requests are skipped until OPEN_SECONDS have passed
+    HALF_OPEN = auto() # a single trial request decides whether the circuit closes again
+
+
+class EndpointSchedule:
+    """The rate limit, backoff and circuit breaker state of a single endpoint
+    """
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate: float = rate # requests per second the token bucket refills with
+        self.tokens: float = capacity
+        self.last_refill: float = time.monotonic()
+        self.blocked_until: float = 0 # set by Retry-After and backoff
+        self.consecutive_failures: int = 0
+        self.circuit: CircuitStateEnum = CircuitStateEnum.CLOSED
+        self.circuit_opened_at: float = 0
+        self.is_trial_running: bool = False
+        self.trial_started_at: float = 0
+
+
+class RequestScheduler:
+    """Decides when a request may be sent to an LLM endpoint. All LLM traffic (chat, summaries, vision) goes through the shared scheduler.
+
+    - Every endpoint has a token bucket. Its rate is halved whenever the endpoint answers with a rate limit error and slowly recovers with every success
+    - Retryable errors (rate limits, connection errors, server errors) are retried with exponential backoff and jitter, waiting at least as long as the `Retry-After` header asks for
+    - After FAILURE_THRESHOLD failed requests in a row, the circuit of the endpoint opens and requests to it fail right away with a :class:`CircuitOpenError`
+      for OPEN_SECONDS. After that, a single trial request decides whether the endpoint is used again
+    """
+    MAX_ATTEMPTS: int = 3 # per request, including the first one
+    BACKOFF_BASE_SECONDS: float = 0.5
+    BACKOFF_MAX_SECONDS: float = 8
+    BUCKET_CAPACITY: float = 5
+    BUCKET_RATE: float = 5 # requests per second
+    MIN_BUCKET_RATE: float = 0.2
+    FAILURE_THRESHOLD: int = 3
+    OPEN_SECONDS: float = 30
+    __shared: 'RequestScheduler | None' = None
+    __shared_lock: Lock = Lock()
+
+    def __init__(self) -> None:
+        self.__endpoints: dict[str, EndpointSchedule] = {}
+        self.__lock = Lock()
+
+    @staticmethod
+    def get_shared() -> 'RequestScheduler':
+        """Returns the scheduler shared by all LLM clients of the server, creating it on first use
+        """
+        with RequestScheduler.__shared_lock:
+            if not RequestScheduler.__shared:
+                RequestScheduler.__shared = RequestScheduler()
+            return RequestScheduler.__shared
+
+    @staticmethod
+    def get_backoff_delay(attempt: int, base_seconds: float = BACKOFF_BASE_SECONDS, max_seconds: float = BACKOFF_MAX_SECONDS) -> float:
+        """Returns how long to wait before the next attempt: exponential backoff with jitter
+
+        Args:
+            attempt (int): How many attempts have failed so far, starting at 1
+            base_seconds (float, optional): The delay after the first failed attempt. Defaults to BACKOFF_BASE_SECONDS.
+            max_seconds (float, optional): The longest delay. Defaults to BACKOFF_MAX_SECONDS.
+        """
+        delay = min(max_seconds, base_seconds * (2 ** max(0, attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @staticmethod
+    def get_retry_after(error: Exception) -> float | None:
+        """Returns the seconds the server asked to wait via the `Retry-After` header of an error response, if any
+        """
+        if not isinstance(error, APIStatusError):
+            return None
+        retry_after = error.response.headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return max(0, float(retry_after))
+        except ValueError: # Retry-After can also be an HTTP date, which is rare enough for LLM APIs to not be worth parsing
+            return None
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        return isinstance(error, (RateLimitError, APIConnectionError, InternalServerError))
+
+    def is_available(self, endpoint: str) -> bool:
+        """Returns False while the circuit of an endpoint is open
+        """
+        with self.__lock:
+            schedule = self.__endpoints.get(endpoint)
+            return not schedule or schedule.circuit != CircuitStateEnum.OPEN or time.monotonic() - schedule.circuit_opened_at >= self.OPEN_SECONDS
+
+    def reserve(self, endpoint: str) -> float:
+        """Reserves the next request to an endpoint
+
+        Args:
+            endpoint (str): The endpoint the request goes to
+
+        Raises:
+            CircuitOpenError: If the endpoint has been failing and is currently skipped
+
+        Returns:
+            float: Seconds to wait before sending the request
+        """
+        with self.__lock:
+            schedule = self.__get_schedule(endpoint)
+            now = time.monotonic()
+            if schedule.circuit == CircuitStateEnum.OPEN:
+                seconds_open = now - schedule.circuit_opened_at
+                if seconds_open < self.OPEN_SECONDS:
+                    raise CircuitOpenError(endpoint, self.OPEN_SECONDS - seconds_open)
+                schedule.circuit = CircuitStateEnum.HALF_OPEN
+                schedule.is_trial_running = False
+            if schedule.circuit == CircuitStateEnum.HALF_OPEN:
+                if schedule.is_trial_running and now - schedule.trial_started_at < self.OPEN_SECONDS: # a trial that never reported back (e.g. got cancelled) does not block forever
+                    raise CircuitOpenError(endpoint, self.OPEN_SECONDS - (now - schedule.trial_started_at))
+                schedule.is_trial_running = True
+                schedule.trial_started_at = now
+
+            schedule.tokens = min(self.BUCKET_CAPACITY, schedule.tokens + (now - schedule.last_refill) * schedule.rate)
+            schedule.last_refill = now
+            schedule.tokens -= 1
+            wait = -schedule.tokens / schedule.rate if schedule.tokens < 0 else 0
+            return max(wait, schedule.blocked_until - now)
+
+    def wait_for_turn(self, endpoint: str):
+        """Blocks until a request may be sent to the endpoint. Raises a :class:`CircuitOpenError` if the endpoint is currently skipped
+        """
+        wait = self.reserve(endpoint)
+        if wait > 0:
+            logging.debug(f"Waiting {round(wait, 2)} seconds before sending a request to '{endpoint}'")
+            time.sleep(wait)
+
+    async def wait_for_turn_async(self, endpoint: str):
+        """Waits until a request may be sent to the endpoint. Raises a :class:`CircuitOpenError` if the endpoint is currently skipped
+        """
+        wait = self.reserve(endpoint)
+        if wait > 0:
+            logging.debug(f"Waiting {round(wait, 2)} seconds before sending a request to '{endpoint}'")
+            await asyncio.sleep(wait)
+
+    def record_success(self, endpoint: str):
+        """Records that a request to the endpoint succeeded. Closes its circuit and lets its rate recover
+        """
+        with self.__lock:
+            schedule = self.__get_schedule(endpoint)
+            schedule.consecutive_failures = 0
+            schedule.circuit = CircuitStateEnum.CLOSED
+            schedule.is_trial_running = False
+            schedule.rate = min(self.BUCKET_RATE, schedule.rate + self.MIN_BUCKET_RATE)
+
+    def record_failure(self, endpoint: str, error: Exception) -> float | None:
+        """Records that a request to the endpoint failed
+
+        Args:
+            endpoint (str): The endpoint the request went to
+            error (Exception): The error of the request
+
+        Returns:
+            float | None: Seconds to wait before retrying the request, or None if it should not be retried (the error is not retryable or the circuit has opened)
+        """
+        if not self.is_retryable(error):
+            with self.__lock:
+                self.__get_schedule(endpoint).is_trial_running = False
+            return None
+        with self.__lock:
+            schedule = self.__get_schedule(endpoint)
+            now = time.monotonic()
+            schedule.consecutive_failures += 1
+            if isinstance(error, RateLimitError):
+                schedule.rate = max(self.MIN_BUCKET_RATE, schedule.rate / 2)
+            retry_after = self.get_retry_after(error)
+            delay = max(self.get_backoff_delay(schedule.consecutive_failures), retry_after if retry_after is not None else 0)
+            schedule.blocked_until = max(schedule.blocked_until, now + delay)
+            if schedule.circuit == CircuitStateEnum.HALF_OPEN or schedule.consecutive_failures >= self.FAILURE_THRESHOLD:
+                if schedule.circuit != CircuitStateEnum.OPEN:
+                    logging.warning(f"'{endpoint}' failed {schedule.consecutive_failures} times in a row, skipping requests to it for {self.OPEN_SECONDS} seconds")
+                schedule.circuit = CircuitStateEnum.OPEN
+                schedule.circuit_opened_at = now
+                schedule.is_trial_running = False
+                return None
+            return delay
+
+    def __get_schedule(self, endpoint: str) -> EndpointSchedule:
+        schedule = self.__endpoints.get(endpoint)
+        if not schedule:
+            schedule = EndpointSchedule(self.BUCKET_RATE, self.BUCKET_CAPACITY)
+            self.__endpoints[endpoint] = schedule
+        return schedule
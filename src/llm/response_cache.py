@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from threading import Lock
+import time
+from typing import Any
+
+class ResponseCache:
+    """Stores LLM replies on disk, keyed by a hash of the model, the request parameters and the messages of the request.
+    Identical requests (resummarizing the same memories, summarizing a reloaded conversation, describing the same frame) are answered from the cache.
+
+    The cache is a single SQLite file. Once its replies take up more than `max_bytes`, the least recently used ones are removed.
+    """
+    def __init__(self, file_path: str, max_bytes: int) -> None:
+        """
+        Args:
+            file_path (str): The file the cache is stored in
+            max_bytes (int): The size the stored replies may take up before the least recently used ones are removed
+        """
+        self.__max_bytes: int = max_bytes
+        self.__lock = Lock()
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__connection = sqlite3.connect(file_path, check_same_thread=False, timeout=5)
+        with self.__connection:
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, reply TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    @property
+    def size(self) -> int:
+        """The size of all stored replies in bytes
+        """
+        with self.__lock:
+            return self.__connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def get_key(model: str, request_params: dict[str, Any] | None, openai_messages: list) -> str:
+        """Returns the key of a request: the hash of everything that decides the reply
+        """
+        request = json.dumps({"model": model, "params": request_params or {}, "messages": openai_messages}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Returns the stored reply of a request and marks it as recently used, or None if there is none
+        """
+        try:
+            with self.__lock, self.__connection:
+                row = self.__connection.execute("SELECT reply FROM responses WHERE key = ?", (key,)).fetchone()
+                if not row:
+                    return None
+                self.__connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                return row[0]
+        except sqlite3.Error as e:
+            logging.debug(f"Could not read from the LLM response cache: {e}")
+            return None
+
+    def put(self, key: str, reply: str):
+        """Stores the reply of a request and removes the least recently used replies if the cache has grown too large
+        """
+        size = len(reply.encode('utf-8'))
+        if size > self.__max_bytes:
+            return
+        try:
+            with self.__lock, self.__connection:
+                self.__connection.execute("INSERT OR REPLACE INTO responses (key, reply, size, last_used) VALUES (?, ?, ?, ?)", (key, reply, size, time.time()))
+                total_size = self.__connection.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+                if total_size > self.__max_bytes:
+                    self.__evict(total_size - self.__max_bytes)
+        except sqlite3.Error as e:
+            logging.debug(f"Could not write to the LLM response cache: {e}")
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def __evict(self, bytes_to_free: int):
+        freed = 0
+        evicted: list[str] = []
+        for key, size in self.__connection.execute("SELECT key, size FROM responses ORDER BY last_used ASC, rowid ASC"):
+            if freed >= bytes_to_free:
+                break
+            evicted.append(key)
+            freed += size
+        self.__connection.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in evicted])
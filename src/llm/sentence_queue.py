@@ -1,74 +1,121 @@
 import logging
-import queue
 import threading
+import time
+from collections import deque
 from src.llm.sentence import Sentence
 from src import utils
 
 class SentenceQueue:
+    """Hands voiced sentences from the generation over to the conversation.
+
+    Every sentence is tagged with the generation it belongs to. :func:`clear` only starts a new generation,
+    sentences of older generations are dropped lazily once they reach the front of the queue.
+    """
     __logging_level = 42
     __should_log = False
 
     def __init__(self) -> None:
-        self.__queue: queue.Queue[Sentence] = queue.Queue[Sentence]()
-        self.__get_lock: threading.Lock = threading.Lock()
-        self.__put_lock: threading.Lock = threading.Lock()
+        self.__queue: deque[tuple[int, Sentence]] = deque()
+        self.__condition: threading.Condition = threading.Condition()
+        self.__generation: int = 0
         self.__is_more_to_come: bool = False
-    
+
     @property
     def is_more_to_come(self) -> bool:
         return self.__is_more_to_come
-    
+
     @is_more_to_come.setter
     def is_more_to_come(self, value: bool):
-        self.__is_more_to_come = value
+        with self.__condition:
+            self.__is_more_to_come = value
+            self.__condition.notify_all() # waiters need to re-check if there is anything left to wait for
+
+    @property
+    def generation(self) -> int:
+        """The generation new sentences are currently tagged with. Changes with every :func:`clear`
+        """
+        return self.__generation
 
     @utils.time_it
-    def get_next_sentence(self) -> Sentence | None:
-        self.log(f"Trying to aquire get_lock to get next sentence")
-        with self.__get_lock:
-            if self.__queue.qsize() > 0 or self.__is_more_to_come:
-                retrieved_sentence = self.__queue.get()
-                self.log(f"Retrieved '{retrieved_sentence.text}'")
-                return retrieved_sentence
-            else:
-                self.log(f"Nothing to get from queue, returning None")
-                return None
-    
+    def get_next_sentence(self, timeout: float | None = None) -> Sentence | None:
+        """Gets the next sentence of the current generation. Blocks while the queue is empty and more sentences are to come
+
+        Args:
+            timeout (float | None, optional): Maximum time to wait for a sentence in seconds. Defaults to None (wait as long as more sentences are to come).
+
+        Returns:
+            Sentence | None: The next sentence or None if there is nothing more to come or the timeout ran out
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.__condition:
+            while True:
+                while self.__queue and self.__queue[0][0] != self.__generation:
+                    self.__queue.popleft() # drop stale sentences of previous generations
+                if self.__queue:
+                    retrieved_sentence = self.__queue.popleft()[1]
+                    self.log(f"Retrieved '{retrieved_sentence.text}'")
+                    return retrieved_sentence
+                if not self.__is_more_to_come:
+                    self.log(f"Nothing to get from queue, returning None")
+                    return None
+                if deadline is None:
+                    self.__condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.log(f"Timed out waiting for next sentence, returning None")
+                        return None
+                    self.__condition.wait(remaining)
+
     @utils.time_it
-    def put(self, new_sentence: Sentence):
-        self.log(f"Trying to aquire put_lock to put '{new_sentence.text}'")
-        with self.__put_lock:
+    def put(self, new_sentence: Sentence, generation: int | None = None):
+        """Adds a sentence to the end of the queue
+
+        Args:
+            new_sentence (Sentence): The sentence to add
+            generation (int | None, optional): The generation the sentence belongs to. Sentences of outdated generations are discarded. Defaults to None (the current generation).
+        """
+        with self.__condition:
+            if generation is not None and generation != self.__generation:
+                self.log(f"Discarding '{new_sentence.text}' of outdated generation {generation}")
+                return
             self.log(f"Putting '{new_sentence.text}'")
-            self.__queue.put(new_sentence)
+            self.__queue.append((self.__generation, new_sentence))
+            self.__condition.notify()
 
     @utils.time_it
     def put_at_front(self, new_sentence: Sentence):
-        self.log(f"Trying to aquire get_lock to put_at_front '{new_sentence.text}'")
-        with self.__get_lock:
-            self.log(f"Trying to aquire put_lock to put_at_front '{new_sentence.text}'")
-            with self.__put_lock:            
-                sentence_list: list[Sentence] = []
-                try:
-                    while True:
-                        sentence_list.append(self.__queue.get_nowait() )
-                except queue.Empty:
-                    pass
-                self.__queue.put_nowait(new_sentence)
-                for s in sentence_list:
-                    self.__queue.put_nowait(s)
+        """Adds a sentence of the current generation to the front of the queue, so it is the next one to be retrieved
+
+        Args:
+            new_sentence (Sentence): The sentence to add
+        """
+        with self.__condition:
+            self.log(f"Putting '{new_sentence.text}' at front")
+            self.__queue.appendleft((self.__generation, new_sentence))
+            self.__condition.notify()
+
+    @utils.time_it
+    def finish_generation(self, generation: int | None = None):
+        """Signals that no more sentences are to come for a generation. Has no effect if that generation is already outdated
+
+        Args:
+            generation (int | None, optional): The generation that has finished. Defaults to None (the current generation).
+        """
+        with self.__condition:
+            if generation is not None and generation != self.__generation:
+                return
+            self.__is_more_to_come = False
+            self.__condition.notify_all()
 
     @utils.time_it
     def clear(self):
-        self.log(f"Trying to aquire get_lock to clear()")
-        with self.__get_lock:
-            self.log(f"Trying to aquire put_lock to clear()")
-            with self.__put_lock:
-                try:
-                    while True:                
-                        self.__queue.get_nowait()
-                except queue.Empty:
-                    pass
-    
+        """Discards all sentences currently in the queue by starting a new generation
+        """
+        with self.__condition:
+            self.log(f"Clearing generation {self.__generation}")
+            self.__generation += 1
+
     @utils.time_it
     def log(self, text: str):
         if(self.__should_log):
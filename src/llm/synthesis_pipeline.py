@@ -0,0 +1,94 @@
+import asyncio
+from concurrent.futures import Future
+from typing import Callable
+from src.llm.sentence import Sentence
+from src.llm.sentence_content import SentenceContent
+from src.llm.sentence_queue import SentenceQueue
+
+class SynthesisPipeline:
+    """Consumer stage that voices parsed sentences while the LLM keeps streaming.
+
+    Sentences handed over via :func:`submit` are dispatched for synthesis right away, so sentences that end up on different TTS workers
+    (e.g. the lines of different speakers) are synthesized at the same time. They are still published to the SentenceQueue in the order they were submitted.
+    The number of sentences in flight is bounded, so a fast LLM cannot run arbitrarily far ahead of the TTS.
+    """
+    def __init__(self, dispatch: Callable[[SentenceContent], Future[Sentence]], output_queue: SentenceQueue, max_pending: int = 4, generation: int | None = None) -> None:
+        """
+        Args:
+            dispatch (Callable[[SentenceContent], Future[Sentence]]): Starts the synthesis of a SentenceContent without blocking and returns the future of the voiced Sentence
+            output_queue (SentenceQueue): The queue to publish voiced sentences to
+            max_pending (int, optional): How many sentences can be synthesized or wait for publication before :func:`submit` blocks. Defaults to 4.
+            generation (int | None, optional): The generation of the output queue the sentences belong to. Defaults to None (whichever generation is current when publishing).
+        """
+        self.__dispatch: Callable[[SentenceContent], Future[Sentence]] = dispatch
+        self.__output_queue: SentenceQueue = output_queue
+        self.__generation: int | None = generation
+        self.__slots: asyncio.Semaphore = asyncio.Semaphore(max_pending)
+        self.__pending: asyncio.Queue[tuple[asyncio.Future[Sentence], asyncio.Future[Sentence]] | None] = asyncio.Queue()
+        self.__consumer: asyncio.Task | None = None
+
+    def start(self):
+        """Starts publishing submitted sentences. Must be called from within the running event loop
+        """
+        if not self.__consumer:
+            self.__consumer = asyncio.get_running_loop().create_task(self.__consume())
+
+    async def submit(self, content: SentenceContent) -> asyncio.Future[Sentence]:
+        """Dispatches a sentence for synthesis. Waits if too many sentences are already in flight
+
+        Args:
+            content (SentenceContent): The sentence to voice
+
+        Returns:
+            asyncio.Future[Sentence]: Resolves to the voiced sentence once it has been published to the output queue
+        """
+        loop = asyncio.get_running_loop()
+        published: asyncio.Future[Sentence] = loop.create_future()
+        await self.__slots.acquire()
+        synthesis: asyncio.Future[Sentence] = asyncio.wrap_future(self.__dispatch(content), loop=loop)
+        self.__pending.put_nowait((synthesis, published))
+        return published
+
+    async def flush(self):
+        """Waits until every submitted sentence has been synthesized and published, then stops the consumer
+        """
+        if not self.__consumer:
+            return
+        self.__pending.put_nowait(None)
+        await self.__consumer
+        self.__consumer = None
+
+    def cancel(self):
+        """Stops the consumer right away and drops every sentence that has not been published yet.
+        Syntheses that have not started yet are dropped, one that is already running is left to finish, but its result is discarded
+        """
+        if self.__consumer:
+            self.__consumer.cancel()
+            self.__consumer = None
+        while not self.__pending.empty():
+            job = self.__pending.get_nowait()
+            if job:
+                synthesis, published = job
+                synthesis.cancel()
+                published.cancel()
+
+    async def __consume(self):
+        while True:
+            job = await self.__pending.get()
+            if job is None:
+                return
+            synthesis, published = job
+            try:
+                sentence = await synthesis
+            except asyncio.CancelledError:
+                published.cancel()
+                raise
+            except Exception as e:
+                if not published.done():
+                    published.set_exception(e)
+                continue
+            finally:
+                self.__slots.release()
+            self.__output_queue.put(sentence, self.__generation)
+            if not published.done():
+                published.set_result(sentence)
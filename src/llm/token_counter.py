@@ -0,0 +1,139 @@
+from abc import ABC, abstractmethod
+import logging
+import math
+from threading import Lock
+from typing import Any
+import tiktoken
+
+class TokenCounter(ABC):
+    """Counts the tokens of a text for a language model
+    """
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Identifies the counts of this counter. Token counts cached under a different name are counted again
+        """
+        pass
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        pass
+
+
+class TiktokenCounter(TokenCounter):
+    """Exact token counts with a tiktoken encoding. Used for OpenAI models
+    """
+    def __init__(self, encoding: tiktoken.Encoding) -> None:
+        self.__encoding: tiktoken.Encoding = encoding
+
+    @property
+    def name(self) -> str:
+        return self.__encoding.name
+
+    def count(self, text: str) -> int:
+        return len(self.__encoding.encode(text))
+
+
+class ModelTokenizerCounter(TokenCounter):
+    """Exact token counts with the Hugging Face tokenizer of a model (e.g. 'mistralai/Mistral-Nemo-Instruct-2407').
+    The tokenizer is only loaded on first use and needs the optional `tokenizers` package
+    """
+    __loaded: dict[str, Any] = {} # model -> tokenizer or None if it could not be loaded
+    __load_lock: Lock = Lock()
+
+    def __init__(self, model: str) -> None:
+        self.__model: str = model
+
+    @property
+    def name(self) -> str:
+        return f"tokenizer:{self.__model}"
+
+    @property
+    def is_available(self) -> bool:
+        """Loads the tokenizer if that has not been tried yet. False if there is no tokenizer for the model
+        """
+        return self.__get_tokenizer() is not None
+
+    def count(self, text: str) -> int:
+        tokenizer = self.__get_tokenizer()
+        if not tokenizer:
+            raise ValueError(f"No tokenizer available for '{self.__model}'")
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def __get_tokenizer(self) -> Any:
+        with ModelTokenizerCounter.__load_lock:
+            if self.__model not in ModelTokenizerCounter.__loaded:
+                ModelTokenizerCounter.__loaded[self.__model] = ModelTokenizerCounter.__load(self.__model)
+            return ModelTokenizerCounter.__loaded[self.__model]
+
+    @staticmethod
+    def __load(model: str) -> Any:
+        if '/' not in model: # not a Hugging Face model id
+            return None
+        try:
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_pretrained(model.split(':')[0]) # drop OpenRouter suffixes like ':free'
+            logging.debug(f"Loaded the tokenizer of '{model}'")
+            return tokenizer
+        except Exception as e:
+            logging.debug(f"Could not load a tokenizer for '{model}': {e}")
+            return None
+
+
+class TokenEstimator(TokenCounter):
+    """Estimates token counts from the number of characters and words of a text, at next to no cost.
+
+    The characters per token differ between models and languages. They start at DEFAULT_CHARS_PER_TOKEN and are
+    calibrated with the actual prompt tokens LLM services report in the `usage` of their replies.
+    """
+    DEFAULT_CHARS_PER_TOKEN: float = 4.0
+    MIN_CHARS_PER_TOKEN: float = 1.0
+    MAX_CHARS_PER_TOKEN: float = 10.0
+    SMOOTHING: float = 0.3 # weight of the newest calibration
+
+    def __init__(self, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN) -> None:
+        self.__chars_per_token: float = chars_per_token
+        self.__calibration_count: int = 0
+        self.__lock = Lock()
+
+    @property
+    def name(self) -> str:
+        return f"estimate:{self.chars_per_token}"
+
+    @property
+    def chars_per_token(self) -> float:
+        """The current characters per token. Rounded, so that token counts cached under the name only get counted again once the calibration moves noticeably
+        """
+        return round(self.__chars_per_token, 1)
+
+    @property
+    def is_calibrated(self) -> bool:
+        return self.__calibration_count > 0
+
+    def count(self, text: str) -> int:
+        # every word is at least one token, no matter how short
+        return max(math.ceil(len(text) / self.chars_per_token), len(text.split()))
+
+    def calibrate(self, char_count: int, token_count: int):
+        """Moves the characters per token towards the ones of a text whose actual token count is known
+
+        Args:
+            char_count (int): The number of characters of the text
+            token_count (int): The actual number of tokens of the text
+        """
+        if char_count <= 0 or token_count <= 0:
+            return
+        measured = min(self.MAX_CHARS_PER_TOKEN, max(self.MIN_CHARS_PER_TOKEN, char_count / token_count))
+        with self.__lock:
+            if self.__calibration_count == 0:
+                self.__chars_per_token = measured
+            else:
+                self.__chars_per_token += self.SMOOTHING * (measured - self.__chars_per_token)
+            self.__calibration_count += 1
+
+    @staticmethod
+    def get_prompt_tokens(usage: Any) -> int | None:
+        """Returns the `prompt_tokens` of the `usage` of a reply, either as the openai object or as a plain dict
+        """
+        prompt_tokens = usage.get("prompt_tokens") if isinstance(usage, dict) else getattr(usage, "prompt_tokens", None)
+        return prompt_tokens if isinstance(prompt_tokens, int) else None
@@ -1,5 +1,7 @@
 import asyncio
+from concurrent.futures import Future
 from threading import Lock
+from typing import Callable
 import logging
 import time
 import unicodedata
@@ -10,12 +12,20 @@ from src.llm.output.max_count_sentences_parser import max_count_sentences_parser
 from src.llm.output.sentence_length_parser import sentence_length_parser
 from src.llm.output.actions_parser import actions_parser
 from src.llm.output.change_character_parser import change_character_parser
+from src.llm.output.clean_sentence_parser import clean_sentence_parser
+from src.llm.output.delta_coalescer import delta_coalescer
+from src.llm.output.early_clause_parser import early_clause_parser
 from src.llm.output.narration_parser import narration_parser
 from src.llm.output.output_parser import output_parser, sentence_generation_settings
+from src.llm.output.parser_chain import parser_chain
 from src.llm.output.sentence_end_parser import sentence_end_parser
 from src.llm.sentence_content import SentenceTypeEnum, SentenceContent
 from src.conversation.action import Action
 from src.llm.sentence_queue import SentenceQueue
+from src.llm.synthesis_pipeline import SynthesisPipeline
+from src.llm.cancellation_token import CancellationToken
+from src.llm.generation_loop import GenerationLoop
+from src.llm.request_scheduler import RequestScheduler
 from src.config.config_loader import ConfigLoader
 from src.llm.sentence import Sentence
 from src import utils
@@ -25,175 +35,339 @@ from src.llm.message_thread import message_thread
 from src.llm.ai_client import AIClient
 from src.tts.ttsable import TTSable
 from src.tts.synthesization_options import SynthesizationOptions
+from src.tts.tts_worker_pool import TTSWorkerPool
+from src.turn_timeline import TurnTimeline, TurnTimelineRecorder
 
 class ChatManager:
-    def __init__(self, config: ConfigLoader, tts: TTSable, client: AIClient):
+    MAX_PENDING_SYNTHESIS: int = 4
+    RETRY_DELAY_SECONDS: float = 0.5 # delay before the first retry, doubles with every further one
+
+    def __init__(self, config: ConfigLoader, tts: TTSable, client: AIClient, generation_loop: GenerationLoop | None = None, tts_factory: Callable[[int], TTSable] | None = None):
         self.loglevel = 28
+        self.__generation_loop: GenerationLoop = generation_loop if generation_loop else GenerationLoop.get_shared()
         self.__config: ConfigLoader = config
         self.__tts: TTSable = tts
         self.__client: AIClient = client
         self.__is_generating: bool = False
-        self.__stop_generation = asyncio.Event()
-        self.__tts_access_lock = Lock()
-        self.__is_first_sentence: bool = False
+        self.__generation_id: int = 0
+        self.__current_generation: CancellationToken | None = None
+        self.__generation_lock = Lock()
+        # voicelines of a response are synthesized on these workers while the LLM keeps streaming, lines of different voices can run on different workers at the same time
+        self.__tts_workers = TTSWorkerPool(tts, tts_factory, config.tts_parallel_workers if config.tts_parallel_workers else 1)
+        self.__first_audio_latency: float | None = None
         self.__end_of_sentence_chars = ['.', '?', '!', ';', '。', '？', '！', '；']
         self.__end_of_sentence_chars = [unicodedata.normalize('NFKC', char) for char in self.__end_of_sentence_chars]
 
     @property
     def tts(self) -> TTSable:
         return self.__tts
+
+    @property
+    def first_audio_latency(self) -> float | None:
+        """Seconds from the start of the last response until its first voiceline was ready. None if no voiceline has been ready yet"""
+        return self.__first_audio_latency
     
     @utils.time_it
     def generate_sentence(self, content: SentenceContent) -> Sentence:
         """Generates the audio for a text and returns the corresponding sentence
 
         Args:
-            text (str): the text to be voices
-            character_to_talk (Character): the character to say the sentence
-            is_system_generated_sentence (bool, optional): Is this sentence system generated? Defaults to False.
+            content (SentenceContent): the text to be voiced and the character to say it
 
         Returns:
-            Sentence | None: _description_
+            Sentence: the voiced sentence
         """
+        return self.__dispatch_sentence(content, TurnTimelineRecorder.get_shared().current_turn).result()
 
-        character_to_talk = content.speaker
-        text = ' ' + content.text + ' '
-        
+    def preload_voice(self, character: Character) -> Future[None]:
+        """Loads the voice model of a character on the TTS worker its voicelines will be synthesized on, without waiting for it.
+        Voicelines of the character submitted afterwards run after the voice has been loaded
+
+        Args:
+            character (Character): the character to load the voice of
+
+        Returns:
+            Future[None]: done once the voice has been loaded
+        """
+        future = self.__tts_workers.submit(character.tts_voice_model, lambda tts: tts.change_voice(
+            character.tts_voice_model, 
+            character.in_game_voice_model, 
+            character.csv_in_game_voice_model, 
+            character.advanced_voice_model, 
+            character.voice_accent, 
+            voice_gender=character.gender, 
+            voice_race=character.race
+        ))
+        def log_error(done: Future[None]):
+            if not done.cancelled() and done.exception():
+                logging.error(f"Could not preload voice model of {character.name}: {done.exception()}")
+        future.add_done_callback(log_error)
+        return future
+
+    @staticmethod
+    def __is_too_short(content: SentenceContent) -> bool:
+        return len(content.text.strip()) < 3
+
+    def __dispatch_sentence(self, content: SentenceContent, timeline: TurnTimeline | None = None, is_first_sentence: bool = False) -> Future[Sentence]:
+        """Queues the synthesis of a sentence on the TTS worker of its voice without waiting for it
+
+        Args:
+            content (SentenceContent): the text to be voiced and the character to say it
+            timeline (TurnTimeline | None, optional): the timeline of the turn to record the synthesis in. Defaults to None.
+            is_first_sentence (bool, optional): if this is the first voiceline of a response. Defaults to False.
+
+        Returns:
+            Future[Sentence]: the voiced sentence
+        """
         # Check for short voicelines before sending to TTS
-        if len(content.text.strip()) < 3:
+        if self.__is_too_short(content):
             logging.warning(f"Skipping TTS for voiceline that is too-short: '{content.text.strip()}'")
             # Return a sentence object without audio - skipping TTS entirely
-            return Sentence(SentenceContent(character_to_talk, text, content.sentence_type, True), "", 0)
+            skipped: Future[Sentence] = Future()
+            skipped.set_result(Sentence(SentenceContent(content.speaker, ' ' + content.text + ' ', content.sentence_type, True), "", 0))
+            return skipped
 
-        with self.__tts_access_lock:
-            try:
-                if self.__config.narration_handling == NarrationHandlingEnum.USE_NARRATOR and content.sentence_type == SentenceTypeEnum.NARRATION:
-                    synth_options = SynthesizationOptions(False, self.__is_first_sentence)
-                    audio_file = self.__tts.synthesize(self.__config.narrator_voice, text, self.__config.narrator_voice, self.__config.narrator_voice, "en", synth_options, self.__config.narrator_voice)
-                else:
-                    synth_options = SynthesizationOptions(character_to_talk.is_in_combat, self.__is_first_sentence)
-                    audio_file = self.__tts.synthesize(character_to_talk.tts_voice_model, text, character_to_talk.in_game_voice_model, character_to_talk.csv_in_game_voice_model, character_to_talk.voice_accent, synth_options, character_to_talk.advanced_voice_model)
-            except Exception as e:
-                utils.play_error_sound()
-                error_text = f"Text-to-Speech Error: {e}"
-                logging.log(29, error_text)
-                return Sentence(SentenceContent(character_to_talk, text, content.sentence_type, True), "", 0, error_text)
-            self.__is_first_sentence = False
-            return Sentence(SentenceContent(character_to_talk, text, content.sentence_type, content.is_system_generated_sentence, content.actions), audio_file, utils.get_audio_duration(audio_file))
+        if self.__config.narration_handling == NarrationHandlingEnum.USE_NARRATOR and content.sentence_type == SentenceTypeEnum.NARRATION:
+            voice = self.__config.narrator_voice
+        else:
+            voice = content.speaker.tts_voice_model
+        return self.__tts_workers.submit(voice, lambda tts: self.__synthesize(tts, content, timeline, is_first_sentence))
+
+    def __synthesize(self, tts: TTSable, content: SentenceContent, timeline: TurnTimeline | None, is_first_sentence: bool) -> Sentence:
+        """Voices a sentence with the given TTS. Only ever called on the thread of the TTS worker that owns `tts`
+        """
+        character_to_talk = content.speaker
+        text = ' ' + content.text + ' '
+        if timeline:
+            timeline.record(TurnTimeline.TTS_START, speaker=character_to_talk.name, text=content.text)
+        try:
+            if self.__config.narration_handling == NarrationHandlingEnum.USE_NARRATOR and content.sentence_type == SentenceTypeEnum.NARRATION:
+                synth_options = SynthesizationOptions(False, is_first_sentence, timeline)
+                audio_file = tts.synthesize(self.__config.narrator_voice, text, self.__config.narrator_voice, self.__config.narrator_voice, "en", synth_options, self.__config.narrator_voice)
+            else:
+                synth_options = SynthesizationOptions(character_to_talk.is_in_combat, is_first_sentence, timeline)
+                audio_file = tts.synthesize(character_to_talk.tts_voice_model, text, character_to_talk.in_game_voice_model, character_to_talk.csv_in_game_voice_model, character_to_talk.voice_accent, synth_options, character_to_talk.advanced_voice_model)
+        except Exception as e:
+            utils.play_error_sound()
+            error_text = f"Text-to-Speech Error: {e}"
+            logging.log(29, error_text)
+            if timeline:
+                timeline.record(TurnTimeline.TTS_END, speaker=character_to_talk.name, error=error_text)
+            return Sentence(SentenceContent(character_to_talk, text, content.sentence_type, True), "", 0, error_text)
+        if timeline:
+            timeline.record(TurnTimeline.TTS_END, speaker=character_to_talk.name, text=content.text)
+        return Sentence(SentenceContent(character_to_talk, text, content.sentence_type, content.is_system_generated_sentence, content.actions), audio_file, utils.get_audio_duration(audio_file))
 
     @utils.time_it
-    def generate_response(self, messages: message_thread, characters: Characters, blocking_queue: SentenceQueue, actions: list[Action]):
-        """Starts generating responses by the LLM for the current state of the input messages
+    def start_generation(self, messages: message_thread, characters: Characters, blocking_queue: SentenceQueue, actions: list[Action]) -> CancellationToken | None:
+        """Starts generating responses by the LLM for the current state of the input messages on the background generation loop and returns right away.
+        If a previous generation is still winding down, waits for it to finish first. Marks the queue as having more sentences to come
 
         Args:
             messages (message_thread): _description_
             characters (Characters): _description_
             blocking_queue (SentenceQueue): _description_
             actions (list[Action]): _description_
+
+        Returns:
+            CancellationToken | None: The token of the new generation or None if there is no character to respond
         """
         if(not characters.last_added_character):
-            return
+            return None
+        with self.__generation_lock:
+            previous_generation = self.__current_generation
+        if previous_generation:
+            previous_generation.wait_until_finished()
+        with self.__generation_lock:
+            self.__generation_id += 1
+            cancellation = CancellationToken(self.__generation_id)
+            self.__current_generation = cancellation
         self.__is_generating = True
-        
-        asyncio.run(self.process_response(characters.last_added_character, blocking_queue, messages, characters, actions))
+        blocking_queue.is_more_to_come = True
+        self.__generation_loop.submit(self.__run_generation(cancellation, characters.last_added_character, blocking_queue, messages, characters, actions))
+        return cancellation
+
+    @utils.time_it
+    def generate_response(self, messages: message_thread, characters: Characters, blocking_queue: SentenceQueue, actions: list[Action]):
+        """Generates responses by the LLM for the current state of the input messages and only returns once the generation has finished
+
+        Args:
+            messages (message_thread): _description_
+            characters (Characters): _description_
+            blocking_queue (SentenceQueue): _description_
+            actions (list[Action]): _description_
+        """
+        cancellation = self.start_generation(messages, characters, blocking_queue, actions)
+        if cancellation:
+            cancellation.wait_until_finished()
+
+    async def __run_generation(self, cancellation: CancellationToken, active_character: Character, blocking_queue: SentenceQueue, messages : message_thread, characters: Characters, actions: list[Action]):
+        """Runs :func:`process_response` as a task that is cancelled the moment the cancellation token is.
+        Cancelling the task aborts whatever it is awaiting right now, including the in-flight stream of the LLM
+        """
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(self.process_response(active_character, blocking_queue, messages, characters, actions, cancellation))
+        def cancel_task():
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError: # the loop has already been closed, nothing left to cancel
+                pass
+        await asyncio.sleep(0) # let the task enter process_response first, a task cancelled before its first step would skip its cleanup
+        cancellation.add_cancel_callback(cancel_task)
+        try:
+            await task
+        except asyncio.CancelledError:
+            logging.log(self.loglevel, f"Generation {cancellation.generation_id} cancelled")
+        except Exception as e:
+            logging.error(f"Generation {cancellation.generation_id} failed: {e}")
+        finally:
+            cancellation.remove_cancel_callback(cancel_task)
+            self.__is_generating = False
+            cancellation.mark_finished()
+
+    def __record_first_audio(self, published: asyncio.Future[Sentence], response_start_time: float):
+        """Records how long it took until the first voiceline of a response was ready to be played
+        """
+        if self.__first_audio_latency is not None or published.cancelled() or published.exception():
+            return
+        self.__first_audio_latency = time.time() - response_start_time
+        early_cut = "on" if self.__config.early_clause_cut else "off"
+        logging.log(self.loglevel, f"First voiceline ready {round(self.__first_audio_latency, 5)} seconds after the request (early clause cut {early_cut})")
+
+    def cancel_generation(self):
+        """Cancels the current generation without waiting for it to wind down. Safe to call from any thread
+        """
+        with self.__generation_lock:
+            cancellation = self.__current_generation
+        if cancellation:
+            cancellation.cancel()
     
     @utils.time_it
     def stop_generation(self):
         """Stops the current generation and only returns once this stop has been successful
         """
-        self.__stop_generation.set()
-        while self.__is_generating:
-            time.sleep(0.01)
-        self.__stop_generation.clear()
-        return
+        with self.__generation_lock:
+            cancellation = self.__current_generation
+        if cancellation:
+            cancellation.cancel()
+            cancellation.wait_until_finished()
  
     @utils.time_it
-    async def process_response(self, active_character: Character, blocking_queue: SentenceQueue, messages : message_thread, characters: Characters, actions: list[Action]):
+    async def process_response(self, active_character: Character, blocking_queue: SentenceQueue, messages : message_thread, characters: Characters, actions: list[Action], cancellation: CancellationToken | None = None):
         """Stream response from LLM one sentence at a time"""
 
         raw_response: str = ''  # Track the raw response
         first_token = True
         parsed_sentence: SentenceContent | None = None
         pending_sentence: SentenceContent | None = None
-        self.__is_first_sentence = True
+        is_first_sentence = True # decided here in the order of submission, the syntheses themselves run on several TTS workers at once
+        self.__first_audio_latency = None
+        response_start_time = time.time()
+        recorder = TurnTimelineRecorder.get_shared()
+        timeline = recorder.current_turn
+        if not timeline or timeline.has_event(TurnTimeline.REQUEST_SENT): # the NPC speaks without a new input from the player, e.g. greetings and radiant conversations
+            timeline = recorder.start_turn(TurnTimeline.GENERATION_STARTED)
         is_multi_npc = characters.contains_multiple_npcs()
         max_response_sentences = self.__config.max_response_sentences_single if not is_multi_npc else self.__config.max_response_sentences_multi
         max_retries = 5
         retries = 0
 
-        parser_chain: list[output_parser] = [
+        parsers: list[output_parser] = [
             change_character_parser(characters)]
         if self.__config.narration_handling != NarrationHandlingEnum.DEACTIVATE_HANDLING_OF_NARRATIONS:
-            parser_chain.append(narration_parser(self.__config.narration_start_indicators, self.__config.narration_end_indicators, 
+            parsers.append(narration_parser(self.__config.narration_start_indicators, self.__config.narration_end_indicators, 
                                                  self.__config.speech_start_indicators, self.__config.speech_end_indicators))
-        parser_chain.extend([
-            sentence_end_parser(),
+        parsers.append(sentence_end_parser())
+        if self.__config.early_clause_cut:
+            # a clause shorter than 'number_words_tts' would only be held back by the sentence_length_parser
+            parsers.append(early_clause_parser(max(self.__config.early_clause_cut_min_words, self.__config.number_words_tts)))
+        parsers.extend([
             actions_parser(actions),
             sentence_length_parser(self.__config.number_words_tts),
             max_count_sentences_parser(max_response_sentences, not characters.contains_player_character())
         ])
 
-        cut_indicators: set[str] = set()
-        for parser in parser_chain:
-            indicators = parser.get_cut_indicators()
-            for i in indicators:
-                cut_indicators.add(i)
-        accumulator: sentence_accumulator = sentence_accumulator(list(cut_indicators))
+        chain: parser_chain = parser_chain(parsers)
+        accumulator: sentence_accumulator = sentence_accumulator(chain.get_cut_indicators(), chain.get_lookahead_cut_indicators())
+        # deltas without any character a sentence could be cut at are batched up, the accumulator could not cut a sentence from them anyway
+        coalescer: delta_coalescer = delta_coalescer(chain.get_cut_indicators() + clean_sentence_parser.REWRITTEN_CHARS, lookahead_chars=chain.get_lookahead_cut_indicators())
+        queue_generation = blocking_queue.generation # sentences that are still produced after the queue has been cleared are discarded
+        def dispatch(content: SentenceContent) -> Future[Sentence]:
+            nonlocal is_first_sentence
+            synthesized = self.__dispatch_sentence(content, timeline, is_first_sentence)
+            if not self.__is_too_short(content): # skipped voicelines are not voiced, the next one is still the first
+                is_first_sentence = False
+            return synthesized
+
+        synthesis: SynthesisPipeline = SynthesisPipeline(dispatch, blocking_queue, self.MAX_PENDING_SYNTHESIS, queue_generation)
+        synthesis.start()
+
+        async def voice(content: SentenceContent):
+            published = await synthesis.submit(content)
+            if self.__first_audio_latency is None and not content.is_system_generated_sentence:
+                published.add_done_callback(lambda future: self.__record_first_audio(future, response_start_time))
        
         try:
             current_sentence: str = ''
             settings: sentence_generation_settings = sentence_generation_settings(active_character)
+
+            async def voice_sentences(batch: str | None):
+                """Accumulates a batch of the output and voices every sentence the parser chain cuts from it"""
+                nonlocal current_sentence, parsed_sentence, pending_sentence
+                if batch:
+                    accumulator.accumulate(batch)
+                while accumulator.has_next_sentence():
+                    current_sentence = accumulator.get_next_sentence()
+                    # Apply parsers
+                    parsed_sentence, pending_sentence, current_sentence = chain.process(current_sentence, pending_sentence, settings)
+                    if settings.stop_generation:
+                        break
+                    accumulator.refuse(current_sentence)
+                    # Process sentences from the parser chain
+                    if parsed_sentence:
+                        timeline.record(TurnTimeline.SENTENCE_CUT, speaker=parsed_sentence.speaker.name, text=parsed_sentence.text)
+                        if not self.__config.narration_handling == NarrationHandlingEnum.CUT_NARRATIONS or parsed_sentence.sentence_type != SentenceTypeEnum.NARRATION:
+                            await voice(parsed_sentence)
+                            parsed_sentence = None
+
+            async def voice_held_back_sentences():
+                """Voices the sentences in the output the coalescer is still holding back, e.g. at the end of the stream"""
+                if not settings.stop_generation and not (cancellation and cancellation.is_cancelled):
+                    await voice_sentences(coalescer.flush())
+
             while retries < max_retries:
                 try:
                     start_time = time.time()
+                    timeline.record(TurnTimeline.REQUEST_SENT, retries=retries)
                     async for content in self.__client.streaming_call(messages=messages, is_multi_npc=is_multi_npc):
-                        if self.__stop_generation.is_set():
+                        if cancellation and cancellation.is_cancelled:
                             break
                         if not content:
                             continue
 
                         if first_token:
                             logging.log(self.loglevel, f"LLM took {round(time.time() - start_time, 5)} seconds to respond")
+                            timeline.record(TurnTimeline.FIRST_TOKEN)
                             first_token = False
                         
                         raw_response += content
-                        accumulator.accumulate(content)
-                        while accumulator.has_next_sentence():
-                            current_sentence = accumulator.get_next_sentence()
-                            # current_sentence += content
-                            parsed_sentence: SentenceContent | None = None
-                            # Apply parsers
-                            for parser in parser_chain:
-                                if not parsed_sentence:  # Try to extract a complete sentence
-                                    parsed_sentence, current_sentence = parser.cut_sentence(current_sentence, settings)
-                                if parsed_sentence:  # Apply modifications if we already have a sentence
-                                    parsed_sentence, pending_sentence = parser.modify_sentence_content(parsed_sentence, pending_sentence, settings)
-                                if settings.stop_generation:
-                                    break
-                            if settings.stop_generation:
-                                break
-                            accumulator.refuse(current_sentence)
-                            # Process sentences from the parser chain
-                            if parsed_sentence:
-                                if not self.__config.narration_handling == NarrationHandlingEnum.CUT_NARRATIONS or parsed_sentence.sentence_type != SentenceTypeEnum.NARRATION:
-                                    new_sentence = self.generate_sentence(parsed_sentence)
-                                    blocking_queue.put(new_sentence)
-                                    parsed_sentence = None
+                        await voice_sentences(coalescer.push(content))
                         if settings.stop_generation:
                             break
                         if settings.interrupting_action:
                             # If there is an interrupting action, stop the generation after the next sentence
                             settings.stop_generation = True
+                    await voice_held_back_sentences()
                     break #if the streaming_call() completed without exception, break the while loop
                             
                 except Exception as e:
                     retries += 1
                     utils.play_error_sound()
                     logging.error(f"LLM API Error: {e}")
+                    await voice_held_back_sentences() # what arrived before the error is voiced before the error message
                     
                     error_response = "I can't find the right words at the moment."
-                    new_sentence = self.generate_sentence(SentenceContent(active_character, error_response, SentenceTypeEnum.SPEECH, True))
-                    blocking_queue.put(new_sentence)
+                    new_sentence = await (await synthesis.submit(SentenceContent(active_character, error_response, SentenceTypeEnum.SPEECH, True)))
                     if new_sentence.error_message: # If the error message itself has an error, just give up
                         break
                     
@@ -202,7 +376,7 @@ class ChatManager:
                         break
                     
                     logging.log(self.loglevel, 'Retrying connection to API...')
-                    time.sleep(5)
+                    await asyncio.sleep(RequestScheduler.get_backoff_delay(retries, self.RETRY_DELAY_SECONDS))
 
         except Exception as e:
             utils.play_error_sound()
@@ -216,19 +390,23 @@ class ChatManager:
             else:
                 logging.error(f"LLM API Error: {e}")
         finally:
-            # Handle any remaining content
-            if parsed_sentence:
-                if not self.__config.narration_handling == NarrationHandlingEnum.CUT_NARRATIONS or parsed_sentence.sentence_type != SentenceTypeEnum.NARRATION:
-                    new_sentence = self.generate_sentence(parsed_sentence)
-                    blocking_queue.put(new_sentence)
-            
-            if pending_sentence:
-                if not self.__config.narration_handling == NarrationHandlingEnum.CUT_NARRATIONS or pending_sentence.sentence_type != SentenceTypeEnum.NARRATION:
-                    new_sentence = self.generate_sentence(pending_sentence)
-                    blocking_queue.put(new_sentence)
-            logging.log(23, f"Full raw response ({self.__client.get_count_tokens(raw_response)} tokens): {raw_response.strip()}")
-            blocking_queue.is_more_to_come = False
-            # This sentence is required to make sure there is one in case the game is already waiting for it
-            # before the ChatManager realises there is not another message coming from the LLM
-            blocking_queue.put(Sentence(SentenceContent(active_character,"",SentenceTypeEnum.SPEECH, True),"",0))
-            self.__is_generating = False
\ No newline at end of file
+            try:
+                # Handle any remaining content, unless this generation has been cancelled
+                if not (cancellation and cancellation.is_cancelled):
+                    if parsed_sentence:
+                        if not self.__config.narration_handling == NarrationHandlingEnum.CUT_NARRATIONS or parsed_sentence.sentence_type != SentenceTypeEnum.NARRATION:
+                            await voice(parsed_sentence)
+                    
+                    if pending_sentence:
+                        if not self.__config.narration_handling == NarrationHandlingEnum.CUT_NARRATIONS or pending_sentence.sentence_type != SentenceTypeEnum.NARRATION:
+                            await voice(pending_sentence)
+                    await synthesis.flush() # make sure every voiceline of this response has been published before signalling the end of it
+            finally:
+                synthesis.cancel() # drops any voicelines still pending if the generation got cancelled, no-op after a flush
+                logging.log(23, f"Full raw response ({self.__client.get_count_tokens(raw_response)} tokens): {raw_response.strip()}")
+                timeline.record(TurnTimeline.RESPONSE_FINISHED, cancelled=bool(cancellation and cancellation.is_cancelled))
+                blocking_queue.finish_generation(queue_generation)
+                # This sentence is required to make sure there is one in case the game is already waiting for it
+                # before the ChatManager realises there is not another message coming from the LLM
+                blocking_queue.put(Sentence(SentenceContent(active_character,"",SentenceTypeEnum.SPEECH, True),"",0), queue_generation)
+                self.__is_generating = False
\ No newline at end of file
@@ -18,11 +18,12 @@ class Remembering(ABC):
         pass
 
     @abstractmethod
-    def save_conversation_state(self, messages: message_thread, npcs_in_conversation: Characters, world_id: str, is_reload=False):
+    def save_conversation_state(self, messages: message_thread, npcs_in_conversation: Characters, world_id: str, is_reload=False, is_continuation=False):
         """Saves the current state of the conversation.
 
         Args:
             messages (message_thread): The messages in the conversation
             npcs_in_conversation (Characters): the NPCs to save for
+            is_continuation (bool): if the earlier messages of the conversation have already been saved, e.g. by a summary checkpoint. The messages are then only the rest of it
         """
         pass
\ No newline at end of file
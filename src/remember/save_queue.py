@@ -0,0 +1,265 @@
+from enum import Enum
+import json
+import logging
+import os
+from queue import Queue
+from threading import Condition, Lock, Thread
+import time
+from typing import Any, Callable
+import uuid
+from src.character_manager import Character
+from src.characters_manager import Characters
+from src.config.config_loader import ConfigLoader
+from src.conversation.conversation_log import conversation_log
+from src.games.equipment import Equipment
+from src.llm.message_thread import message_thread
+from src.llm.messages import AssistantMessage, Message, UserMessage
+from src.llm.sentence import Sentence
+from src.llm.sentence_content import SentenceContent, SentenceTypeEnum
+from src.remember.remembering import Remembering
+
+class SaveJobStatusEnum(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class SaveJob:
+    """A conversation that still needs to be saved: its talk messages, the NPCs to save it for and the world it happened in.
+    Only holds plain values, so that it can be written to disk and run again after a restart
+    """
+    def __init__(self, world_id: str, characters: list[dict[str, str]], messages: list[dict[str, Any]], is_reload: bool = False, id: str | None = None, created_at: float | None = None,
+                 log_messages: list[dict[str, Any]] | None = None, is_continuation: bool = False, is_log_written: bool = False) -> None:
+        """
+        Args:
+            world_id (str): The id of the world the conversation happened in
+            characters (list[dict[str, str]]): The base_id, ref_id and name of each NPC to save the conversation for
+            messages (list[dict[str, Any]]): The talk messages of the conversation that still need to be summarized as openai messages
+            is_reload (bool, optional): Passed on to Remembering.save_conversation_state. Defaults to False.
+            id (str | None, optional): The id of the job. Defaults to a new one.
+            created_at (float | None, optional): When the job has been created. Defaults to now.
+            log_messages (list[dict[str, Any]] | None, optional): The talk messages to write to the conversation log as openai messages. Defaults to None, the same as `messages`.
+            is_continuation (bool, optional): Passed on to Remembering.save_conversation_state. Defaults to False.
+            is_log_written (bool, optional): If the conversation log has already been written by an earlier try of the job. Defaults to False.
+        """
+        self.id: str = id if id else uuid.uuid4().hex
+        self.world_id: str = world_id
+        self.characters: list[dict[str, str]] = characters
+        self.messages: list[dict[str, Any]] = messages
+        self.log_messages: list[dict[str, Any]] = log_messages if log_messages is not None else messages
+        self.is_reload: bool = is_reload
+        self.is_continuation: bool = is_continuation
+        self.is_log_written: bool = is_log_written
+        self.created_at: float = created_at if created_at else time.time()
+        self.status: SaveJobStatusEnum = SaveJobStatusEnum.PENDING
+
+    @property
+    def ref_ids(self) -> list[str]:
+        return [character["ref_id"] for character in self.characters]
+
+    @staticmethod
+    def from_conversation(world_id: str, npcs: list[Character], messages: message_thread, is_reload: bool = False, log_messages: list[Message] | None = None, is_continuation: bool = False) -> 'SaveJob':
+        characters = [{"base_id": npc.base_id, "ref_id": npc.ref_id, "name": npc.name} for npc in npcs if not npc.is_player_character]
+        openai_log_messages = message_thread.transform_to_openai_messages(log_messages) if log_messages is not None else None
+        return SaveJob(world_id, characters, messages.transform_to_openai_messages(messages.get_talk_only()), is_reload, log_messages=openai_log_messages, is_continuation=is_continuation)
+
+    def save(self, config: ConfigLoader, rememberer: Remembering, save_progress: Callable[[], None] | None = None):
+        """Writes the conversation log and the conversation summary of each NPC, the same way a running conversation saves itself.
+        The log is appended to, so it is only written once even if the job is run again after the summary has failed
+
+        Args:
+            config (ConfigLoader): The config to rebuild the messages with
+            rememberer (Remembering): Saves the summary
+            save_progress (Callable[[], None] | None, optional): Writes the job back to disk once the log has been written. Defaults to None.
+        """
+        npcs = Characters()
+        for npc in self.__get_characters():
+            npcs.add_or_update_character(npc)
+        if not self.is_log_written:
+            for npc in npcs.get_all_characters():
+                conversation_log.save_conversation_log(npc, self.log_messages, self.world_id)
+            self.is_log_written = True
+            if save_progress:
+                save_progress()
+        rememberer.save_conversation_state(self.__get_message_thread(config, npcs), npcs, self.world_id, self.is_reload, self.is_continuation)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"id": self.id, "world_id": self.world_id, "characters": self.characters, "messages": self.messages, "log_messages": self.log_messages,
+                "is_reload": self.is_reload, "is_continuation": self.is_continuation, "is_log_written": self.is_log_written, "created_at": self.created_at}
+
+    def to_status_dict(self) -> dict[str, Any]:
+        return {"id": self.id, "status": self.status.value, "world_id": self.world_id, "npcs": [character["name"] for character in self.characters], "message_count": len(self.log_messages), "created_at": self.created_at}
+
+    @staticmethod
+    def from_dict(values: dict[str, Any]) -> 'SaveJob':
+        return SaveJob(values["world_id"], values["characters"], values["messages"], values.get("is_reload", False), values["id"], values.get("created_at"),
+                       values.get("log_messages"), values.get("is_continuation", False), values.get("is_log_written", False))
+
+    def __get_characters(self) -> list[Character]:
+        # only what saving needs (name and ids) has been kept of the NPCs
+        return [Character(character["base_id"], character["ref_id"], character["name"], 0, "", False, "", False, False, 0, False, "", "", "", "", "", Equipment({}), {}) for character in self.characters]
+
+    def __get_message_thread(self, config: ConfigLoader, npcs: Characters) -> message_thread:
+        messages = message_thread(config, None)
+        speaker = npcs.last_added_character
+        for message in self.messages:
+            if message["role"] == "assistant" and speaker:
+                # the content has already been formatted, so a single sentence holding all of it formats to the same text
+                assistant_message = AssistantMessage(config)
+                assistant_message.add_sentence(Sentence(SentenceContent(speaker, message["content"], SentenceTypeEnum.SPEECH), "", 0))
+                messages.add_message(assistant_message)
+            elif message["role"] == "user":
+                messages.add_message(UserMessage(config, message["content"]))
+        return messages
+
+
+class SaveQueue:
+    """Saves conversations one after the other on a background worker, so that ending a conversation does not wait for its summary.
+
+    Every job is written to its own file in the jobs folder before it is queued and only deleted once it has been saved.
+    Jobs left over from a crash or a quit (or that failed) are queued again the next time the queue is created
+    """
+    MAX_FINISHED_JOBS: int = 20 # how many done or failed jobs are kept for the status
+    __known_job_ids: set[str] = set() # jobs already queued in this process, e.g. by the queue of a game manager that has been replaced after a config change
+    __known_job_ids_lock: Lock = Lock()
+
+    def __init__(self, jobs_folder: str, save_job: Callable[[SaveJob], None]) -> None:
+        """
+        Args:
+            jobs_folder (str): The folder the pending jobs are written to
+            save_job (Callable[[SaveJob], None]): Saves a job. Runs on the worker thread
+        """
+        self.__jobs_folder: str = jobs_folder
+        self.__save_job: Callable[[SaveJob], None] = save_job
+        self.__condition = Condition()
+        self.__queue: Queue[tuple[SaveJob, Callable[[], None] | None]] = Queue()
+        self.__jobs: list[SaveJob] = []
+        for job in self.__load_jobs():
+            logging.log(23, f"Saving conversation with {', '.join(character['name'] for character in job.characters)} that was not saved before Mantella closed")
+            self.__add(job, None)
+        Thread(target=self.__work, name="SaveQueueWorker", daemon=True).start()
+
+    def put(self, job: SaveJob, before_save: Callable[[], None] | None = None):
+        """Writes a job to disk and queues it. Returns right away
+
+        Args:
+            job (SaveJob): The job to save
+            before_save (Callable[[], None] | None, optional): Called on the worker right before the job is saved, e.g. to wait for other saves of the conversation. Defaults to None.
+        """
+        self.__write_job(job)
+        self.__add(job, before_save)
+
+    def save_progress(self, job: SaveJob):
+        """Writes the current state of a job that is being saved back to disk, so running it again after a failure or a restart skips the steps it has finished
+        """
+        self.__write_job(job)
+
+    def is_pending(self, ref_id: str) -> bool:
+        """True if a job that is pending or running includes the NPC
+        """
+        with self.__condition:
+            return any(self.__is_unfinished(job) and ref_id in job.ref_ids for job in self.__jobs)
+
+    def wait_for_characters(self, ref_ids: list[str], timeout: float | None = None) -> bool:
+        """Waits until the jobs that include any of the NPCs have finished. Jobs of other NPCs are not waited for
+
+        Args:
+            ref_ids (list[str]): The ref_ids of the NPCs
+            timeout (float | None, optional): How long to wait at most in seconds. Defaults to None, no limit.
+
+        Returns:
+            bool: False if the timeout has been reached first
+        """
+        def is_saved() -> bool:
+            return not any(self.__is_unfinished(job) and any(ref_id in job.ref_ids for ref_id in ref_ids) for job in self.__jobs)
+        with self.__condition:
+            if is_saved():
+                return True
+            logging.log(23, "Waiting for the previous conversation to be saved...")
+            return self.__condition.wait_for(is_saved, timeout)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Waits until all jobs have finished
+
+        Returns:
+            bool: False if the timeout has been reached first
+        """
+        with self.__condition:
+            return self.__condition.wait_for(lambda: not any(self.__is_unfinished(job) for job in self.__jobs), timeout)
+
+    def get_status(self) -> dict[str, Any]:
+        """Returns the jobs the queue knows of, the unfinished ones first
+        """
+        with self.__condition:
+            unfinished = [job.to_status_dict() for job in self.__jobs if self.__is_unfinished(job)]
+            finished = [job.to_status_dict() for job in self.__jobs if not self.__is_unfinished(job)]
+        return {"pending": len(unfinished), "jobs": unfinished + finished}
+
+    def __add(self, job: SaveJob, before_save: Callable[[], None] | None):
+        with SaveQueue.__known_job_ids_lock:
+            SaveQueue.__known_job_ids.add(job.id)
+        with self.__condition:
+            self.__jobs.append(job)
+        self.__queue.put((job, before_save))
+
+    def __work(self):
+        while True:
+            job, before_save = self.__queue.get()
+            self.__set_status(job, SaveJobStatusEnum.RUNNING)
+            try:
+                if before_save:
+                    before_save()
+                    self.__write_job(job) # before_save may have changed what is left to save
+                self.__save_job(job)
+                self.__delete_job(job)
+                self.__set_status(job, SaveJobStatusEnum.DONE)
+            except Exception as e:
+                logging.error(f"Could not save conversation with {', '.join(character['name'] for character in job.characters)}, it will be saved again the next time Mantella starts: {e}")
+                self.__set_status(job, SaveJobStatusEnum.FAILED)
+
+    def __set_status(self, job: SaveJob, status: SaveJobStatusEnum):
+        with self.__condition:
+            job.status = status
+            finished = [queued for queued in self.__jobs if not self.__is_unfinished(queued)]
+            for old_job in finished[:-self.MAX_FINISHED_JOBS]:
+                self.__jobs.remove(old_job)
+            self.__condition.notify_all()
+
+    @staticmethod
+    def __is_unfinished(job: SaveJob) -> bool:
+        return job.status in (SaveJobStatusEnum.PENDING, SaveJobStatusEnum.RUNNING)
+
+    def __get_job_file(self, job: SaveJob) -> str:
+        return os.path.join(self.__jobs_folder, f"{job.id}.json")
+
+    def __write_job(self, job: SaveJob):
+        os.makedirs(self.__jobs_folder, exist_ok=True)
+        job_file = self.__get_job_file(job)
+        temp_file = f"{job_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(), f)
+        os.replace(temp_file, job_file) # never leaves a half written job behind
+
+    def __delete_job(self, job: SaveJob):
+        job_file = self.__get_job_file(job)
+        if os.path.exists(job_file):
+            os.remove(job_file)
+
+    def __load_jobs(self) -> list[SaveJob]:
+        if not os.path.exists(self.__jobs_folder):
+            return []
+        jobs: list[SaveJob] = []
+        for file_name in os.listdir(self.__jobs_folder):
+            if not file_name.endswith('.json'):
+                continue
+            with SaveQueue.__known_job_ids_lock:
+                if os.path.splitext(file_name)[0] in SaveQueue.__known_job_ids:
+                    continue
+            try:
+                with open(os.path.join(self.__jobs_folder, file_name), 'r', encoding='utf-8') as f:
+                    jobs.append(SaveJob.from_dict(json.load(f)))
+            except Exception as e:
+                logging.error(f"Could not read unsaved conversation {file_name}: {e}")
+        jobs.sort(key=lambda job: job.created_at)
+        return jobs
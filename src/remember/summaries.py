@@ -15,6 +15,8 @@ class Summaries(Remembering):
     """ Stores a conversation as a summary in a text file.
         Loads the latest summary from disk for a prompt text.
     """
+    MAX_SUMMARY_ATTEMPTS: int = 3
+    SUMMARY_RETRY_DELAY_SECONDS: float = 5
     def __init__(self, game: Gameable, config: ConfigLoader, client: LLMClient, language_name: str, summary_limit_pct: float = 0.3) -> None:
         super().__init__()
         self.loglevel = 28
@@ -53,12 +55,15 @@ class Summaries(Remembering):
             return ""
 
     @utils.time_it
-    def save_conversation_state(self, messages: message_thread, npcs_in_conversation: Characters, world_id: str, is_reload=False):
+    def save_conversation_state(self, messages: message_thread, npcs_in_conversation: Characters, world_id: str, is_reload=False, is_continuation=False):
         summary = ''
         for npc in npcs_in_conversation.get_all_characters():
             if not npc.is_player_character:
                 if len(summary) < 1: # if a summary has not already been generated, make one
-                    summary = self.__create_new_conversation_summary(messages, npc.name)
+                    if is_continuation:
+                        summary = self.__create_continued_conversation_summary(messages, npc, world_id)
+                    else:
+                        summary = self.__create_new_conversation_summary(messages, npc.name)
                 if len(summary) > 0 or is_reload: # if a summary has been generated, give the same summary to all NPCs
                     self.__append_new_conversation_summary(summary, npc, world_id)
 
@@ -117,19 +122,53 @@ class Summaries(Remembering):
                     language=self.__language_name,
                     game=self.__game
                 )
-        while True:
+        if len(messages) >= 5:
+            return self.__summarize_with_retries(messages.transform_to_dict_representation(messages.get_talk_only()), prompt, npc_name)
+        else:
+            logging.info(f"Conversation summary not saved. Not enough dialogue spoken.")
+        return ""
+
+    @utils.time_it
+    def __create_continued_conversation_summary(self, messages: message_thread, npc: Character, world_id: str) -> str:
+        """Summarizes the rest of a conversation whose earlier messages have already been summarized, however few messages are left.
+        The latest summary is passed along, so the new one carries on from it instead of repeating it
+        """
+        talk_messages = messages.get_talk_only()
+        if len(talk_messages) == 0:
+            return ""
+        text_to_summarize = messages.transform_to_dict_representation(talk_messages)
+        previous_summary = self.__get_latest_summary(npc, world_id)
+        if len(previous_summary) > 0:
+            text_to_summarize = f"Summary of the conversation so far:\n{previous_summary}\n\nThe rest of the conversation, which is what needs to be summarized:\n{text_to_summarize}"
+        prompt = self.__memory_prompt.format(
+                    name=npc.name,
+                    language=self.__language_name,
+                    game=self.__game
+                )
+        return self.__summarize_with_retries(text_to_summarize, prompt, npc.name)
+
+    def __summarize_with_retries(self, text_to_summarize: str, prompt: str, npc_name: str) -> str:
+        """Calls :func:`summarize_conversation` up to MAX_SUMMARY_ATTEMPTS times. Raises the error of the last attempt if all of them fail,
+        so a queued save fails and is run again the next time Mantella starts instead of blocking the save queue
+        """
+        for attempt in range(1, self.MAX_SUMMARY_ATTEMPTS + 1):
             try:
-                if len(messages) >= 5:
-                    return self.summarize_conversation(messages.transform_to_dict_representation(messages.get_talk_only()), prompt, npc_name)
-                else:
-                    logging.info(f"Conversation summary not saved. Not enough dialogue spoken.")
-                break
-            except:
-                logging.error('Failed to summarize conversation. Retrying...')
-                time.sleep(5)
-                continue
+                return self.summarize_conversation(text_to_summarize, prompt, npc_name)
+            except Exception as e:
+                if attempt == self.MAX_SUMMARY_ATTEMPTS:
+                    raise
+                logging.error(f'Failed to summarize conversation ({e}). Retrying...')
+                time.sleep(self.SUMMARY_RETRY_DELAY_SECONDS)
         return ""
 
+    def __get_latest_summary(self, npc: Character, world_id: str) -> str:
+        conversation_summary_file = self.__get_latest_conversation_summary_file_path(npc, world_id)
+        if not os.path.exists(conversation_summary_file):
+            return ""
+        with open(conversation_summary_file, 'r', encoding='utf-8') as f:
+            summaries = [summary.strip() for summary in f.read().split('\n\n') if len(summary.strip()) > 0]
+        return summaries[-1] if len(summaries) > 0 else ""
+
     @utils.time_it
     def __append_new_conversation_summary(self, new_summary: str, npc: Character, world_id: str):
         # if this is not the first conversation
@@ -157,19 +196,17 @@ class Summaries(Remembering):
         # if summaries token limit is reached, summarize the summaries
         if count_tokens_summaries > summary_limit:
             logging.info(f'Token limit of conversation summaries reached ({count_tokens_summaries} / {summary_limit} tokens). Creating new summary file...')
-            while True:
-                try:
-                    prompt = self.__resummarize_prompt.format(
-                        name=npc.name,
-                        language=self.__language_name,
-                        game=self.__game
-                    )
-                    long_conversation_summary = self.summarize_conversation(conversation_summaries, prompt, npc.name)
-                    break
-                except:
-                    logging.error('Failed to summarize conversation. Retrying...')
-                    time.sleep(5)
-                    continue
+            prompt = self.__resummarize_prompt.format(
+                name=npc.name,
+                language=self.__language_name,
+                game=self.__game
+            )
+            try:
+                long_conversation_summary = self.__summarize_with_retries(conversation_summaries, prompt, npc.name)
+            except Exception as e:
+                # the new summary has already been saved, the summaries are condensed the next time instead
+                logging.error(f'Failed to condense conversation summaries of {npc.name}, trying again after the next conversation: {e}')
+                return
 
             # Split the file path and increment the number by 1
             base_directory, filename = os.path.split(conversation_summary_file)
@@ -9,7 +9,7 @@ import json
 import io
 from pathlib import Path
 from openai import OpenAI
-from typing import Optional
+from typing import Callable, Optional
 from datetime import datetime
 import queue
 import threading
@@ -128,6 +128,8 @@ class Transcriber:
         self._last_update_time = 0
         self._current_transcription = ""
         self._transcription_ready = threading.Event()
+        self._speech_started = threading.Event()
+        self._on_speech_detected: Optional[Callable[[], None]] = None
         self._consecutive_empty_count = 0
         self._max_consecutive_empty = 10
 
@@ -141,6 +143,26 @@ class Transcriber:
         """Check if speech has been detected."""
         with self._lock:
             return self._speech_detected
+    
+    def wait_for_speech(self, timeout: float | None = None) -> bool:
+        """Blocks until speech has been detected or the timeout runs out.
+
+        Args:
+            timeout (float | None, optional): Maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            bool: True if speech has been detected, False if the timeout ran out first
+        """
+        return self._speech_started.wait(timeout)
+
+    def set_speech_detected_callback(self, callback: Optional[Callable[[], None]]) -> None:
+        """Sets a callback that is run from the listening thread the moment speech is detected.
+        Used to interrupt the NPC straight away instead of waiting for the next poll of :func:`has_player_spoken`.
+
+        Args:
+            callback (Optional[Callable[[], None]]): The callback to run. Must not block. None removes the current callback
+        """
+        self._on_speech_detected = callback
         
 
     @utils.time_it
@@ -356,8 +378,12 @@ If you would prefer to run speech-to-text locally, please ensure the `Speech-to-
                         if "start" in speech_dict and not self._speech_detected:
                             logging.log(self.loglevel, 'Speech detected')
                             self._speech_detected = True
+                            self._speech_started.set()
                             self._speech_start_time = time.time()
                             self._last_update_time = time.time()
+                            callback = self._on_speech_detected
+                            if callback:
+                                callback()
                         
                         if "end" in speech_dict and self._speech_detected:
                             logging.log(self.loglevel, 'Speech ended')
@@ -439,6 +465,7 @@ If you would prefer to run speech-to-text locally, please ensure the `Speech-to-
     def _reset_state(self) -> None:
         """Reset internal state."""
         self._speech_detected = False
+        self._speech_started.clear()
         self._audio_buffer = np.array([], dtype=np.float32)
         self.vad_iterator = self._create_vad_iterator()
         self._consecutive_empty_count = 0
@@ -477,6 +504,7 @@ If you would prefer to run speech-to-text locally, please ensure the `Speech-to-
 
             self._transcription_ready.clear()
             self._speech_detected = False
+            self._speech_started.clear()
             self._current_transcription = ''
 
             time.sleep(0.1)
@@ -489,6 +517,7 @@ If you would prefer to run speech-to-text locally, please ensure the `Speech-to-
             
         self._running = False
         self._speech_detected = False
+        self._speech_started.clear()
         
         # Stop and clean up audio stream
         if self._stream:
@@ -30,8 +30,8 @@ class Piper(TTSable):
     """Piper TTS handler
     """
     @utils.time_it
-    def __init__(self, config: ConfigLoader, game: Gameable) -> None:
-        super().__init__(config)
+    def __init__(self, config: ConfigLoader, game: Gameable, worker_id: int = 0) -> None:
+        super().__init__(config, worker_id)
         if self._language != 'en':
             logging.warning(f"Selected language is '{self._language}'', but Piper only supports English. Please change the selected text-to-speech model in `Text-to-Speech`->`TTS Service` in the Mantella UI")
         self.__game: Gameable = game
@@ -1,9 +1,12 @@
+from src.turn_timeline import TurnTimeline
+
 class SynthesizationOptions:
     """Options and additional information that can affect the synthesization of a voice line
     """
-    def __init__(self, aggro: bool, is_first_line_of_response: bool) -> None:
+    def __init__(self, aggro: bool, is_first_line_of_response: bool, timeline: TurnTimeline | None = None) -> None:
         self.__aggro = aggro
         self.__is_first_line_of_response = is_first_line_of_response
+        self.__timeline = timeline
     
     @property
     def aggro(self) -> bool:
@@ -15,4 +18,10 @@ class SynthesizationOptions:
     def is_first_line_of_response(self) -> bool:
         """Is this the first spoken voiceline of the given response?
         """
-        return self.__is_first_line_of_response
\ No newline at end of file
+        return self.__is_first_line_of_response
+    
+    @property
+    def timeline(self) -> TurnTimeline | None:
+        """The timeline of the turn this voiceline belongs to, if it is recorded
+        """
+        return self.__timeline
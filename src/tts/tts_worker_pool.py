@@ -0,0 +1,128 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+from threading import Lock
+from typing import Callable, TypeVar
+from src.tts.ttsable import TTSable
+
+T = TypeVar('T')
+
+class TTSWorker:
+    """A TTS instance together with the single thread that is allowed to use it
+    """
+    def __init__(self, index: int, tts: TTSable | None, tts_factory: Callable[[int], TTSable] | None) -> None:
+        self.__index: int = index
+        self.__tts: TTSable | None = tts
+        self.__tts_factory: Callable[[int], TTSable] | None = tts_factory
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"MantellaTTS{index}")
+        self.voice: str | None = None # the voice this worker currently has loaded or is about to load
+        self.pending: int = 0
+        self.last_assigned: int = 0
+
+    @property
+    def index(self) -> int:
+        return self.__index
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return self.__executor
+
+    def get_tts(self) -> TTSable:
+        """Returns the TTS instance of this worker. Additional workers only start their TTS on first use, on their own thread
+        """
+        if not self.__tts:
+            if not self.__tts_factory:
+                raise RuntimeError(f"TTS worker {self.__index} has no TTS")
+            logging.log(29, f"Starting TTS worker {self.__index}...")
+            self.__tts = self.__tts_factory(self.__index)
+        return self.__tts
+
+
+class TTSWorkerPool:
+    """Runs syntheses on one or more TTS workers, each with its own TTS instance and thread.
+
+    Each voice sticks to one worker as long as possible, so that a worker does not have to swap voice models between the lines of different speakers
+    and lines of different speakers can be synthesized at the same time. Lines of the same voice run one after another in the order they were submitted.
+    Worker 0 uses the TTS instance handed over on creation. Further workers are only created via the factory once more voices are in use than there are workers.
+    """
+    def __init__(self, tts: TTSable, tts_factory: Callable[[int], TTSable] | None = None, max_workers: int = 1) -> None:
+        """
+        Args:
+            tts (TTSable): The TTS instance of the first worker
+            tts_factory (Callable[[int], TTSable] | None, optional): Creates the TTS instance for the worker with the given index. Defaults to None (only one worker).
+            max_workers (int, optional): The maximum number of workers. Defaults to 1.
+        """
+        self.__tts_factory: Callable[[int], TTSable] | None = tts_factory
+        self.__max_workers: int = max(1, max_workers) if tts_factory else 1
+        self.__workers: list[TTSWorker] = [TTSWorker(0, tts, None)]
+        self.__assignment_count: int = 0
+        self.__next_worker_index: int = 1
+        self.__lock = Lock()
+
+    @property
+    def worker_count(self) -> int:
+        return len(self.__workers)
+
+    @property
+    def max_workers(self) -> int:
+        return self.__max_workers
+
+    def submit(self, voice: str, synthesize: Callable[[TTSable], T]) -> Future[T]:
+        """Queues a synthesis on the worker assigned to the voice
+
+        Args:
+            voice (str): The voice the synthesis needs. Decides which worker runs it
+            synthesize (Callable[[TTSable], T]): Called with the TTS instance of the worker on the thread of the worker
+
+        Returns:
+            Future[T]: The result of `synthesize`. Cancelling it before the worker has started it drops the synthesis
+        """
+        with self.__lock:
+            worker = self.__assign(voice)
+            worker.pending += 1
+        future = worker.executor.submit(self.__run, worker, voice, synthesize)
+        future.add_done_callback(lambda _: self.__finish(worker))
+        return future
+
+    def __run(self, worker: TTSWorker, voice: str, synthesize: Callable[[TTSable], T]) -> T:
+        tts: TTSable | None = None
+        with self.__lock:
+            is_retired = worker not in self.__workers
+        if not is_retired:
+            try:
+                tts = worker.get_tts()
+            except Exception as e:
+                logging.error(f"Could not start TTS worker {worker.index}, continuing with fewer workers: {e}")
+                with self.__lock:
+                    self.__workers.remove(worker)
+                    self.__max_workers = len(self.__workers)
+        if not tts: # hand the synthesis over to one of the remaining workers
+            return self.submit(voice, synthesize).result()
+        return synthesize(tts)
+
+    def __finish(self, worker: TTSWorker):
+        with self.__lock:
+            worker.pending -= 1
+
+    def __assign(self, voice: str) -> TTSWorker:
+        """Picks the worker for a voice: the one that already has it, else an unused one, else a new one if allowed, else the least busy one
+        """
+        self.__assignment_count += 1
+        chosen: TTSWorker | None = None
+        for worker in self.__workers:
+            if worker.voice == voice:
+                chosen = worker
+                break
+        if not chosen:
+            for worker in self.__workers:
+                if worker.voice is None:
+                    chosen = worker
+                    break
+        if not chosen and len(self.__workers) < self.__max_workers and self.__tts_factory:
+            chosen = TTSWorker(self.__next_worker_index, None, self.__tts_factory)
+            self.__next_worker_index += 1
+            self.__workers.append(chosen)
+        if not chosen:
+            chosen = min(self.__workers, key=lambda worker: (worker.pending, worker.last_assigned))
+        chosen.voice = voice
+        chosen.last_assigned = self.__assignment_count
+        return chosen
@@ -13,13 +13,15 @@ from src.tts.synthesization_options import SynthesizationOptions
 import requests
 import shutil
 from src.config.definitions.game_definitions import GameEnum
+from src.turn_timeline import TurnTimeline
 
 class TTSable(ABC):
     """Base class for different TTS services
     """
     @utils.time_it
-    def __init__(self, config: ConfigLoader) -> None:
+    def __init__(self, config: ConfigLoader, worker_id: int = 0) -> None:
         super().__init__()
+        self._worker_id: int = worker_id
         self._config: ConfigLoader = config
         self._loglevel = 29
         self._lipgen_path = config.lipgen_path
@@ -30,6 +32,8 @@ class TTSable(ABC):
         self._save_folder = config.save_folder
         self._output_path = os.getenv('TMP')
         self._voiceline_folder = f"{self._output_path}/voicelines"
+        if worker_id > 0: # additional workers write their temporary files to their own folder, so they do not overwrite each other's voicelines
+            self._voiceline_folder = f"{self._voiceline_folder}/worker_{worker_id}"
         os.makedirs(f"{self._voiceline_folder}/save", exist_ok=True)
         self._language = config.language
         self._last_voice = '' # last active voice model
@@ -68,8 +72,12 @@ class TTSable(ABC):
         
         if (self._lip_generation_enabled == 'enabled') or (self._lip_generation_enabled == 'lazy' and not synth_options.is_first_line_of_response):
             self._generate_voiceline_files(final_voiceline_file, voiceline)
+            if synth_options.timeline:
+                synth_options.timeline.record(TurnTimeline.LIP_DONE, text=voiceline.strip())
         elif (self._lip_generation_enabled in ['lazy', 'disabled'] and self._game.base_game == GameEnum.FALLOUT4):
             self._generate_voiceline_files(final_voiceline_file, voiceline, skip_lip_generation=True)
+            if synth_options.timeline:
+                synth_options.timeline.record(TurnTimeline.LIP_DONE, text=voiceline.strip(), skipped_lip=True)
         
         #rename to unique name        
         if (os.path.exists(final_voiceline_file)):
@@ -0,0 +1,194 @@
+from collections import deque
+import json
+import logging
+import os
+from threading import Lock
+import time
+from typing import Any
+
+class TurnTimeline:
+    """The timestamps of everything that happened during one turn of a conversation,
+    from the input of the player to the last voiceline of the response being handed to the game
+    """
+    PLAYER_INPUT_RECEIVED = "player_input_received"
+    GENERATION_STARTED = "generation_started"
+    TRANSCRIPTION_FINAL = "transcription_final"
+    REQUEST_SENT = "request_sent"
+    FIRST_TOKEN = "first_token"
+    SENTENCE_CUT = "sentence_cut"
+    TTS_START = "tts_start"
+    TTS_END = "tts_end"
+    LIP_DONE = "lip_done"
+    PREPARED_FOR_GAME = "prepared_for_game"
+    HANDED_TO_GAME = "handed_to_game"
+    RESPONSE_FINISHED = "response_finished"
+
+    # phase name -> (event that starts it, event that ends it), always measured to the first occurrence of each event
+    BREAKDOWN_PHASES: dict[str, tuple[str | None, str]] = {
+        "transcription": (PLAYER_INPUT_RECEIVED, TRANSCRIPTION_FINAL),
+        "llm_first_token": (REQUEST_SENT, FIRST_TOKEN),
+        "first_sentence_cut": (REQUEST_SENT, SENTENCE_CUT),
+        "first_tts": (TTS_START, TTS_END),
+        "first_audio": (REQUEST_SENT, TTS_END),
+        "first_line_in_game": (None, HANDED_TO_GAME),
+        "response": (REQUEST_SENT, RESPONSE_FINISHED),
+    }
+
+    def __init__(self, turn_id: int, trigger: str) -> None:
+        """
+        Args:
+            turn_id (int): Increasing id of the turn
+            trigger (str): The event that started the turn, recorded as its first event
+        """
+        self.__turn_id: int = turn_id
+        self.__trigger: str = trigger
+        self.__started_at: float = time.time()
+        self.__events: list[tuple[str, float, dict[str, Any]]] = [(trigger, self.__started_at, {})]
+
+    @property
+    def turn_id(self) -> int:
+        return self.__turn_id
+
+    @property
+    def trigger(self) -> str:
+        return self.__trigger
+
+    @property
+    def started_at(self) -> float:
+        return self.__started_at
+
+    @property
+    def events(self) -> list[tuple[str, float, dict[str, Any]]]:
+        return list(self.__events)
+
+    def record(self, event: str, **details: Any):
+        """Records that an event happened just now. Safe to call from any thread
+
+        Args:
+            event (str): Name of the event, usually one of the constants of this class
+            details: Additional information stored with the event, e.g. the text of a sentence. Needs to be JSON serializable
+        """
+        self.__events.append((event, time.time(), details))
+
+    def has_event(self, event: str) -> bool:
+        return any(name == event for name, _, _ in self.__events)
+
+    def get_first(self, event: str) -> float | None:
+        """Returns the timestamp of the first occurrence of an event or None if it has not happened (yet)
+        """
+        for name, timestamp, _ in self.__events:
+            if name == event:
+                return timestamp
+        return None
+
+    def get_breakdown(self) -> dict[str, float]:
+        """Returns the durations of the phases of this turn in milliseconds. Phases that have not (completely) happened are left out
+        """
+        breakdown: dict[str, float] = {}
+        for phase, (start_event, end_event) in self.BREAKDOWN_PHASES.items():
+            start = self.get_first(start_event) if start_event else self.__started_at
+            end = self.get_first(end_event)
+            if start is not None and end is not None:
+                breakdown[phase] = round((end - start) * 1000, 1)
+        return breakdown
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "turn_id": self.__turn_id,
+            "trigger": self.__trigger,
+            "started_at": self.__started_at,
+            "events": [{"event": name, "offset_ms": round((timestamp - self.__started_at) * 1000, 1), **details} for name, timestamp, details in self.__events],
+            "breakdown": self.get_breakdown(),
+        }
+
+
+class TurnTimelineRecorder:
+    """Keeps the timelines of the most recent turns in memory in a ring buffer.
+
+    Events can be recorded from anywhere (STT, LLM, TTS, game hand-off) via the shared recorder and end up in the timeline of the current turn.
+    """
+    DEFAULT_CAPACITY: int = 100
+    __shared: 'TurnTimelineRecorder | None' = None
+    __shared_lock: Lock = Lock()
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        """
+        Args:
+            capacity (int, optional): How many turns are kept before the oldest ones are dropped. Defaults to DEFAULT_CAPACITY.
+        """
+        self.__turns: deque[TurnTimeline] = deque(maxlen=capacity)
+        self.__next_turn_id: int = 1
+        self.__lock = Lock()
+
+    @staticmethod
+    def get_shared() -> 'TurnTimelineRecorder':
+        """Returns the recorder shared by the whole server, creating it on first use
+        """
+        with TurnTimelineRecorder.__shared_lock:
+            if not TurnTimelineRecorder.__shared:
+                TurnTimelineRecorder.__shared = TurnTimelineRecorder()
+            return TurnTimelineRecorder.__shared
+
+    @property
+    def current_turn(self) -> TurnTimeline | None:
+        with self.__lock:
+            return self.__turns[-1] if self.__turns else None
+
+    def start_turn(self, trigger: str) -> TurnTimeline:
+        """Starts the timeline of a new turn. Events recorded from now on are added to it
+
+        Args:
+            trigger (str): The event that started the turn
+
+        Returns:
+            TurnTimeline: The new timeline
+        """
+        with self.__lock:
+            timeline = TurnTimeline(self.__next_turn_id, trigger)
+            self.__next_turn_id += 1
+            self.__turns.append(timeline)
+            return timeline
+
+    def record(self, event: str, **details: Any):
+        """Records an event in the timeline of the current turn. Does nothing if no turn has been started yet
+        """
+        timeline = self.current_turn
+        if timeline:
+            timeline.record(event, **details)
+
+    def get_turns(self, limit: int | None = None) -> list[TurnTimeline]:
+        """Returns the kept timelines, oldest first
+
+        Args:
+            limit (int | None, optional): Only return this many of the most recent turns. Defaults to None (all kept turns).
+        """
+        with self.__lock:
+            turns = list(self.__turns)
+        if limit is not None:
+            turns = turns[-limit:] if limit > 0 else []
+        return turns
+
+    def get_turn(self, turn_id: int) -> TurnTimeline | None:
+        for timeline in self.get_turns():
+            if timeline.turn_id == turn_id:
+                return timeline
+        return None
+
+    def dump_jsonl(self, file_path: str) -> int:
+        """Appends the kept timelines to a JSONL file, one turn per line
+
+        Args:
+            file_path (str): The file to append to. Missing folders are created
+
+        Returns:
+            int: The number of turns written
+        """
+        turns = self.get_turns()
+        folder = os.path.dirname(file_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(file_path, 'a', encoding='utf-8') as file:
+            for timeline in turns:
+                file.write(json.dumps(timeline.to_dict()) + '\n')
+        logging.info(f"Saved {len(turns)} turn timelines to {file_path}")
+        return len(turns)
@@ -9,6 +9,7 @@ from src.characters_manager import Characters
 from src.config.config_loader import ConfigLoader
 from src.http.http_server import http_server
 from src.http.routes.mantella_route import mantella_route
+from src.http.routes.timeline_route import timeline_route
 from src.ui.start_ui import StartUI
 from src.http.routes.routeable import routeable
 from fastapi.testclient import TestClient
@@ -104,8 +105,9 @@ def real_routes(default_config: ConfigLoader, default_mantella_route: mantella_r
     """Create the actual routes that would be used in production"""
     default_config.auto_launch_ui=False
     ui = StartUI(default_config)
+    timeline = timeline_route(default_config)
 
-    return [default_mantella_route, ui]
+    return [default_mantella_route, ui, timeline]
 
 @pytest.fixture
 def production_like_client(server: http_server, real_routes: list[routeable]) -> TestClient:
@@ -0,0 +1,209 @@
+from threading import Event
+from src.character_manager import Character
+from src.config.config_loader import ConfigLoader
+from src.conversation.context_compactor import ContextCompactor
+from src.llm.message_thread import message_thread
+from src.llm.messages import AssistantMessage, Message, UserMessage
+from src.llm.sentence import Sentence
+from src.llm.sentence_content import SentenceContent, SentenceTypeEnum
+
+def build_thread(config: ConfigLoader, speaker: Character, message_count: int) -> message_thread:
+    thread = message_thread(config, "Old prompt")
+    for i in range(message_count // 2):
+        thread.add_message(UserMessage(config, f"Question {i}", "Dragonborn"))
+        assistant_message = AssistantMessage(config)
+        assistant_message.add_sentence(Sentence(SentenceContent(speaker, f"Answer {i}", SentenceTypeEnum.SPEECH), "", 0))
+        thread.add_message(assistant_message)
+    return thread
+
+def count_one_token(message: Message) -> int:
+    return 1
+
+
+def test_compaction_swaps_oldest_messages_for_summary(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    saved: list[list[str]] = []
+    summary_may_finish = Event()
+    def save_messages(oldest_messages: message_thread):
+        summary_may_finish.wait(5) # the summary is slow, the conversation carries on
+        saved.append([message.get_formatted_content() for message in oldest_messages.get_talk_only()])
+
+    compactor = ContextCompactor(default_config)
+    assert compactor.start(thread, count_one_token, 6, save_messages)
+    assert not compactor.start(thread, count_one_token, 6, save_messages) # only one compaction at a time
+    thread.add_message(UserMessage(default_config, "Question during the summary", "Dragonborn"))
+    assert compactor.is_running and not compactor.apply(thread, lambda: "New prompt")
+
+    summary_may_finish.set()
+    compactor.wait()
+    assert compactor.has_finished
+    assert compactor.apply(thread, lambda: "New prompt")
+
+    assert saved == [[f"Question {i}" if j == 0 else f"Answer {i}" for i in range(7) for j in range(2)]]
+    talk = [message.get_formatted_content() for message in thread.get_talk_only()]
+    assert talk == ["Question 7", "Answer 7", "Question 8", "Answer 8", "Question 9", "Answer 9", "Question during the summary"]
+    assert thread.get_openai_messages()[0] == {"role": "system", "content": "New prompt"}
+    assert not compactor.has_finished
+
+
+def test_latest_exchange_is_never_compacted(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 10)
+    compactor = ContextCompactor(default_config)
+    assert compactor.start(thread, count_one_token, 0, lambda oldest_messages: None)
+    compactor.wait()
+    compactor.apply(thread, lambda: "New prompt")
+    assert [message.get_formatted_content() for message in thread.get_talk_only()] == ["Question 4", "Answer 4"]
+
+
+def test_too_few_messages_are_not_compacted(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 6)
+    compactor = ContextCompactor(default_config)
+    assert not compactor.start(thread, count_one_token, 0, lambda oldest_messages: None)
+    assert not compactor.is_running
+
+
+def test_failed_summary_keeps_messages(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    def save_messages(oldest_messages: message_thread):
+        raise ConnectionError("LLM not reachable")
+
+    compactor = ContextCompactor(default_config)
+    assert compactor.start(thread, count_one_token, 6, save_messages)
+    compactor.wait()
+    assert not compactor.has_finished
+    assert not compactor.apply(thread, lambda: "New prompt")
+    assert len(thread.get_talk_only()) == 20
+
+
+def test_checkpoints_save_each_message_once(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 12)
+    saved: list[list[str]] = []
+    def save_messages(new_messages: message_thread):
+        saved.append([message.get_formatted_content() for message in new_messages.get_talk_only()])
+
+    compactor = ContextCompactor(default_config)
+    assert not compactor.start_checkpoint(thread, 20, save_messages) # not enough messages yet
+    assert compactor.start_checkpoint(thread, 10, save_messages)
+    compactor.wait()
+    assert saved == [[f"Question {i}" if j == 0 else f"Answer {i}" for i in range(5) for j in range(2)]]
+    assert len(thread.get_talk_only()) == 12 # checkpoints leave the messages in the thread
+    assert not compactor.has_finished
+
+    for i in range(6, 12):
+        thread.add_message(UserMessage(default_config, f"Question {i}", "Dragonborn"))
+    assert compactor.start_checkpoint(thread, 5, save_messages)
+    compactor.wait()
+    assert saved[1] == ["Question 5", "Answer 5", "Question 6", "Question 7", "Question 8", "Question 9"]
+
+    # only the messages after the last checkpoint are left for the summary at the end of the conversation
+    remaining = compactor.get_unsummarized_messages(thread)
+    assert [message.get_formatted_content() for message in remaining.get_talk_only()] == ["Question 10", "Question 11"]
+
+
+def test_compaction_does_not_summarize_checkpointed_messages_again(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    saved: list[int] = []
+    def save_messages(new_messages: message_thread):
+        saved.append(len(new_messages.get_talk_only()))
+
+    compactor = ContextCompactor(default_config)
+    assert compactor.start_checkpoint(thread, 10, save_messages)
+    compactor.wait()
+    assert compactor.start(thread, count_one_token, 10, save_messages)
+    assert compactor.has_finished # everything to compact has been saved by the checkpoint, nothing to wait for
+    assert compactor.apply(thread, lambda: "New prompt")
+    assert saved == [18]
+    assert len(thread.get_talk_only()) == 10
+
+    remaining = compactor.get_unsummarized_messages(thread)
+    assert [message.get_formatted_content() for message in remaining.get_talk_only()] == ["Question 9", "Answer 9"]
+
+
+def test_messages_saved_by_a_reload_are_not_saved_again(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 10)
+    compactor = ContextCompactor(default_config)
+    compactor.mark_summarized(compactor.get_unsummarized_messages(thread))
+    thread.add_message(UserMessage(default_config, "Question after the reload", "Dragonborn"))
+
+    remaining = compactor.get_unsummarized_messages(thread)
+    assert [message.get_formatted_content() for message in remaining.get_talk_only()] == ["Question after the reload"]
+
+
+def test_messages_being_saved_are_left_to_their_checkpoint(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 12)
+    may_finish = Event()
+    compactor = ContextCompactor(default_config)
+    assert compactor.start_checkpoint(thread, 10, lambda new_messages: may_finish.wait(5))
+
+    remaining = compactor.get_unsummarized_messages(thread) # what the end of the conversation hands to the save queue
+    assert [message.get_formatted_content() for message in remaining.get_talk_only()] == ["Question 5", "Answer 5"]
+    may_finish.set()
+    compactor.wait()
+    assert len(compactor.get_unsummarized_messages(thread).get_talk_only()) == 2
+
+
+def test_failed_checkpoint_messages_are_summarized_at_the_end(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 12)
+    def save_messages(new_messages: message_thread):
+        raise ConnectionError("LLM not reachable")
+
+    compactor = ContextCompactor(default_config)
+    assert compactor.start_checkpoint(thread, 10, save_messages)
+    compactor.wait()
+    assert not compactor.has_saved
+
+    remaining = compactor.get_unsummarized_messages(thread)
+    assert len(remaining.get_talk_only()) == 12
+    # the next checkpoint tries them again
+    saved: list[int] = []
+    assert compactor.start_checkpoint(thread, 10, lambda new_messages: saved.append(len(new_messages.get_talk_only())))
+    compactor.wait()
+    assert saved == [10] and compactor.has_saved
+
+
+def test_running_checkpoint_messages_can_be_included(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 12)
+    may_finish = Event()
+    def save_messages(new_messages: message_thread):
+        may_finish.wait(5)
+        raise ConnectionError("LLM not reachable")
+    compactor = ContextCompactor(default_config)
+    assert compactor.start_checkpoint(thread, 10, save_messages)
+
+    # a queued save keeps them in case the checkpoint does not finish, and only leaves them out once it has saved them
+    assert len(compactor.get_unsummarized_messages(thread, include_saving=True).get_talk_only()) == 12
+    may_finish.set()
+    compactor.wait()
+    assert len(compactor.get_unsummarized_messages(thread).get_talk_only()) == 12
+
+
+def test_swapped_out_messages_are_still_logged(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    compactor = ContextCompactor(default_config)
+    assert compactor.start(thread, count_one_token, 6, lambda oldest_messages: None)
+    compactor.wait()
+    assert compactor.apply(thread, lambda: "New prompt")
+    assert len(thread.get_talk_only()) == 6
+
+    logged = [message.get_formatted_content() for message in compactor.get_messages_to_log(thread)]
+    assert logged == [f"Question {i}" if j == 0 else f"Answer {i}" for i in range(10) for j in range(2)]
+    compactor.mark_logged()
+    assert len(compactor.get_messages_to_log(thread)) == 6
+
+
+def test_checkpoint_does_not_drop_pending_compaction(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    compactor = ContextCompactor(default_config)
+    assert compactor.start_checkpoint(thread, 10, lambda new_messages: None)
+    compactor.wait()
+    # everything to compact has been checkpointed, so the compaction is ready to be swapped out right away
+    assert compactor.start(thread, count_one_token, 10, lambda oldest_messages: None)
+    assert compactor.has_finished
+
+    for i in range(10, 16):
+        thread.add_message(UserMessage(default_config, f"Question {i}", "Dragonborn"))
+    assert not compactor.start_checkpoint(thread, 5, lambda new_messages: None) # the same poll of the conversation
+    compactor.wait()
+    assert compactor.has_finished
+    assert compactor.apply(thread, lambda: "New prompt")
+    assert len(thread.get_talk_only()) == 16
@@ -0,0 +1,56 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.config.config_loader import ConfigLoader
+from src.http.routes.timeline_route import timeline_route
+from src.turn_timeline import TurnTimeline, TurnTimelineRecorder
+
+@pytest.fixture
+def recorder() -> TurnTimelineRecorder:
+    recorder = TurnTimelineRecorder()
+    recorder.start_turn(TurnTimeline.PLAYER_INPUT_RECEIVED)
+    recorder.record(TurnTimeline.REQUEST_SENT)
+    recorder.record(TurnTimeline.FIRST_TOKEN)
+    recorder.start_turn(TurnTimeline.GENERATION_STARTED)
+    return recorder
+
+@pytest.fixture
+def route(default_config: ConfigLoader, recorder: TurnTimelineRecorder) -> timeline_route:
+    return timeline_route(default_config, recorder)
+
+@pytest.fixture
+def client(route: timeline_route) -> TestClient:
+    app = FastAPI()
+    route.add_route_to_server(app)
+    return TestClient(app)
+
+
+def test_get_timelines(client: TestClient):
+    response = client.get("/timeline")
+    assert response.status_code == 200
+    turns = response.json()["turns"]
+    assert [turn["trigger"] for turn in turns] == ["player_input_received", "generation_started"]
+    assert "llm_first_token" in turns[0]["breakdown"]
+
+    response = client.get("/timeline", params={"limit": 1})
+    assert [turn["turn_id"] for turn in response.json()["turns"]] == [2]
+
+
+def test_get_single_timeline(client: TestClient):
+    response = client.get("/timeline/1")
+    assert response.status_code == 200
+    assert [event["event"] for event in response.json()["events"]] == ["player_input_received", "request_sent", "first_token"]
+
+    assert client.get("/timeline/42").status_code == 404
+
+
+def test_dump_timelines(client: TestClient, route: timeline_route, tmp_path, monkeypatch):
+    file_path = str(tmp_path / "turn_timelines.jsonl")
+    monkeypatch.setattr(route, "get_dump_file_path", lambda: file_path)
+
+    response = client.post("/timeline/dump")
+
+    assert response.status_code == 200
+    assert response.json() == {"file": file_path, "turns": 2}
+    with open(file_path, encoding='utf-8') as file:
+        assert len(file.readlines()) == 2
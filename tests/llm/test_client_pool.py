@@ -0,0 +1,151 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import statistics
+from threading import Thread
+import time
+import pytest
+from src.config.config_loader import ConfigLoader
+from src.llm.client_pool import ClientPool
+from src.llm.llm_client import LLMClient
+from src.llm.messages import UserMessage
+from src.llm.request_scheduler import RequestScheduler
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class StandInServer(ThreadingHTTPServer):
+    """A local stand-in for an OpenAI-compatible server that streams a short reply and counts the connections opened to it"""
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.connection_count = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connection_count += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        events = ""
+        for word in ["Hello", " there", "."]:
+            chunk = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "local-model",
+                     "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            events += f"data: {json.dumps(chunk)}\n\n"
+        body = (events + "data: [DONE]\n\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server():
+    server = StandInServer()
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_client_is_reused_until_discarded():
+    pool = ClientPool()
+    first = pool.get_sync_client(("url", "key"), FakeClient)
+    assert pool.get_sync_client(("url", "key"), FakeClient) is first
+    assert pool.get_sync_client(("other url", "key"), FakeClient) is not first
+
+    assert pool.discard(first)
+    assert not pool.discard(first)
+    second = pool.get_sync_client(("url", "key"), FakeClient)
+    assert second is not first
+
+    second.close() # a closed client fails the health check
+    assert pool.get_sync_client(("url", "key"), FakeClient) is not second
+    assert pool.created_count == 4
+
+
+def test_async_client_per_loop_and_prepared_client_used_first():
+    pool = ClientPool()
+    prepared = pool.prepare_async_client(("url", "key"), FakeClient)
+    async def get_client():
+        return pool.get_async_client(("url", "key"), FakeClient)
+
+    loop = asyncio.new_event_loop()
+    try:
+        first = loop.run_until_complete(get_client())
+        second = loop.run_until_complete(get_client())
+        other = asyncio.run(get_client())
+    finally:
+        loop.close()
+    after_loop_closed = asyncio.run(get_client())
+
+    assert first is prepared
+    assert second is first
+    assert other is not first
+    assert after_loop_closed is not first
+
+
+def test_pooled_streaming_call_time_to_first_token_benchmark(default_config: ConfigLoader, stand_in_server: StandInServer, monkeypatch):
+    """Time to first token of a client per request, as it was done before the pool, against the pooled client, on a local stand-in server"""
+    monkeypatch.setattr(RequestScheduler, "BUCKET_CAPACITY", 1000) # back-to-back calls would otherwise be spaced out by the rate limit
+    default_config.llm_api = stand_in_server.url
+    default_config.llm = "local-model"
+    llm_client = LLMClient(default_config, "GPT_SECRET_KEY.txt", "IMAGE_SECRET_KEY.txt")
+    message = UserMessage(default_config, "Hello", "Dragonborn")
+    calls = 20
+
+    async def first_token_with_client_per_request() -> float:
+        start = time.perf_counter()
+        client = llm_client.generate_async_client()
+        try:
+            stream = await client.chat.completions.create(model="local-model", messages=[message.get_openai_message()], stream=True)
+            duration = None
+            async for chunk in stream:
+                if duration is None and chunk.choices[0].delta.content:
+                    duration = time.perf_counter() - start
+        finally:
+            await client.close()
+        return duration
+
+    async def first_token_with_pooled_client() -> float:
+        start = time.perf_counter()
+        duration = None
+        async for _ in llm_client.streaming_call(message, False):
+            if duration is None:
+                duration = time.perf_counter() - start
+        return duration
+
+    async def run() -> tuple[list[float], list[float], int]:
+        per_request = [await first_token_with_client_per_request() for _ in range(calls)]
+        connections_before = stand_in_server.connection_count
+        pooled = [await first_token_with_pooled_client() for _ in range(calls)]
+        return per_request, pooled, stand_in_server.connection_count - connections_before
+
+    per_request, pooled, pooled_connections = asyncio.run(run())
+
+    print(f"Time to first token: {statistics.median(per_request) * 1000:.2f}ms with a client per request, {statistics.median(pooled) * 1000:.2f}ms pooled")
+    assert pooled_connections == 1 # every pooled call reuses the keep-alive connection of the first
+    assert statistics.median(pooled) < statistics.median(per_request)
@@ -0,0 +1,77 @@
+import random
+import time
+from src.llm.output.delta_coalescer import delta_coalescer
+from src.llm.output.sentence_accumulator import sentence_accumulator
+
+CUT_INDICATORS = ['.', '?', '!', ':', '*', '(', ')']
+
+def collect_sentences(deltas: list[str], coalesce: bool) -> tuple[list[str], int]:
+    accumulator = sentence_accumulator(CUT_INDICATORS)
+    coalescer = delta_coalescer(CUT_INDICATORS, max_delay=60)
+    sentences = []
+    accumulate_calls = 0
+    for delta in deltas:
+        batch = coalescer.push(delta) if coalesce else delta
+        if batch:
+            accumulator.accumulate(batch)
+            accumulate_calls += 1
+        while accumulator.has_next_sentence():
+            sentences.append(accumulator.get_next_sentence())
+    return sentences, accumulate_calls
+
+
+def test_releases_batch_at_trigger_char():
+    coalescer = delta_coalescer(['.'], max_delay=60)
+
+    assert coalescer.push("Hello") is None
+    assert coalescer.push(" there") is None
+    assert coalescer.has_pending
+    assert coalescer.push(". How") == "Hello there. How"
+    assert not coalescer.has_pending
+    assert coalescer.push(" are you") is None
+    assert coalescer.flush() == " are you"
+
+
+def test_releases_batch_when_budget_runs_out():
+    coalescer = delta_coalescer(['.'], max_delay=0.05, max_chars=10)
+
+    assert coalescer.push("Hello") is None
+    assert coalescer.push(" there") == "Hello there" # too long
+    assert coalescer.push("Hi") is None
+    time.sleep(0.06)
+    assert coalescer.push("!") == "Hi!" # held back for too long
+
+
+def test_releases_delta_after_lookahead_char():
+    coalescer = delta_coalescer([',', '.'], max_delay=60, lookahead_chars=[','])
+
+    assert coalescer.push("Well met,") == "Well met,"
+    assert coalescer.push(" traveller") == " traveller" # the accumulator can only cut the clause once it has this
+    assert coalescer.push(" from") is None
+    assert coalescer.push(" afar.") == " from afar."
+
+def test_coalescing_cuts_the_same_sentences_with_fewer_calls():
+    rng = random.Random(42)
+    text = "".join(rng.choice(["Hello", " there", " friend", ".", "?", " it is", " cold", ":", " *waves*", " (quietly)", "!"]) for _ in range(2000))
+    deltas = list(text) # worst case: every character is a delta of its own
+
+    expected, calls_without = collect_sentences(deltas, coalesce=False)
+    actual, calls_with = collect_sentences(deltas, coalesce=True)
+
+    assert actual == expected
+    assert calls_with < calls_without / 3
+
+
+def test_coalescing_lowers_per_delta_overhead():
+    """Micro-benchmark: single character deltas of text with only few cut indicators"""
+    deltas = list(("It is rather cold in these parts today my friend, so stay close to the fire. " * 400))
+
+    def measure(coalesce: bool) -> float:
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            collect_sentences(deltas, coalesce)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    assert measure(True) < measure(False)
@@ -0,0 +1,87 @@
+from src.character_manager import Character
+from src.llm.output.early_clause_parser import early_clause_parser
+from src.llm.output.output_parser import sentence_generation_settings
+from src.llm.output.parser_chain import parser_chain
+from src.llm.output.sentence_accumulator import sentence_accumulator
+from src.llm.output.sentence_end_parser import sentence_end_parser
+from src.llm.output.sentence_length_parser import sentence_length_parser
+from src.llm.sentence_content import SentenceContent
+
+
+def test_cuts_first_clause_once_min_words_are_reached(example_skyrim_npc_character: Character):
+    parser = early_clause_parser(4)
+    settings = sentence_generation_settings(example_skyrim_npc_character)
+
+    assert parser.cut_sentence("Well, well,", settings) == (None, "Well, well,")
+    parsed, rest = parser.cut_sentence("Well, well, what do we have here, traveller", settings)
+
+    assert parsed.text == "Well, well, what do we have here,"
+    assert rest == " traveller"
+    assert not parser.is_active
+    assert parser.cut_sentence("And then, after all of this,", settings) == (None, "And then, after all of this,")
+
+
+def test_does_not_cut_inside_numbers(example_skyrim_npc_character: Character):
+    parser = early_clause_parser(1)
+    settings = sentence_generation_settings(example_skyrim_npc_character)
+
+    parsed, rest = parser.cut_sentence("That will be 1,000 gold, friend", settings)
+
+    assert parsed.text == "That will be 1,000 gold,"
+    assert rest == " friend"
+
+
+def test_complete_first_sentence_ends_early_cut(example_skyrim_npc_character: Character):
+    parser = early_clause_parser(1)
+    chain = parser_chain([sentence_end_parser(), parser, sentence_length_parser(1)])
+    settings = sentence_generation_settings(example_skyrim_npc_character)
+
+    parsed, pending, rest = chain.process("Greetings.", None, settings)
+    assert parsed.text == "Greetings."
+    assert not parser.is_active
+
+    parsed, pending, rest = chain.process(" Well met, traveller", pending, settings)
+    assert parsed is None
+    assert rest == " Well met, traveller"
+
+
+def streamed_sentences(deltas: list[str], chain: parser_chain, settings: sentence_generation_settings) -> list[str]:
+    """Runs streamed deltas through the accumulator and the parser chain the same way the output_manager does"""
+    accumulator = sentence_accumulator(chain.get_cut_indicators(), chain.get_lookahead_cut_indicators())
+    pending: SentenceContent | None = None
+    sentences = []
+    for delta in deltas:
+        accumulator.accumulate(delta)
+        while accumulator.has_next_sentence():
+            parsed, pending, rest = chain.process(accumulator.get_next_sentence(), pending, settings)
+            accumulator.refuse(rest)
+            if parsed:
+                sentences.append(parsed.text)
+    if pending:
+        sentences.append(pending.text)
+    return sentences
+
+
+def test_streamed_number_is_not_cut_at_delta_boundary(example_skyrim_npc_character: Character):
+    chain = parser_chain([sentence_end_parser(), early_clause_parser(1), sentence_length_parser(1)])
+    settings = sentence_generation_settings(example_skyrim_npc_character)
+
+    sentences = streamed_sentences(["That will be 1,", "000 gold", ",", " friend", "."], chain, settings)
+
+    assert sentences[0] == "That will be 1,000 gold,"
+    assert "".join(sentences).replace(" ", "") == "Thatwillbe1,000gold,friend."
+
+
+def test_streamed_clause_is_cut_once_whitespace_arrives(example_skyrim_npc_character: Character):
+    chain = parser_chain([sentence_end_parser(), early_clause_parser(2), sentence_length_parser(1)])
+    settings = sentence_generation_settings(example_skyrim_npc_character)
+    accumulator = sentence_accumulator(chain.get_cut_indicators(), chain.get_lookahead_cut_indicators())
+
+    accumulator.accumulate("Well met,")
+    assert not accumulator.has_next_sentence()
+
+    accumulator.accumulate(" traveller")
+    assert accumulator.has_next_sentence()
+    parsed, pending, rest = chain.process(accumulator.get_next_sentence(), None, settings)
+    assert (parsed or pending).text == "Well met,"
+    assert rest == " "
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import AsyncGenerator
+from src.llm.hedged_stream import EndpointLatencyStats, HedgedStream
+
+class FakeEndpoint:
+    """Streams a reply after a delay and remembers whether it was started and whether its stream was closed"""
+    def __init__(self, reply: list[str], first_token_delay: float) -> None:
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.started_at: float | None = None
+        self.closed = False
+
+    async def stream(self) -> AsyncGenerator[str | None, None]:
+        self.started_at = time.perf_counter()
+        try:
+            await asyncio.sleep(self.first_token_delay)
+            for content in self.reply:
+                yield content
+        finally:
+            self.closed = True
+
+def collect(hedged_stream: HedgedStream, endpoints: dict[str, FakeEndpoint]) -> str:
+    async def run() -> str:
+        return "".join([content async for content in hedged_stream.stream({name: endpoint.stream for name, endpoint in endpoints.items()})])
+    return asyncio.run(run())
+
+
+def test_fast_main_endpoint_is_not_hedged():
+    stats = EndpointLatencyStats()
+    endpoints = {"main": FakeEndpoint(["Hello", " there."], 0), "backup": FakeEndpoint(["Backup."], 0)}
+
+    assert collect(HedgedStream(stats, 0.5), endpoints) == "Hello there."
+    assert endpoints["backup"].started_at is None
+    assert stats.get_average_first_token("main") is not None
+
+
+def test_stalling_endpoint_is_hedged_and_cancelled():
+    stats = EndpointLatencyStats()
+    endpoints = {"main": FakeEndpoint(["Too late."], 5), "backup": FakeEndpoint(["Backup", " reply."], 0.01)}
+
+    start = time.perf_counter()
+    reply = collect(HedgedStream(stats, 0.1), endpoints)
+
+    assert reply == "Backup reply."
+    assert time.perf_counter() - start < 1
+    assert endpoints["backup"].started_at - endpoints["main"].started_at >= 0.09
+    assert endpoints["main"].closed
+    # the backup started its reply faster, so it is tried first from now on
+    assert stats.order(["main", "backup"]) == ["backup", "main"]
+
+
+def test_failed_endpoint_fails_over_without_waiting_for_the_hedge_delay():
+    stats = EndpointLatencyStats()
+    endpoints = {"main": FakeEndpoint([], 0), "backup": FakeEndpoint(["Backup."], 0)}
+
+    start = time.perf_counter()
+    assert collect(HedgedStream(stats, 5), endpoints) == "Backup."
+    assert time.perf_counter() - start < 1
+    assert stats.get_average_first_token("main") == EndpointLatencyStats.FAILURE_PENALTY_SECONDS
+
+
+def test_all_endpoints_failing_streams_nothing():
+    endpoints = {"main": FakeEndpoint([], 0), "backup": FakeEndpoint([], 0)}
+    assert collect(HedgedStream(EndpointLatencyStats(), 0.1), endpoints) == ""
+    assert endpoints["main"].closed and endpoints["backup"].closed
+
+
+def test_latency_stats_order():
+    stats = EndpointLatencyStats()
+    assert stats.order(["a", "b", "c"]) == ["a", "b", "c"]
+    stats.record_first_token("c", 0.5)
+    stats.record_first_token("b", 1.0)
+    assert stats.order(["a", "b", "c"]) == ["c", "b", "a"]
+    for _ in range(10):
+        stats.record_first_token("c", 2.0)
+    assert stats.order(["a", "b", "c"]) == ["b", "c", "a"]
+    stats.record_no_first_token("b", 0.1) # waiting less than the average does not make an endpoint look faster
+    assert stats.get_average_first_token("b") == 1.0
@@ -1,3 +1,4 @@
+import asyncio
 from src.llm.image_client import ImageClient
 import pytest
 import base64
@@ -70,7 +71,7 @@ def test_add_image_integrated_mode_structure(image_client_default_llm: ImageClie
     image_client_default_llm._ImageClient__image_manager = FakeImageManager(placeholder_b64)
 
     original_user_content = sample_openai_messages[-1]['content']
-    result_messages = image_client_default_llm.add_image_to_messages(list(sample_openai_messages), "vision hint text")
+    result_messages = asyncio.run(image_client_default_llm.add_image_to_messages(list(sample_openai_messages), "vision hint text"))
 
     # Assertions for integrated mode structure:
     assert isinstance(result_messages, list)
@@ -92,7 +93,7 @@ def test_add_image_integrated_mode_no_image(image_client_default_llm: ImageClien
     image_client_default_llm._ImageClient__image_manager = FakeImageManager(None)
     original_messages_copy = [msg.copy() for msg in sample_openai_messages] # Deep copy for comparison
 
-    result_messages = image_client_default_llm.add_image_to_messages(list(sample_openai_messages), "hint")
+    result_messages = asyncio.run(image_client_default_llm.add_image_to_messages(list(sample_openai_messages), "hint"))
 
     assert result_messages == original_messages_copy # Messages should be identical
 
@@ -108,7 +109,7 @@ def test_add_image_custom_mode_structure(image_client_custom_llm: ImageClient, s
     image_client_custom_llm._ImageClient__image_manager = FakeImageManager(placeholder_b64)
 
     original_user_content = sample_openai_messages[-1]['content']
-    result_messages = image_client_custom_llm.add_image_to_messages(list(sample_openai_messages), "The image is a logo.")
+    result_messages = asyncio.run(image_client_custom_llm.add_image_to_messages(list(sample_openai_messages), "The image is a logo."))
 
     # Assertions for integrated mode structure:
     assert isinstance(result_messages, list)
@@ -138,7 +139,7 @@ def test_add_image_custom_mode_no_image(image_client_custom_llm: ImageClient, sa
     image_client_custom_llm._ImageClient__image_manager = FakeImageManager(None)
     original_messages_copy = [msg.copy() for msg in sample_openai_messages] # Deep copy
 
-    result_messages = image_client_custom_llm.add_image_to_messages(list(sample_openai_messages), "hint")
+    result_messages = asyncio.run(image_client_custom_llm.add_image_to_messages(list(sample_openai_messages), "hint"))
 
     assert result_messages == original_messages_copy # Messages should be identical
 
@@ -151,7 +152,7 @@ def test_add_image_appends_new_message_if_needed(image_client_default_llm: Image
     original_length = len(sample_openai_messages_no_user)
     vision_hint = 'hint'
 
-    result_messages = image_client_default_llm.add_image_to_messages(list(sample_openai_messages_no_user), vision_hint)
+    result_messages = asyncio.run(image_client_default_llm.add_image_to_messages(list(sample_openai_messages_no_user), vision_hint))
 
     assert len(result_messages) == original_length + 1
     last_message = result_messages[-1]
@@ -171,7 +172,7 @@ def test_add_image_appends_new_message_if_needed_custom(image_client_custom_llm:
     image_client_custom_llm._ImageClient__image_manager = FakeImageManager(placeholder_b64)
     original_length = len(sample_openai_messages_no_user)
 
-    result_messages = image_client_custom_llm.add_image_to_messages(list(sample_openai_messages_no_user), "hint")
+    result_messages = asyncio.run(image_client_custom_llm.add_image_to_messages(list(sample_openai_messages_no_user), "hint"))
 
     assert len(result_messages) == original_length + 1
     last_message = result_messages[-1]
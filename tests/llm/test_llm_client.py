@@ -1,8 +1,10 @@
+import asyncio
 from src.llm.llm_client import LLMClient
 import pytest
 from src.config.config_loader import ConfigLoader
 import src.llm.client_base
 from src.llm.messages import SystemMessage
+from src.llm.generation_loop import GenerationLoop
 
 @pytest.fixture
 def example_system_message(default_config: ConfigLoader):
@@ -97,4 +99,20 @@ async def test_async_call(llm_client: LLMClient, example_system_message: SystemM
         if content is not None:
             response += content
     assert response is not None
-    assert isinstance(response, str)
\ No newline at end of file
+    assert isinstance(response, str)
+
+def test_async_client_reused_on_generation_loop(llm_client: LLMClient):
+    """Tests that calls made from the generation loop share one long-lived async client, starting with the one prepared on startup, while other loops get their own"""
+    generation_loop = GenerationLoop()
+    async def get_client():
+        return llm_client._get_async_client()
+    try:
+        first_client = generation_loop.submit(get_client()).result()
+        second_client = generation_loop.submit(get_client()).result()
+        other_client = asyncio.run(get_client())
+    finally:
+        generation_loop.stop()
+
+    assert first_client is llm_client._startup_async_client
+    assert first_client is second_client
+    assert other_client is not first_client
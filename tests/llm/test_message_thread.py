@@ -0,0 +1,310 @@
+from copy import deepcopy
+import time
+import tracemalloc
+import pytest
+from src.character_manager import Character
+from src.config.config_loader import ConfigLoader
+from src.llm.llm_client import LLMClient
+from src.llm.message_thread import message_thread
+from src.llm.messages import AssistantMessage, Message, SystemMessage, UserMessage
+from src.llm.sentence import Sentence
+from src.llm.sentence_content import SentenceContent, SentenceTypeEnum
+
+def build_thread(config: ConfigLoader, speaker: Character, message_count: int) -> message_thread:
+    thread = message_thread(config, "You are a guard in Whiterun. Keep your answers short.")
+    for i in range(message_count // 2):
+        thread.add_message(UserMessage(config, f"Have you heard any rumors lately? This is question number {i}.", "Dragonborn"))
+        assistant_message = AssistantMessage(config)
+        assistant_message.add_sentence(Sentence(SentenceContent(speaker, f"I used to be an adventurer like you, then I took arrow number {i} to the knee.", SentenceTypeEnum.SPEECH), "", 0))
+        thread.add_message(assistant_message)
+    return thread
+
+def count_uncached(llm_client: LLMClient, thread: message_thread) -> int:
+    """The way ClientBase counted the tokens of a thread before the counts were cached"""
+    num_tokens = 0
+    for message in thread.get_openai_messages():
+        num_tokens += 4
+        for value in message.values():
+            if isinstance(value, str):
+                num_tokens += llm_client._token_counter.count(value)
+    return num_tokens + 2
+
+
+def test_message_token_count_is_cached_until_message_changes(default_config: ConfigLoader):
+    counted: list[Message] = []
+    def count(message: Message) -> int:
+        counted.append(message)
+        return len(message.get_formatted_content())
+
+    message = UserMessage(default_config, "Hello there", "Dragonborn")
+    assert message.get_token_count("test", count) == len("Hello there")
+    assert message.get_token_count("test", count) == len("Hello there")
+    assert len(counted) == 1
+
+    message.add_event(["Dragonborn drew a sword."])
+    assert message.get_token_count("test", count) == len(message.get_formatted_content())
+    message.text = "Put that away"
+    assert message.get_token_count("test", count) == len(message.get_formatted_content())
+    message.get_token_count("other encoding", count)
+    assert len(counted) == 4
+
+
+def test_thread_token_count_matches_uncached_count(default_config: ConfigLoader, llm_client: LLMClient, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    assert llm_client.get_count_tokens(thread) == count_uncached(llm_client, thread)
+
+    thread.get_last_assistant_message().add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "Anything else?", SentenceTypeEnum.SPEECH), "", 0))
+    assert llm_client.get_count_tokens(thread) == count_uncached(llm_client, thread)
+
+    thread.modify_messages("You are a guard in Solitude.", True)
+    assert llm_client.get_count_tokens(thread) == count_uncached(llm_client, thread)
+
+    thread.delete_all_message_type(AssistantMessage)
+    assert llm_client.get_count_tokens(thread) == count_uncached(llm_client, thread)
+
+
+def test_thread_token_count_only_recounts_its_own_changed_messages(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    other_thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    counted: list[Message] = []
+    def count(message: Message) -> int:
+        counted.append(message)
+        return len(message.get_formatted_content())
+    thread.get_token_count("test", count)
+    other_thread.get_token_count("test", count)
+
+    counted.clear()
+    other_thread.get_last_assistant_message().add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "Anything else?", SentenceTypeEnum.SPEECH), "", 0))
+    thread.get_token_count("test", count)
+    assert counted == []
+
+    other_thread.get_token_count("test", count)
+    assert counted == [other_thread.get_last_assistant_message()]
+
+def test_thread_token_count_follows_changes_of_the_thread(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    def count(message: Message) -> int:
+        return len(message.get_formatted_content())
+    def count_all(thread: message_thread) -> int:
+        return sum(count(message) for message in thread.get_talk_only()) + count(SystemMessage(thread.get_openai_messages()[0]["content"], default_config))
+
+    thread = build_thread(default_config, example_skyrim_npc_character, 20)
+    thread.get_token_count("test", count)
+
+    thread.add_message(UserMessage(default_config, "Farewell.", "Dragonborn"))
+    assert thread.get_token_count("test", count) == count_all(thread)
+    thread.append_text_to_last_assistant_message(" Now go.")
+    assert thread.get_token_count("test", count) == count_all(thread)
+    thread.remove_summarized_messages("A shorter prompt", thread.get_talk_only()[:6])
+    assert thread.get_token_count("test", count) == count_all(thread)
+    thread.reload_message_thread("New prompt", count, 200)
+    assert thread.get_token_count("test", count) == count_all(thread)
+    thread.get_talk_only()[0].original.text = "Hello."
+    assert thread.get_token_count("test", count) == count_all(thread)
+
+
+def test_is_too_long_on_long_thread_benchmark(default_config: ConfigLoader, llm_client: LLMClient, example_skyrim_npc_character: Character):
+    """Cost of the is_too_long check done on every continue call from the game, on a 200-message thread"""
+    thread = build_thread(default_config, example_skyrim_npc_character, 200)
+    calls = 200
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        count_uncached(llm_client, thread)
+    uncached = (time.perf_counter() - start) / calls
+
+    llm_client.is_too_long(thread, 0.45) # the first check counts every message once
+    start = time.perf_counter()
+    for _ in range(calls):
+        llm_client.is_too_long(thread, 0.45)
+    cached = (time.perf_counter() - start) / calls
+
+    assert cached * 10 < uncached
+    assert cached < 0.001 # the running total doesn't depend on the length of the thread
+
+
+def reload_reference(thread: message_thread, llm_client: LLMClient, percent_modifier: float) -> list[str]:
+    """The texts of the messages reload_message_thread kept before it used cached counts and a binary search"""
+    messages_to_keep: list[Message] = []
+    for talk_message in reversed(thread.get_talk_only()):
+        messages_to_keep.append(talk_message)
+        if llm_client.is_too_long(messages_to_keep, percent_modifier):
+            messages_to_keep = messages_to_keep[:-1]
+            break
+    messages_to_keep.reverse()
+    return [message.get_formatted_content() for message in messages_to_keep]
+
+
+def test_reload_message_thread_keeps_same_messages_as_reference(default_config: ConfigLoader, llm_client: LLMClient, example_skyrim_npc_character: Character):
+    for percent_modifier in [0, 0.0001, 0.01, 0.05, 1]:
+        thread = build_thread(default_config, example_skyrim_npc_character, 60)
+        system_flagged = UserMessage(default_config, "Dragonborn waved.", "Dragonborn", True)
+        thread.add_message(system_flagged)
+        expected = reload_reference(thread, llm_client, percent_modifier)
+
+        thread.reload_message_thread("New prompt", llm_client.count_message_tokens, llm_client.get_max_message_tokens(percent_modifier))
+
+        assert thread.get_openai_messages()[0]["content"] == "New prompt"
+        assert [message.get_formatted_content() for message in thread.get_talk_only()] == expected
+        assert len(thread) == len(expected) + 1
+        assert llm_client.get_count_tokens(thread) == count_uncached(llm_client, thread)
+
+
+def test_reload_message_thread_long_session_benchmark(default_config: ConfigLoader, llm_client: LLMClient, example_skyrim_npc_character: Character):
+    """A reload on a long session with a 128k context model should take milliseconds"""
+    llm_client._token_limit = 128000
+    thread = build_thread(default_config, example_skyrim_npc_character, 4000)
+    llm_client.is_too_long(thread, 0.45) # counts have already been cached by the checks during the conversation
+
+    start = time.perf_counter()
+    thread.reload_message_thread("New prompt", llm_client.count_message_tokens, llm_client.get_max_message_tokens(0.45))
+    duration = time.perf_counter() - start
+
+    print(f"reload_message_thread on 4000 messages: {duration * 1000:.3f}ms")
+    assert not llm_client.is_too_long(thread.get_talk_only(), 0.45)
+    assert 1 < len(thread) < 4001
+    assert duration < 0.05
+
+
+def build_multi_npc_thread(config: ConfigLoader, speakers: list[Character], message_count: int) -> message_thread:
+    """A multi-NPC session in which every NPC says a sentence in each assistant message"""
+    thread = message_thread(config, "You are a group of NPCs in Whiterun.")
+    for i in range(message_count // 2):
+        thread.add_message(UserMessage(config, f"What do you all think about question number {i}?", "Dragonborn"))
+        assistant_message = AssistantMessage(config)
+        for speaker in speakers:
+            assistant_message.add_sentence(Sentence(SentenceContent(speaker, f"{speaker.name} has an opinion on question {i}.", SentenceTypeEnum.SPEECH), "", 0))
+        thread.add_message(assistant_message)
+    thread.modify_messages("You are a group of NPCs in Whiterun.", True)
+    return thread
+
+def get_npcs(speaker: Character, count: int) -> list[Character]:
+    npcs = []
+    for i in range(count):
+        npc = deepcopy(speaker)
+        npc.name = f"{speaker.name} {i}"
+        npc.bio = f"{speaker.bio} " * 50 # full length bios
+        npcs.append(npc)
+    return npcs
+
+
+def test_talk_only_snapshots_are_read_only(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 4)
+    user_snapshot, assistant_snapshot = thread.get_talk_only()[:2]
+
+    assert user_snapshot.is_frozen and assistant_snapshot.is_frozen
+    with pytest.raises(TypeError):
+        user_snapshot.text = "Something else"
+    with pytest.raises(TypeError):
+        user_snapshot.add_event(["Dragonborn drew a sword."])
+    with pytest.raises(TypeError):
+        assistant_snapshot.add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "Anything else?", SentenceTypeEnum.SPEECH), "", 0))
+    with pytest.raises(TypeError):
+        assistant_snapshot.is_multi_npc_message = True
+    assert "\n" in message_thread.transform_to_text([assistant_snapshot]) # multi-NPC formatting works without touching the snapshot
+    assert not assistant_snapshot.is_multi_npc_message
+
+
+def test_talk_only_snapshots_are_shared_until_message_changes(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    thread = build_thread(default_config, example_skyrim_npc_character, 4)
+    first = thread.get_talk_only()
+    second = thread.get_talk_only()
+    assert all(a is b for a, b in zip(first, second))
+
+    last_assistant_message = thread.get_last_assistant_message()
+    before = last_assistant_message.snapshot()
+    last_assistant_message.add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "Anything else?", SentenceTypeEnum.SPEECH), "", 0))
+    third = thread.get_talk_only()
+
+    assert all(a is b for a, b in zip(first[:-1], third[:-1]))
+    assert third[-1] is not before
+    assert "Anything else?" not in before.get_formatted_content() # earlier snapshots don't see later changes
+    assert third[-1].get_formatted_content() == last_assistant_message.get_formatted_content()
+
+
+def test_talk_only_multi_npc_session_memory_benchmark(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    """Memory held by the result of get_talk_only on a 1000-message session with 5 NPCs, compared to deep copies of the messages"""
+    thread = build_multi_npc_thread(default_config, get_npcs(example_skyrim_npc_character, 5), 1000)
+
+    tracemalloc.start()
+    snapshots = thread.get_talk_only()
+    snapshot_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    copies = [deepcopy(message) for message in snapshots] # what get_talk_only used to return
+    deepcopy_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"get_talk_only on 1000 messages with 5 NPCs: {deepcopy_bytes / 1024:.0f}KB as deep copies, {snapshot_bytes / 1024:.0f}KB as snapshots")
+    assert len(snapshots) == len(copies) == 1000
+    assert snapshot_bytes * 5 < deepcopy_bytes
+
+
+def test_talk_only_multi_npc_session_latency_benchmark(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    """Time of get_talk_only on a 1000-message session with 5 NPCs, compared to deep copies of the messages"""
+    thread = build_multi_npc_thread(default_config, get_npcs(example_skyrim_npc_character, 5), 1000)
+    calls = 10
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        [deepcopy(message) for message in thread.get_talk_only()]
+    deepcopy_duration = (time.perf_counter() - start) / calls
+
+    thread.get_talk_only() # the first call takes the snapshots
+    start = time.perf_counter()
+    for _ in range(calls):
+        thread.get_talk_only()
+    snapshot_duration = (time.perf_counter() - start) / calls
+
+    print(f"get_talk_only on 1000 messages with 5 NPCs: {deepcopy_duration * 1000:.3f}ms with deep copies, {snapshot_duration * 1000:.3f}ms with snapshots")
+    assert snapshot_duration * 10 < deepcopy_duration
+
+
+def test_formatted_content_is_rendered_again_only_after_changes(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    message = UserMessage(default_config, "Hello there", "Dragonborn")
+    assert message.get_formatted_content() is message.get_formatted_content()
+
+    message.add_event(["Dragonborn drew a sword."])
+    assert "Dragonborn drew a sword." in message.get_formatted_content()
+    message.set_ingame_time("8", "in the morning")
+    assert "The time is 8 in the morning." in message.get_openai_message()["content"]
+    message.is_multi_npc_message = True
+    assert "Dragonborn: Hello there" in message.get_dict_formatted_string()
+
+    assistant_message = AssistantMessage(default_config)
+    assistant_message.add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "Hi.", SentenceTypeEnum.SPEECH), "", 0))
+    assert assistant_message.get_formatted_content() == "Hi."
+    assistant_message.add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "Anything else?", SentenceTypeEnum.SPEECH), "", 0))
+    assert assistant_message.get_formatted_content() == "Hi. Anything else?"
+
+
+def test_openai_message_can_be_changed_by_caller(default_config: ConfigLoader):
+    message = UserMessage(default_config, "Hello there", "Dragonborn")
+    openai_message = message.get_openai_message()
+    openai_message["content"] = [{"type": "text", "text": "Replaced by an image"}]
+    assert message.get_openai_message() == {"role": "user", "content": "Hello there"}
+
+
+def test_get_openai_messages_long_session_benchmark(default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    """Serializing a 1000-message session with 5 NPCs after one new sentence, compared to rendering every message"""
+    npcs = get_npcs(example_skyrim_npc_character, 5)
+    calls = 3
+
+    uncached = 0
+    for _ in range(calls):
+        fresh_thread = build_multi_npc_thread(default_config, npcs, 1000) # nothing has been rendered yet
+        start = time.perf_counter()
+        fresh_thread.get_openai_messages()
+        uncached += (time.perf_counter() - start) / calls
+
+    thread = build_multi_npc_thread(default_config, npcs, 1000)
+    thread.get_openai_messages()
+    start = time.perf_counter()
+    for _ in range(calls):
+        thread.get_last_assistant_message().add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "One more thing.", SentenceTypeEnum.SPEECH), "", 0))
+        thread.get_openai_messages()
+    cached = (time.perf_counter() - start) / calls
+
+    print(f"get_openai_messages on 1000 messages with 5 NPCs: {uncached * 1000:.3f}ms rendering every message, {cached * 1000:.3f}ms with cached renders")
+    assert thread.get_openai_messages()[-1]["content"].endswith("One more thing.")
+    assert cached * 5 < uncached
@@ -0,0 +1,104 @@
+import json
+import time
+from pathlib import Path
+from src.config.config_loader import ConfigLoader
+from src.llm.client_base import ClientBase
+from src.llm.llm_client import LLMClient
+from src.llm.model_catalogue import ModelCatalogue, ModelCatalogueEntry
+
+def openrouter_models() -> list[ModelCatalogueEntry]:
+    return [
+        ModelCatalogueEntry.from_model_extra("vendor/text-model", {"context_length": 12_345, "pricing": {"prompt": "0.000001", "completion": "0.000002"}, "architecture": {"modality": "text->text"}}),
+        ModelCatalogueEntry.from_model_extra("vendor/vision-model", {"context_length": 64_000, "pricing": {"prompt": "0", "completion": "0"}, "architecture": {"modality": "text+image->text"}}),
+        ModelCatalogueEntry.from_model_extra("vendor/no-details", None),
+    ]
+
+def write_cache(cache_file: Path, fetched_at: float):
+    cache_file.write_text(json.dumps({"OpenRouter": {"fetched_at": fetched_at, "models": [model.to_dict() for model in openrouter_models()]}}))
+
+def wait_for(condition, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_fresh_cache_is_read_without_fetching(tmp_path: Path, monkeypatch):
+    fetches = []
+    monkeypatch.setattr(ModelCatalogue, "fetch_models", lambda service, secret_key: fetches.append(service) or openrouter_models())
+    cache_file = tmp_path / "catalogue.json"
+    write_cache(cache_file, time.time())
+
+    catalogue = ModelCatalogue(str(cache_file))
+    models = catalogue.get_models("OpenRouter")
+
+    assert [model.id for model in models] == ["vendor/text-model", "vendor/vision-model", "vendor/no-details"]
+    assert models[1].is_vision_available and not models[0].is_vision_available
+    assert catalogue.get_context_length("vendor/text-model") == 12_345
+    assert catalogue.get_context_length("vision-model") == 64_000
+    assert catalogue.get_context_length("vendor/no-details") is None
+    assert fetches == []
+
+
+def test_stale_cache_is_returned_and_refreshed_in_the_background(tmp_path: Path, monkeypatch):
+    def fetch_models(service: str, secret_key: str | None) -> list[ModelCatalogueEntry]:
+        time.sleep(0.1)
+        return [ModelCatalogueEntry("vendor/new-model", 8192)]
+    monkeypatch.setattr(ModelCatalogue, "fetch_models", fetch_models)
+    cache_file = tmp_path / "catalogue.json"
+    write_cache(cache_file, time.time() - ModelCatalogue.TTL_SECONDS - 1)
+
+    catalogue = ModelCatalogue(str(cache_file))
+    start = time.perf_counter()
+    models = catalogue.get_models("OpenRouter")
+
+    assert time.perf_counter() - start < 0.1 # did not wait for the fetch
+    assert len(models) == 3
+    wait_for(lambda: not catalogue.is_stale("OpenRouter"))
+    assert [model.id for model in catalogue.get_models("OpenRouter")] == ["vendor/new-model"]
+    # the refreshed catalogue has been written to the cache file for the next start
+    assert ModelCatalogue(str(cache_file)).get_context_length("new-model") == 8192
+
+
+def test_no_cache_and_no_live_list():
+    catalogue = ModelCatalogue("missing/catalogue.json")
+    assert catalogue.get_models("Custom service") is None
+    assert catalogue.get_context_length("vendor/text-model") is None
+
+
+def test_model_list_and_token_limit_come_from_the_cache(default_config: ConfigLoader, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(ModelCatalogue, "fetch_models", lambda service, secret_key: openrouter_models())
+    cache_file = tmp_path / "catalogue.json"
+    write_cache(cache_file, time.time())
+    catalogue = ModelCatalogue(str(cache_file))
+    monkeypatch.setattr(ModelCatalogue, "get_shared", lambda: catalogue)
+    monkeypatch.setattr(ClientBase, "_get_api_key", lambda *args: "sk-123")
+
+    model_list = ClientBase.get_model_list("OpenRouter", "key.txt")
+    assert [model_id for _, model_id in model_list.available_models] == ["vendor/text-model", "vendor/vision-model", "vendor/no-details"]
+    assert model_list.available_models[0][0] == "vendor/text-model | Context: 12,345 | Cost per 1M tokens: Prompt: $1. Completion: $2"
+    vision_list = ClientBase.get_model_list("OpenRouter", "key.txt", is_vision=True)
+    assert [model_id for _, model_id in vision_list.available_models] == ["vendor/vision-model"]
+
+    default_config.llm_api = "http://127.0.0.1:5001/v1"
+    default_config.llm = "vendor/text-model"
+    assert LLMClient(default_config, "GPT_SECRET_KEY.txt", "IMAGE_SECRET_KEY.txt").token_limit == 12_345
+    default_config.llm = "gpt-4-turbo" # not in the catalogue, falls back to the known token limits
+    assert LLMClient(default_config, "GPT_SECRET_KEY.txt", "IMAGE_SECRET_KEY.txt").token_limit == 128_000
+
+
+def test_models_are_fetched_once_without_cache(tmp_path: Path, monkeypatch):
+    fetches = []
+    def fetch_models(service: str, secret_key: str | None) -> list[ModelCatalogueEntry]:
+        fetches.append(service)
+        time.sleep(0.1)
+        return openrouter_models()
+    monkeypatch.setattr(ModelCatalogue, "fetch_models", fetch_models)
+    catalogue = ModelCatalogue(str(tmp_path / "catalogue.json"))
+
+    assert catalogue.get_models("OpenRouter") is None # nothing cached, left to the caller
+    catalogue.refresh_in_background("OpenRouter") # e.g. started by a client that has just been created
+    wait_for(lambda: len(fetches) > 0)
+    models = catalogue.refresh("OpenRouter") # joins the running refresh
+
+    assert len(models) == 3
+    assert fetches == ["OpenRouter"]
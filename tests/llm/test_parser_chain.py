@@ -0,0 +1,154 @@
+import random
+import time
+import pytest
+from src.character_manager import Character
+from src.characters_manager import Characters
+from src.conversation.action import Action
+from src.llm.output.actions_parser import actions_parser
+from src.llm.output.change_character_parser import change_character_parser
+from src.llm.output.max_count_sentences_parser import max_count_sentences_parser
+from src.llm.output.narration_parser import narration_parser
+from src.llm.output.output_parser import output_parser, sentence_generation_settings
+from src.llm.output.parser_chain import parser_chain
+from src.llm.output.sentence_accumulator import sentence_accumulator
+from src.llm.output.sentence_end_parser import sentence_end_parser
+from src.llm.output.sentence_length_parser import sentence_length_parser
+from src.llm.sentence_content import SentenceContent
+
+ACTIONS = [
+    Action("wave", "Wave", "Wave", "Waves at the player", "", False, True, False, False, "Waving action completed"),
+    Action("menu", "Menu", "Menu", "Opens the menu", "", True, True, False, False, "Menu action completed"),
+]
+
+def build_parsers(characters: Characters, min_words: int, max_sentences: int) -> list[output_parser]:
+    return [
+        change_character_parser(characters),
+        narration_parser(),
+        sentence_end_parser(),
+        actions_parser(ACTIONS),
+        sentence_length_parser(min_words),
+        max_count_sentences_parser(max_sentences, False),
+    ]
+
+def describe(content: SentenceContent | None) -> tuple | None:
+    if not content:
+        return None
+    return (content.speaker.name, content.text, content.sentence_type, tuple(content.actions))
+
+def run_reference_loop(parsers: list[output_parser], chunks: list[str], settings: sentence_generation_settings) -> list[tuple]:
+    """The loop ChatManager used before the parser_chain existed"""
+    cut_indicators: set[str] = set()
+    for parser in parsers:
+        cut_indicators.update(parser.get_cut_indicators())
+    accumulator = sentence_accumulator(list(cut_indicators))
+    results = []
+    pending_sentence: SentenceContent | None = None
+    for chunk in chunks:
+        accumulator.accumulate(chunk)
+        while accumulator.has_next_sentence():
+            current_sentence = accumulator.get_next_sentence()
+            parsed_sentence: SentenceContent | None = None
+            for parser in parsers:
+                if not parsed_sentence:
+                    parsed_sentence, current_sentence = parser.cut_sentence(current_sentence, settings)
+                if parsed_sentence:
+                    parsed_sentence, pending_sentence = parser.modify_sentence_content(parsed_sentence, pending_sentence, settings)
+                if settings.stop_generation:
+                    break
+            results.append((describe(parsed_sentence), describe(pending_sentence), current_sentence))
+            if settings.stop_generation:
+                return results
+            accumulator.refuse(current_sentence)
+    return results
+
+def run_parser_chain(parsers: list[output_parser], chunks: list[str], settings: sentence_generation_settings) -> list[tuple]:
+    chain = parser_chain(parsers)
+    accumulator = sentence_accumulator(chain.get_cut_indicators())
+    results = []
+    pending_sentence: SentenceContent | None = None
+    for chunk in chunks:
+        accumulator.accumulate(chunk)
+        while accumulator.has_next_sentence():
+            parsed_sentence, pending_sentence, current_sentence = chain.process(accumulator.get_next_sentence(), pending_sentence, settings)
+            results.append((describe(parsed_sentence), describe(pending_sentence), current_sentence))
+            if settings.stop_generation:
+                return results
+            accumulator.refuse(current_sentence)
+    return results
+
+def random_chunks(rng: random.Random, npc_name: str, count: int) -> list[str]:
+    fragments = ["Hello", " there", " friend", ",", ".", "?", "!", "...", " ", "*", "\"", "(", ")", "[", "]",
+                 f"{npc_name}:", " Wave:", "Wave", ":", " it is", " cold today", "\n"]
+    stopping_fragments = ["Menu:", "player:"] # both stop the generation, so they should only turn up rarely
+    return rng.choices(fragments + stopping_fragments, weights=[1.0] * len(fragments) + [0.02] * len(stopping_fragments), k=count)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_parser_chain_matches_reference_loop(seed: int, example_characters_pc_to_npc: Characters, example_skyrim_npc_character: Character):
+    rng = random.Random(seed)
+    chunks = random_chunks(rng, example_skyrim_npc_character.name, 200)
+    min_words = rng.choice([1, 3])
+    max_sentences = rng.choice([4, 1000])
+
+    reference_settings = sentence_generation_settings(example_skyrim_npc_character)
+    expected = run_reference_loop(build_parsers(example_characters_pc_to_npc, min_words, max_sentences), chunks, reference_settings)
+    chain_settings = sentence_generation_settings(example_skyrim_npc_character)
+    actual = run_parser_chain(build_parsers(example_characters_pc_to_npc, min_words, max_sentences), chunks, chain_settings)
+
+    assert actual == expected
+    assert chain_settings.stop_generation == reference_settings.stop_generation
+    assert chain_settings.current_speaker == reference_settings.current_speaker
+    assert chain_settings.sentence_type == reference_settings.sentence_type
+
+
+def test_custom_parser_without_triggers_always_runs(example_characters_pc_to_npc: Characters, example_skyrim_npc_character: Character):
+    class shouting_parser(output_parser):
+        def cut_sentence(self, output: str, current_settings: sentence_generation_settings) -> tuple[SentenceContent | None, str]:
+            return None, output
+        def modify_sentence_content(self, cut_content: SentenceContent, last_content: SentenceContent | None, settings: sentence_generation_settings) -> tuple[SentenceContent | None, SentenceContent | None]:
+            cut_content.text = cut_content.text.upper()
+            return cut_content, last_content
+
+    chain = parser_chain([sentence_end_parser(), shouting_parser()])
+    parsed, pending, rest = chain.process("Hello there. And", None, sentence_generation_settings(example_skyrim_npc_character))
+
+    assert parsed.text == "HELLO THERE."
+    assert pending is None
+    assert rest == " And"
+
+
+def test_parser_chain_throughput(example_characters_pc_to_npc: Characters, example_skyrim_npc_character: Character):
+    """Throughput benchmark of the parser step alone: the compiled chain must not add any overhead compared to the plain loop over all parsers"""
+    sentences = [" Well, it is rather cold in these parts today, friend.", " *He rubs his hands.*", " Stay warm!", " Wave: Farewell."] * 5000
+
+    def run_loop(parsers: list[output_parser], settings: sentence_generation_settings):
+        pending_sentence = None
+        for sentence in sentences:
+            parsed_sentence = None
+            for parser in parsers:
+                if not parsed_sentence:
+                    parsed_sentence, sentence = parser.cut_sentence(sentence, settings)
+                if parsed_sentence:
+                    parsed_sentence, pending_sentence = parser.modify_sentence_content(parsed_sentence, pending_sentence, settings)
+                if settings.stop_generation:
+                    break
+
+    def run_chain(parsers: list[output_parser], settings: sentence_generation_settings):
+        chain = parser_chain(parsers)
+        pending_sentence = None
+        for sentence in sentences:
+            _, pending_sentence, _ = chain.process(sentence, pending_sentence, settings)
+
+    def measure(run) -> float:
+        best = float("inf")
+        for _ in range(5):
+            settings = sentence_generation_settings(example_skyrim_npc_character)
+            parsers = build_parsers(example_characters_pc_to_npc, 3, 100000)
+            start = time.perf_counter()
+            run(parsers, settings)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    reference = measure(run_loop)
+    compiled = measure(run_chain)
+    assert compiled < reference * 1.25
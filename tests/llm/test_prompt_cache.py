@@ -0,0 +1,103 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+from src.config.config_loader import ConfigLoader
+from src.conversation.context import Context
+from src.llm.llm_client import LLMClient
+from src.llm.message_thread import message_thread
+from src.llm.messages import AssistantMessage, SituationMessage, UserMessage
+from src.llm.prompt_cache_stats import PromptCacheStats
+
+class UsageReportingHandler(BaseHTTPRequestHandler):
+    """Streams a short reply that ends with a usage chunk reporting cached tokens, if it was asked for"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.requests.append(request)
+        chunks = [{"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "local-model",
+                   "choices": [{"index": 0, "delta": {"content": "Hello there."}, "finish_reason": None}]}]
+        if request.get("stream_options", {}).get("include_usage"):
+            chunks.append({"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "local-model", "choices": [],
+                           "usage": {"prompt_tokens": 1000, "completion_tokens": 3, "total_tokens": 1003, "prompt_tokens_details": {"cached_tokens": 768}}})
+        body = ("".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_parse_usage():
+    assert PromptCacheStats.parse_usage({"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 64}}) == (100, 64)
+    assert PromptCacheStats.parse_usage({"prompt_tokens": 100, "prompt_cache_hit_tokens": 32, "prompt_cache_miss_tokens": 68}) == (100, 32)
+    assert PromptCacheStats.parse_usage({"prompt_tokens": 100, "completion_tokens": 5}) is None # no cache information
+    assert PromptCacheStats.parse_usage(None) is None
+
+    stats = PromptCacheStats()
+    assert not stats.record_usage({"prompt_tokens": 100})
+    assert stats.hit_rate == 0
+    assert stats.record_usage({"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 0}})
+    assert stats.record_usage({"prompt_tokens": 300, "prompt_tokens_details": {"cached_tokens": 300}})
+    assert stats.reply_count == 2
+    assert stats.hit_rate == 0.75
+
+
+def test_split_volatile_prompt():
+    prompt = """You are {name}. {bio}
+    You are having a conversation with {player_name} who is {trust} in {location}.
+    The following is a conversation in {location} between {names}. Here are their backgrounds: {bios}
+    The time is {time} {time_group}.
+    {weather}
+    {conversation_summary}"""
+    stable, volatile = Context.split_volatile_prompt(prompt)
+
+    assert volatile == "You are having a conversation with {player_name} who is {trust} in {location}.\nThe time is {time} {time_group}.\n{weather}"
+    assert "{bios}" in stable and "{conversation_summary}" in stable # lines with bios stay in the prompt even if they also use a volatile variable
+    assert "{time}" not in stable and "{weather}" not in stable
+
+
+def test_situation_message_stays_after_latest_message(default_config: ConfigLoader):
+    thread = message_thread(default_config, "Stable prompt")
+    thread.add_message(UserMessage(default_config, "Hello", "Dragonborn"))
+    thread.replace_or_add_message(SituationMessage("The time is 8 in the morning.", default_config), SituationMessage)
+    assistant_message = AssistantMessage(default_config)
+    assistant_message.text = "Hi."
+    thread.add_message(assistant_message)
+    thread.add_message(UserMessage(default_config, "How are you?", "Dragonborn"))
+    thread.replace_or_add_message(SituationMessage("The time is 9 in the morning.", default_config), SituationMessage)
+
+    openai_messages = thread.get_openai_messages()
+    assert openai_messages[0] == {"role": "system", "content": "Stable prompt"}
+    assert openai_messages[-1] == {"role": "system", "content": "The time is 9 in the morning."}
+    assert [message["role"] for message in openai_messages] == ["system", "user", "assistant", "user", "system"]
+    assert len(thread.get_talk_only()) == 3
+
+
+def test_streaming_call_records_cached_tokens(default_config: ConfigLoader):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UsageReportingHandler)
+    server.daemon_threads = True
+    server.requests = []
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        default_config.llm_api = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        default_config.llm = "local-model"
+        default_config.cache_friendly_prompt = False # the hit rate is reported with any prompt
+        llm_client = LLMClient(default_config, "GPT_SECRET_KEY.txt", "IMAGE_SECRET_KEY.txt")
+
+        async def collect() -> str:
+            return "".join([content async for content in llm_client.streaming_call(UserMessage(default_config, "Hello", "Dragonborn"), False)])
+        reply = asyncio.run(collect())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert reply == "Hello there."
+    assert server.requests[0]["stream_options"] == {"include_usage": True}
+    assert llm_client.prompt_cache_stats.reply_count == 1
+    assert llm_client.prompt_cache_stats.hit_rate == 0.768
@@ -0,0 +1,168 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+import time
+from src.config.config_loader import ConfigLoader
+from src.llm.llm_client import LLMClient
+from src.llm.messages import UserMessage
+from src.llm.request_lanes import RequestLaneEnum, RequestLanes
+
+STREAM_DELAY_SECONDS = 0.5
+
+class SlowStreamHandler(BaseHTTPRequestHandler):
+    """Streams replies after STREAM_DELAY_SECONDS, answers non-streaming requests right away"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if request.get("stream"):
+            time.sleep(STREAM_DELAY_SECONDS)
+            chunk = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "local-model",
+                     "choices": [{"index": 0, "delta": {"content": "Greetings."}, "finish_reason": None}]}
+            body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode("utf-8")
+            content_type = "text/event-stream"
+        else:
+            body = json.dumps({"id": "1", "object": "chat.completion", "created": 0, "model": "local-model",
+                               "choices": [{"index": 0, "message": {"role": "assistant", "content": "A summary."}, "finish_reason": "stop"}]}).encode("utf-8")
+            content_type = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_lanes_limit_each_lane_separately():
+    lanes = RequestLanes()
+    async def run() -> list[str]:
+        order: list[str] = []
+        async def request(name: str, lane: RequestLaneEnum, seconds: float):
+            async with lanes.enter_async("endpoint", lane):
+                order.append(f"{name} started")
+                await asyncio.sleep(seconds)
+                order.append(f"{name} done")
+        await asyncio.gather(request("greeting", RequestLaneEnum.INTERACTIVE, 0.2),
+                             request("reply", RequestLaneEnum.INTERACTIVE, 0),
+                             request("summary", RequestLaneEnum.BACKGROUND, 0.05))
+        return order
+
+    order = asyncio.run(run())
+    # the second interactive request waits for the first, the background one does not
+    assert order.index("summary done") < order.index("greeting done") < order.index("reply started")
+    assert lanes.get_running_count("endpoint", RequestLaneEnum.INTERACTIVE) == 0
+
+
+def test_waiters_enter_in_arrival_order():
+    lanes = RequestLanes()
+    async def run() -> list[int]:
+        order: list[int] = []
+        async def request(index: int):
+            async with lanes.enter_async("endpoint", RequestLaneEnum.INTERACTIVE):
+                order.append(index)
+                await asyncio.sleep(0.001)
+        tasks = []
+        for index in range(20):
+            tasks.append(asyncio.ensure_future(request(index)))
+            await asyncio.sleep(0) # every request queues up before the next one arrives
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == list(range(20))
+
+
+def test_free_place_goes_to_waiter_before_newcomer():
+    lanes = RequestLanes()
+    async def run() -> list[str]:
+        order: list[str] = []
+        async def leave_and_come_back():
+            async with lanes.enter_async("endpoint", RequestLaneEnum.INTERACTIVE):
+                order.append("first")
+                await asyncio.sleep(0.05)
+            async with lanes.enter_async("endpoint", RequestLaneEnum.INTERACTIVE): # the lane is free for a moment, but "waiting" came first
+                order.append("again")
+        async def waiting():
+            async with lanes.enter_async("endpoint", RequestLaneEnum.INTERACTIVE):
+                order.append("waiting")
+        first = asyncio.ensure_future(leave_and_come_back())
+        await asyncio.sleep(0.01)
+        await asyncio.gather(first, waiting())
+        return order
+
+    assert asyncio.run(run()) == ["first", "waiting", "again"]
+
+def test_cancelled_waiter_passes_its_place_on():
+    lanes = RequestLanes()
+    async def run() -> list[str]:
+        order: list[str] = []
+        async def request(name: str):
+            async with lanes.enter_async("endpoint", RequestLaneEnum.INTERACTIVE):
+                order.append(name)
+                await asyncio.sleep(0.05)
+        first = asyncio.ensure_future(request("first"))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(request("cancelled"))
+        await asyncio.sleep(0)
+        last = asyncio.ensure_future(request("last"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.gather(first, last)
+        return order
+
+    assert asyncio.run(run()) == ["first", "last"]
+    assert lanes.get_running_count("endpoint", RequestLaneEnum.INTERACTIVE) == 0
+
+def test_sync_and_async_callers_share_a_lane():
+    lanes = RequestLanes()
+    order: list[str] = []
+    def sync_request():
+        with lanes.enter("endpoint", RequestLaneEnum.INTERACTIVE):
+            order.append("sync started")
+            time.sleep(0.1)
+            order.append("sync done")
+
+    thread = Thread(target=sync_request)
+    thread.start()
+    while not order:
+        time.sleep(0.005)
+    async def async_request():
+        async with lanes.enter_async("endpoint", RequestLaneEnum.INTERACTIVE):
+            order.append("async started")
+    asyncio.run(async_request())
+    thread.join()
+
+    assert order == ["sync started", "sync done", "async started"]
+
+
+def test_summary_runs_while_greeting_streams(default_config: ConfigLoader):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowStreamHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        default_config.llm_api = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        default_config.llm = "local-model"
+        llm_client = LLMClient(default_config, "GPT_SECRET_KEY.txt", "IMAGE_SECRET_KEY.txt")
+        message = UserMessage(default_config, "Hello", "Dragonborn")
+
+        async def run() -> tuple[float, float, str | None]:
+            start = time.perf_counter()
+            async def stream_greeting() -> float:
+                async for _ in llm_client.streaming_call(message, False):
+                    pass
+                return time.perf_counter() - start
+            greeting = asyncio.ensure_future(stream_greeting())
+            await asyncio.sleep(0.05) # the greeting holds the interactive lane
+            summary = await llm_client.arequest_call(message)
+            summary_duration = time.perf_counter() - start
+            return await greeting, summary_duration, summary
+        greeting_duration, summary_duration, summary = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert summary == "A summary."
+    assert summary_duration < STREAM_DELAY_SECONDS <= greeting_duration
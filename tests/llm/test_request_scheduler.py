@@ -0,0 +1,110 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+import time
+import httpx
+from openai import BadRequestError, RateLimitError
+import pytest
+from src.config.config_loader import ConfigLoader
+from src.llm.llm_client import LLMClient
+from src.llm.messages import UserMessage
+from src.llm.request_scheduler import CircuitOpenError, RequestScheduler
+
+def rate_limit_error(retry_after: str | None = None) -> RateLimitError:
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://127.0.0.1/v1/chat/completions"))
+    return RateLimitError("Rate limited", response=response, body=None)
+
+def bad_request_error() -> BadRequestError:
+    response = httpx.Response(400, request=httpx.Request("POST", "http://127.0.0.1/v1/chat/completions"))
+    return BadRequestError("Bad request", response=response, body=None)
+
+
+class RateLimitedHandler(BaseHTTPRequestHandler):
+    """Answers the first request with a 429 and a Retry-After header, every further one with a reply"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.request_times.append(time.perf_counter())
+        if len(self.server.request_times) == 1:
+            body = json.dumps({"error": {"message": "Rate limited", "type": "rate_limit"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Retry-After", "0.3")
+        else:
+            body = json.dumps({"id": "1", "object": "chat.completion", "created": 0, "model": "local-model",
+                               "choices": [{"index": 0, "message": {"role": "assistant", "content": "Hello there."}, "finish_reason": "stop"}]}).encode("utf-8")
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_token_bucket_spaces_out_bursts():
+    scheduler = RequestScheduler()
+    waits = [scheduler.reserve("endpoint") for _ in range(int(RequestScheduler.BUCKET_CAPACITY) + 2)]
+    assert all(wait == 0 for wait in waits[:int(RequestScheduler.BUCKET_CAPACITY)])
+    assert 0 < waits[-2] < waits[-1]
+    assert scheduler.reserve("other endpoint") == 0
+
+
+def test_rate_limit_honours_retry_after_and_slows_down():
+    scheduler = RequestScheduler()
+    retry_delay = scheduler.record_failure("endpoint", rate_limit_error("3"))
+    assert retry_delay >= 3
+    assert scheduler.reserve("endpoint") >= 2.9
+
+    assert RequestScheduler.get_retry_after(rate_limit_error("not a number")) is None
+    assert RequestScheduler.get_retry_after(bad_request_error()) is None
+
+
+def test_backoff_grows_with_jitter():
+    for attempt in range(1, 6):
+        delay = RequestScheduler.get_backoff_delay(attempt, 1, 8)
+        full_delay = min(8, 2 ** (attempt - 1))
+        assert full_delay / 2 <= delay <= full_delay
+
+
+def test_circuit_opens_after_repeated_failures_and_recovers(monkeypatch):
+    scheduler = RequestScheduler()
+    assert scheduler.record_failure("endpoint", bad_request_error()) is None # not retryable, does not count towards the circuit
+    for _ in range(RequestScheduler.FAILURE_THRESHOLD - 1):
+        assert scheduler.record_failure("endpoint", rate_limit_error()) is not None
+    assert scheduler.record_failure("endpoint", rate_limit_error()) is None
+    assert not scheduler.is_available("endpoint")
+    with pytest.raises(CircuitOpenError):
+        scheduler.reserve("endpoint")
+
+    monkeypatch.setattr(RequestScheduler, "OPEN_SECONDS", 0)
+    assert scheduler.is_available("endpoint")
+    scheduler.reserve("endpoint") # the single trial request
+    with pytest.raises(CircuitOpenError):
+        monkeypatch.setattr(RequestScheduler, "OPEN_SECONDS", 30)
+        scheduler.reserve("endpoint")
+    scheduler.record_success("endpoint")
+    scheduler.reserve("endpoint")
+
+
+def test_request_call_retries_after_rate_limit(default_config: ConfigLoader):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RateLimitedHandler)
+    server.daemon_threads = True
+    server.request_times = []
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        default_config.llm_api = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        default_config.llm = "local-model"
+        llm_client = LLMClient(default_config, "GPT_SECRET_KEY.txt", "IMAGE_SECRET_KEY.txt")
+
+        reply = llm_client.request_call(UserMessage(default_config, "Hello", "Dragonborn"))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert reply == "Hello there."
+    assert len(server.request_times) == 2
+    assert server.request_times[1] - server.request_times[0] >= 0.3
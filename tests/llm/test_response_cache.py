@@ -0,0 +1,89 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+from threading import Thread
+from src.config.config_loader import ConfigLoader
+from src.llm.llm_client import LLMClient
+from src.llm.message_thread import message_thread
+from src.llm.messages import UserMessage
+from src.llm.response_cache import ResponseCache
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """Answers every request with a numbered reply, so that replies from the cache can be told apart"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.request_count += 1
+        body = json.dumps({"id": "1", "object": "chat.completion", "created": 0, "model": "local-model",
+                           "choices": [{"index": 0, "message": {"role": "assistant", "content": f"Summary {self.server.request_count}."}, "finish_reason": "stop"}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_key_depends_on_model_params_and_messages():
+    messages = [{"role": "user", "content": "Summarize this."}]
+    key = ResponseCache.get_key("model", {"temperature": 0}, messages)
+    assert key == ResponseCache.get_key("model", {"temperature": 0}, [{"content": "Summarize this.", "role": "user"}])
+    assert key != ResponseCache.get_key("other model", {"temperature": 0}, messages)
+    assert key != ResponseCache.get_key("model", {"temperature": 1}, messages)
+    assert key != ResponseCache.get_key("model", {"temperature": 0}, [{"role": "user", "content": "Summarize that."}])
+
+
+def test_least_recently_used_replies_are_evicted(tmp_path: Path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), 30)
+    cache.put("a", "0123456789")
+    cache.put("b", "0123456789")
+    cache.put("c", "0123456789")
+    assert cache.get("a") == "0123456789" # a is now used more recently than b
+
+    cache.put("d", "0123456789")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None and cache.get("d") is not None
+    assert cache.size == 30
+    cache.put("too large", "x" * 31) # would evict everything, is not stored
+    assert cache.get("too large") is None and cache.size == 30
+
+    cache.close()
+    assert ResponseCache(str(tmp_path / "cache.db"), 30).get("a") == "0123456789" # survives a restart
+
+
+def test_identical_requests_are_answered_from_the_cache(default_config: ConfigLoader, tmp_path: Path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+    server.daemon_threads = True
+    server.request_count = 0
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        default_config.llm_api = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        default_config.llm = "local-model"
+        default_config.llm_response_cache = True
+        default_config.llm_response_cache_size = 1
+        default_config.save_folder = str(tmp_path)
+        llm_client = LLMClient(default_config, "GPT_SECRET_KEY.txt", "IMAGE_SECRET_KEY.txt")
+
+        def summary_request(text: str) -> message_thread:
+            thread = message_thread(default_config, "Summarize the conversation.")
+            thread.add_message(UserMessage(default_config, text))
+            return thread
+
+        first = llm_client.request_call(summary_request("Hello there. General Kenobi."))
+        reloaded = llm_client.request_call(summary_request("Hello there. General Kenobi."))
+        reloaded_async = asyncio.run(llm_client.arequest_call(summary_request("Hello there. General Kenobi.")))
+        other = llm_client.request_call(summary_request("Something else."))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert first == reloaded == reloaded_async == "Summary 1."
+    assert other == "Summary 2."
+    assert server.request_count == 2
+    assert (tmp_path / LLMClient.RESPONSE_CACHE_FILE).exists()
@@ -0,0 +1,74 @@
+import random
+import re
+import time
+import pytest
+from src.llm.output.clean_sentence_parser import clean_sentence_parser
+from src.llm.output.sentence_accumulator import sentence_accumulator
+
+CUT_INDICATORS = ['.', '?', '!', ';', ':', '*', '(', ')', '"']
+
+def regex_reference_sentences(chunks: list[str], cut_indicators: list[str]) -> tuple[list[str], str]:
+    """The previous, regex based accumulation: match `^.*?[indicators]+` from the start of the whole buffer after every chunk"""
+    cleaner = clean_sentence_parser()
+    sentence_end_reg = re.compile("^.*?[{}]+".format("\\" + "\\".join(cut_indicators)))
+    buffer = ""
+    sentences = []
+    for chunk in chunks:
+        buffer += cleaner.clean_sentence(chunk)
+        while match := sentence_end_reg.match(buffer):
+            sentences.append(match.group())
+            buffer = buffer.removeprefix(match.group())
+    return sentences, buffer
+
+def accumulated_sentences(chunks: list[str], cut_indicators: list[str]) -> list[str]:
+    accumulator = sentence_accumulator(cut_indicators)
+    sentences = []
+    for chunk in chunks:
+        accumulator.accumulate(chunk)
+        while accumulator.has_next_sentence():
+            sentences.append(accumulator.get_next_sentence())
+    return sentences
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_regex_reference(seed: int):
+    rng = random.Random(seed)
+    alphabet = "abc def " + "".join(CUT_INDICATORS) + "\n"
+    chunks = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6))) for _ in range(300)]
+
+    expected, _ = regex_reference_sentences(chunks, CUT_INDICATORS)
+    assert accumulated_sentences(chunks, CUT_INDICATORS) == expected
+
+
+def test_run_of_indicators_split_over_chunks():
+    chunks = ["Wait", "..", ". What", "?!", " Yes"]
+    assert accumulated_sentences(chunks, ['.', '?', '!']) == ["Wait..", ".", " What?!"]
+    assert accumulated_sentences(chunks, ['.', '?', '!']) == regex_reference_sentences(chunks, ['.', '?', '!'])[0]
+
+
+def test_refused_text_is_prepended_to_next_sentence():
+    accumulator = sentence_accumulator(['.'])
+    accumulator.accumulate("Hi. There.")
+    assert accumulator.has_next_sentence()
+    accumulator.refuse(accumulator.get_next_sentence())
+    assert accumulator.has_next_sentence()
+    assert accumulator.get_next_sentence() == "Hi. There."
+
+
+def test_long_output_without_indicators_scales_linearly():
+    """Scanning must not restart from the beginning of the buffer with every token"""
+    def accumulate_words(count: int) -> float:
+        accumulator = sentence_accumulator(CUT_INDICATORS)
+        start = time.perf_counter()
+        for _ in range(count):
+            accumulator.accumulate("word ")
+            accumulator.has_next_sentence()
+        accumulator.accumulate(".")
+        assert accumulator.has_next_sentence()
+        assert len(accumulator.get_next_sentence()) == count * 5 + 1
+        return time.perf_counter() - start
+
+    accumulate_words(1000) # warm up
+    small = accumulate_words(10000)
+    large = accumulate_words(40000)
+    assert large < small * 8 # quadratic work would take 16 times as long
@@ -0,0 +1,113 @@
+import threading
+import time
+import pytest
+from src.character_manager import Character
+from src.llm.sentence import Sentence
+from src.llm.sentence_content import SentenceContent, SentenceTypeEnum
+from src.llm.sentence_queue import SentenceQueue
+
+def make_sentence(speaker: Character, text: str) -> Sentence:
+    return Sentence(SentenceContent(speaker, text, SentenceTypeEnum.SPEECH, False), "", 0)
+
+@pytest.fixture
+def queue() -> SentenceQueue:
+    return SentenceQueue()
+
+
+def test_get_returns_none_when_nothing_more_to_come(queue: SentenceQueue):
+    assert queue.get_next_sentence() is None
+
+
+def test_put_at_front_is_retrieved_first(queue: SentenceQueue, example_skyrim_npc_character: Character):
+    queue.put(make_sentence(example_skyrim_npc_character, "First"))
+    queue.put(make_sentence(example_skyrim_npc_character, "Second"))
+    queue.put_at_front(make_sentence(example_skyrim_npc_character, "Gathering thoughts"))
+
+    assert [queue.get_next_sentence().text for _ in range(3)] == ["Gathering thoughts", "First", "Second"]
+    assert queue.get_next_sentence() is None
+
+
+def test_clear_drops_sentences_of_previous_generation(queue: SentenceQueue, example_skyrim_npc_character: Character):
+    stale_generation = queue.generation
+    queue.put(make_sentence(example_skyrim_npc_character, "Stale"))
+    queue.clear()
+    assert queue.generation != stale_generation
+
+    queue.put(make_sentence(example_skyrim_npc_character, "Late and stale"), stale_generation)
+    queue.put(make_sentence(example_skyrim_npc_character, "Fresh"), queue.generation)
+
+    assert queue.get_next_sentence().text == "Fresh"
+    assert queue.get_next_sentence() is None
+
+
+def test_finish_generation_ignores_outdated_generation(queue: SentenceQueue):
+    stale_generation = queue.generation
+    queue.clear()
+    queue.is_more_to_come = True
+
+    queue.finish_generation(stale_generation)
+    assert queue.is_more_to_come
+
+    queue.finish_generation(queue.generation)
+    assert not queue.is_more_to_come
+
+
+def test_get_times_out(queue: SentenceQueue):
+    queue.is_more_to_come = True
+    start = time.time()
+    assert queue.get_next_sentence(timeout=0.1) is None
+    assert 0.1 <= time.time() - start < 0.5
+
+
+def test_waiting_get_wakes_up_when_nothing_more_to_come(queue: SentenceQueue):
+    queue.is_more_to_come = True
+    results = []
+    consumer = threading.Thread(target=lambda: results.append(queue.get_next_sentence()))
+    consumer.start()
+    time.sleep(0.05)
+    queue.is_more_to_come = False
+    consumer.join(1)
+
+    assert not consumer.is_alive()
+    assert results == [None]
+
+
+def test_concurrent_producers_and_consumers(queue: SentenceQueue, example_skyrim_npc_character: Character):
+    """Stress test: every sentence is retrieved exactly once and the order of each producer is kept"""
+    producer_count = 4
+    consumer_count = 4
+    sentences_per_producer = 2000
+    queue.is_more_to_come = True
+
+    def produce(producer_id: int):
+        for i in range(sentences_per_producer):
+            queue.put(make_sentence(example_skyrim_npc_character, f"{producer_id}:{i}"))
+
+    consumed: list[list[str]] = [[] for _ in range(consumer_count)]
+    def consume(consumer_id: int):
+        while True:
+            sentence = queue.get_next_sentence(timeout=5)
+            if not sentence:
+                return
+            consumed[consumer_id].append(sentence.text)
+
+    producers = [threading.Thread(target=produce, args=[i]) for i in range(producer_count)]
+    consumers = [threading.Thread(target=consume, args=[i]) for i in range(consumer_count)]
+    for thread in producers + consumers:
+        thread.start()
+    for producer in producers:
+        producer.join()
+    queue.is_more_to_come = False
+    for consumer in consumers:
+        consumer.join(5)
+
+    assert not any(consumer.is_alive() for consumer in consumers)
+    all_consumed = [text for texts in consumed for text in texts]
+    assert len(all_consumed) == producer_count * sentences_per_producer
+    assert len(set(all_consumed)) == len(all_consumed)
+    for texts in consumed: # each consumer sees the sentences of one producer in the order they were put
+        last_index: dict[str, int] = {}
+        for text in texts:
+            producer_id, index = text.split(":")
+            assert int(index) > last_index.get(producer_id, -1)
+            last_index[producer_id] = int(index)
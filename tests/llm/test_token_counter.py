@@ -0,0 +1,83 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+from src.config.config_loader import ConfigLoader
+from src.llm.llm_client import LLMClient
+from src.llm.messages import UserMessage
+from src.llm.token_counter import ModelTokenizerCounter, TokenEstimator
+
+PROMPT_TOKENS = 30
+
+class UsageHandler(BaseHTTPRequestHandler):
+    """Replies to every request and reports PROMPT_TOKENS prompt tokens"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"id": "1", "object": "chat.completion", "created": 0, "model": "local-model",
+                           "choices": [{"index": 0, "message": {"role": "assistant", "content": "Hello there."}, "finish_reason": "stop"}],
+                           "usage": {"prompt_tokens": PROMPT_TOKENS, "completion_tokens": 3, "total_tokens": PROMPT_TOKENS + 3}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_estimator_counts_characters_and_words():
+    estimator = TokenEstimator()
+    assert estimator.count("") == 0
+    assert estimator.count("abcdefgh") == 2
+    assert estimator.count("a b c d") == 4 # every word is at least one token
+    assert not estimator.is_calibrated
+
+
+def test_estimator_calibration():
+    estimator = TokenEstimator()
+    name = estimator.name
+    estimator.calibrate(300, 100)
+    assert estimator.is_calibrated
+    assert estimator.chars_per_token == 3.0 # the first calibration is taken as it is
+    assert estimator.name != name # cached counts of the old estimate are counted again
+    estimator.calibrate(500, 100)
+    assert estimator.chars_per_token == 3.6
+    estimator.calibrate(100, 0) # nothing to learn from
+    assert estimator.chars_per_token == 3.6
+    estimator.calibrate(10000, 1)
+    assert estimator.chars_per_token <= TokenEstimator.MAX_CHARS_PER_TOKEN
+
+
+def test_prompt_tokens_from_usage():
+    assert TokenEstimator.get_prompt_tokens({"prompt_tokens": 12}) == 12
+    assert TokenEstimator.get_prompt_tokens({"completion_tokens": 12}) is None
+
+
+def test_no_tokenizer_for_names_without_organisation():
+    assert not ModelTokenizerCounter("local-model").is_available
+
+
+def test_request_call_calibrates_the_estimator(default_config: ConfigLoader):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UsageHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        default_config.llm_api = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        default_config.llm = "local-model"
+        llm_client = LLMClient(default_config, "GPT_SECRET_KEY.txt", "IMAGE_SECRET_KEY.txt")
+        assert isinstance(llm_client._token_counter, TokenEstimator)
+        message = UserMessage(default_config, "Have you heard any rumors lately? Anything about the war?", "Dragonborn")
+
+        assert llm_client.request_call(message) == "Hello there."
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    estimator: TokenEstimator = llm_client._token_counter
+    text_tokens = PROMPT_TOKENS - llm_client.MESSAGE_OVERHEAD_TOKENS - llm_client.REPLY_PRIMING_TOKENS
+    assert estimator.is_calibrated
+    assert estimator.chars_per_token == round(len(message.get_openai_message()["content"]) / text_tokens, 1)
+    assert llm_client.get_count_tokens(message) == llm_client.count_message_tokens(message)
@@ -0,0 +1,165 @@
+import json
+import os
+from pathlib import Path
+from threading import Event
+import pytest
+from src.character_manager import Character
+from src.characters_manager import Characters
+from src.config.config_loader import ConfigLoader
+from src.conversation.conversation_log import conversation_log
+from src.llm.message_thread import message_thread
+from src.llm.messages import AssistantMessage, UserMessage
+from src.llm.sentence import Sentence
+from src.llm.sentence_content import SentenceContent, SentenceTypeEnum
+from src.remember.remembering import Remembering
+from src.remember.save_queue import SaveJob, SaveJobStatusEnum, SaveQueue
+
+class RecordingRememberer(Remembering):
+    """Keeps what it would have summarized instead of calling an LLM"""
+    def __init__(self) -> None:
+        self.saved: list[tuple[list[str], list[str]]] = []
+        self.continuations: list[bool] = []
+
+    def get_prompt_text(self, npcs_in_conversation: Characters, world_id: str) -> str:
+        return ""
+
+    def save_conversation_state(self, messages: message_thread, npcs_in_conversation: Characters, world_id: str, is_reload=False, is_continuation=False):
+        self.saved.append(([npc.name for npc in npcs_in_conversation.get_all_characters()], [message.get_dict_formatted_string() for message in messages.get_talk_only()]))
+        self.continuations.append(is_continuation)
+
+def get_job(ref_id: str, name: str) -> SaveJob:
+    return SaveJob("world", [{"base_id": ref_id, "ref_id": ref_id, "name": name}], [{"role": "user", "content": "Hello"}, {"role": "assistant", "content": "Hi."}])
+
+
+def test_put_returns_before_job_is_saved(tmp_path: Path):
+    may_save = Event()
+    saved: list[str] = []
+    def save_job(job: SaveJob):
+        may_save.wait(5)
+        saved.append(job.id)
+
+    queue = SaveQueue(str(tmp_path), save_job)
+    job = get_job("1", "Lydia")
+    queue.put(job)
+    assert os.path.exists(tmp_path / f"{job.id}.json") # written to disk before it is saved
+    assert queue.is_pending("1")
+    assert queue.get_status()["pending"] == 1
+
+    may_save.set()
+    assert queue.wait(5)
+    assert saved == [job.id]
+    assert not os.path.exists(tmp_path / f"{job.id}.json")
+    assert queue.get_status()["jobs"][0]["status"] == SaveJobStatusEnum.DONE.value
+
+
+def test_waits_only_for_jobs_of_the_npc(tmp_path: Path):
+    may_save = Event()
+    queue = SaveQueue(str(tmp_path), lambda job: may_save.wait(5))
+    queue.put(get_job("1", "Lydia"))
+
+    assert queue.wait_for_characters(["2"], 0)
+    assert queue.wait_for_characters([], 0)
+    assert not queue.wait_for_characters(["2", "1"], 0.05)
+    may_save.set()
+    assert queue.wait_for_characters(["1"], 5)
+
+
+def test_jobs_left_on_disk_are_saved_on_start(tmp_path: Path):
+    job = get_job("1", "Lydia")
+    with open(tmp_path / f"{job.id}.json", 'w', encoding='utf-8') as f:
+        json.dump(job.to_dict(), f)
+
+    saved: list[SaveJob] = []
+    queue = SaveQueue(str(tmp_path), saved.append)
+    assert queue.wait(5)
+    assert [(saved_job.id, saved_job.messages) for saved_job in saved] == [(job.id, job.messages)]
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_job_stays_on_disk(tmp_path: Path):
+    def save_job(job: SaveJob):
+        raise ConnectionError("LLM not reachable")
+
+    queue = SaveQueue(str(tmp_path), save_job)
+    job = get_job("1", "Lydia")
+    queue.put(job)
+    assert queue.wait(5)
+    assert queue.get_status()["jobs"][0]["status"] == SaveJobStatusEnum.FAILED.value
+    assert os.path.exists(tmp_path / f"{job.id}.json")
+
+
+def test_saved_job_matches_conversation(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    monkeypatch.setattr(conversation_log, "game_path", str(tmp_path))
+    thread = message_thread(default_config, "Prompt")
+    user_message = UserMessage(default_config, "Have you heard any rumors?", "Dragonborn")
+    user_message.add_event(["Dragonborn drew a sword."])
+    thread.add_message(user_message)
+    assistant_message = AssistantMessage(default_config)
+    assistant_message.add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "Put that away.", SentenceTypeEnum.SPEECH), "", 0))
+    assistant_message.add_sentence(Sentence(SentenceContent(example_skyrim_npc_character, "She sighs.", SentenceTypeEnum.NARRATION), "", 0))
+    thread.add_message(assistant_message)
+
+    job = SaveJob.from_dict(json.loads(json.dumps(SaveJob.from_conversation("world", [example_skyrim_npc_character], thread).to_dict())))
+    rememberer = RecordingRememberer()
+    job.save(default_config, rememberer)
+
+    assert rememberer.saved == [([example_skyrim_npc_character.name], [message.get_dict_formatted_string() for message in thread.get_talk_only()])]
+    assert conversation_log.load_conversation_log(example_skyrim_npc_character, "world") == thread.transform_to_openai_messages(thread.get_talk_only())
+
+
+def test_job_logs_whole_conversation_but_summarizes_only_the_rest(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    monkeypatch.setattr(conversation_log, "game_path", str(tmp_path))
+    thread = message_thread(default_config, "Prompt")
+    for text in ["Hello", "Any news?", "Farewell"]:
+        thread.add_message(UserMessage(default_config, text, "Dragonborn"))
+    rest = message_thread(default_config, None)
+    rest.add_message(thread.get_talk_only()[-1])
+
+    job = SaveJob.from_conversation("world", [example_skyrim_npc_character], rest, False, thread.get_talk_only(), True)
+    job = SaveJob.from_dict(json.loads(json.dumps(job.to_dict())))
+    rememberer = RecordingRememberer()
+    job.save(default_config, rememberer)
+
+    assert rememberer.saved == [([example_skyrim_npc_character.name], [rest.get_talk_only()[0].get_dict_formatted_string()])]
+    assert rememberer.continuations == [True]
+    assert conversation_log.load_conversation_log(example_skyrim_npc_character, "world") == thread.transform_to_openai_messages(thread.get_talk_only())
+
+
+def test_before_save_can_update_job(tmp_path: Path):
+    saved: list[list] = []
+    job = get_job("1", "Lydia")
+    def before_save():
+        job.messages = job.messages[1:] # e.g. a checkpoint has saved the first message in the meantime
+    queue = SaveQueue(str(tmp_path), lambda saved_job: saved.append(saved_job.messages))
+    queue.put(job, before_save)
+    assert queue.wait(5)
+    assert saved == [[{"role": "assistant", "content": "Hi."}]]
+
+
+def test_log_is_written_once_when_summary_is_retried(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, default_config: ConfigLoader, example_skyrim_npc_character: Character):
+    monkeypatch.setattr(conversation_log, "game_path", str(tmp_path / "logs"))
+    class FailingOnceRememberer(RecordingRememberer):
+        def save_conversation_state(self, messages: message_thread, npcs_in_conversation: Characters, world_id: str, is_reload=False, is_continuation=False):
+            if not self.continuations:
+                self.continuations.append(is_continuation)
+                raise RuntimeError("LLM not reachable")
+            super().save_conversation_state(messages, npcs_in_conversation, world_id, is_reload, is_continuation)
+
+    thread = message_thread(default_config, "Prompt")
+    thread.add_message(UserMessage(default_config, "Hello", "Dragonborn"))
+    rememberer = FailingOnceRememberer()
+    queue: SaveQueue | None = None
+    def save_job(job: SaveJob):
+        job.save(default_config, rememberer, lambda: queue.save_progress(job))
+    queue = SaveQueue(str(tmp_path / "jobs"), save_job)
+    job = SaveJob.from_conversation("world", [example_skyrim_npc_character], thread)
+    queue.put(job)
+    assert queue.wait(5)
+    assert queue.get_status()["jobs"][0]["status"] == SaveJobStatusEnum.FAILED.value
+
+    with open(tmp_path / "jobs" / f"{job.id}.json", 'r', encoding='utf-8') as f:
+        retried_job = SaveJob.from_dict(json.load(f)) # as it would be run again on the next start
+    retried_job.save(default_config, rememberer)
+
+    assert len(rememberer.saved) == 1
+    assert conversation_log.load_conversation_log(example_skyrim_npc_character, "world") == thread.transform_to_openai_messages(thread.get_talk_only())
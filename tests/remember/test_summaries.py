@@ -0,0 +1,52 @@
+import pytest
+from src.character_manager import Character
+from src.characters_manager import Characters
+from src.config.config_loader import ConfigLoader
+from src.llm.llm_client import LLMClient
+from src.llm.message_thread import message_thread
+from src.llm.messages import UserMessage
+from src.llm.request_lanes import RequestLaneEnum
+from src.remember.summaries import Summaries
+
+def build_thread(config: ConfigLoader, texts: list[str]) -> message_thread:
+    thread = message_thread(config, None)
+    for text in texts:
+        thread.add_message(UserMessage(config, text, "Dragonborn"))
+    return thread
+
+
+def test_short_rest_of_checkpointed_conversation_is_summarized(default_config: ConfigLoader, default_rememberer: Summaries, llm_client: LLMClient, example_skyrim_npc_character: Character, monkeypatch):
+    requests: list[str] = []
+    replies = ["The checkpoint summary.", "The summary of the rest."]
+    def request_call(messages: message_thread, lane: RequestLaneEnum = RequestLaneEnum.BACKGROUND) -> str:
+        requests.append(messages.get_openai_messages()[-1]["content"])
+        return replies[len(requests) - 1]
+    monkeypatch.setattr(llm_client, "request_call", request_call)
+    npcs = Characters()
+    npcs.add_or_update_character(example_skyrim_npc_character)
+
+    default_rememberer.save_conversation_state(build_thread(default_config, [f"Question {i}" for i in range(6)]), npcs, "world")
+    default_rememberer.save_conversation_state(build_thread(default_config, ["Farewell"]), npcs, "world") # too short on its own
+    assert len(requests) == 1
+
+    default_rememberer.save_conversation_state(build_thread(default_config, ["Farewell"]), npcs, "world", is_continuation=True)
+    assert len(requests) == 2
+    assert "The checkpoint summary." in requests[1] and "Farewell" in requests[1]
+    prompt_text = default_rememberer.get_prompt_text(npcs, "world")
+    assert "The checkpoint summary." in prompt_text and "The summary of the rest." in prompt_text
+
+
+def test_summary_gives_up_after_max_attempts(default_config: ConfigLoader, default_rememberer: Summaries, llm_client: LLMClient, example_skyrim_npc_character: Character, monkeypatch):
+    attempts: list[int] = []
+    def request_call(messages: message_thread, lane: RequestLaneEnum = RequestLaneEnum.BACKGROUND) -> str:
+        attempts.append(len(attempts))
+        raise ConnectionError("LLM not reachable")
+    monkeypatch.setattr(llm_client, "request_call", request_call)
+    monkeypatch.setattr(Summaries, "SUMMARY_RETRY_DELAY_SECONDS", 0)
+    npcs = Characters()
+    npcs.add_or_update_character(example_skyrim_npc_character)
+
+    with pytest.raises(ConnectionError): # a queued save fails and stays on disk instead of blocking the queue
+        default_rememberer.save_conversation_state(build_thread(default_config, [f"Question {i}" for i in range(6)]), npcs, "world")
+    assert len(attempts) == Summaries.MAX_SUMMARY_ATTEMPTS
+    assert default_rememberer.get_prompt_text(npcs, "world") == ""
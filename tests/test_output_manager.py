@@ -12,6 +12,10 @@ from src.character_manager import Character
 from src.llm.sentence_content import SentenceTypeEnum, SentenceContent
 from src.llm.sentence import Sentence
 from src.conversation.action import Action
+from src.llm.llm_test_client import LLMTestClient
+from src.llm.output.delta_coalescer import delta_coalescer
+from src.turn_timeline import TurnTimeline, TurnTimelineRecorder
+import threading
 import time
 
 class MockAIClient:
@@ -108,7 +112,7 @@ async def test_process_response_api_error(output_manager: ChatManager, example_s
     """Test handling of a simulated API error during streaming"""
     output_manager._ChatManager__client.error_on_call = True
     monkeypatch.setattr("src.utils.play_error_sound", lambda *a, **kw: None)
-    monkeypatch.setattr(time, "sleep", lambda *a, **kw: None) # Skip sleeping between retries
+    monkeypatch.setattr(ChatManager, "RETRY_DELAY_SECONDS", 0) # Skip sleeping between retries
     
     await output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, mock_actions)
 
@@ -321,3 +325,289 @@ async def test_process_response_param(
 
     assert actual == expected_texts
     assert actual_types == expected_types
+
+
+@pytest.mark.asyncio
+async def test_process_response_streams_while_synthesizing(output_manager: ChatManager, example_skyrim_npc_character: Character, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action]):
+    """Test that LLM tokens keep being consumed while earlier sentences are still being voiced"""
+    tts_duration = 0.2
+    def slow_synthesize(*args, **kwargs):
+        time.sleep(tts_duration)
+        return "mock_audio_file.wav"
+    output_manager.tts.synthesize = MagicMock(side_effect=slow_synthesize)
+    client = output_manager._ChatManager__client
+    client.response_pattern = ["First ", "sentence. ", "Second ", "sentence. ", "Third ", "sentence."]
+    client.delay = 0.1
+    output_manager._ChatManager__config.number_words_tts = 1
+
+    start = time.time()
+    await output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, mock_actions)
+    elapsed = time.time() - start
+
+    output_sentences = get_sentence_list_from_queue(mock_queue)
+    assert [s.content.text.strip() for s in output_sentences] == ["First sentence.", "Second sentence.", "Third sentence.", ""]
+    # Streaming alone takes 0.6 seconds and voicing alone 0.6 seconds. Run one after another this would take 1.2 seconds
+    assert elapsed < 1.0
+
+
+def test_stop_generation_aborts_stream_immediately(output_manager: ChatManager, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action]):
+    """Test that stopping a generation does not wait for the next chunk of the LLM to arrive"""
+    client = output_manager._ChatManager__client
+    client.response_pattern = ["First sentence. ", "Second sentence."]
+    client.delay = 10 # the second chunk would only arrive after 10 seconds
+    output_manager._ChatManager__config.number_words_tts = 1
+    mock_queue.is_more_to_come = True
+
+    generation = threading.Thread(target=output_manager.generate_response, args=[mock_messages, example_characters_pc_to_npc, mock_queue, mock_actions])
+    generation.start()
+    first_sentence = mock_queue.get_next_sentence()
+    assert first_sentence.content.text.strip() == "First sentence."
+
+    start = time.time()
+    output_manager.stop_generation()
+    elapsed = time.time() - start
+    generation.join(1)
+
+    assert elapsed < 0.5
+    assert not generation.is_alive()
+    assert not mock_queue.is_more_to_come
+    assert [s.content.text for s in get_sentence_list_from_queue(mock_queue)] == [""]
+
+
+def test_stop_generation_drops_pending_synthesis(output_manager: ChatManager, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action]):
+    """Test that sentences still waiting for TTS are not voiced once the generation has been stopped"""
+    synthesis_started = threading.Event()
+    def slow_synthesize(*args, **kwargs):
+        synthesis_started.set()
+        time.sleep(0.3)
+        return "mock_audio_file.wav"
+    output_manager.tts.synthesize = MagicMock(side_effect=slow_synthesize)
+    client = output_manager._ChatManager__client
+    client.response_pattern = ["First sentence. ", "Second sentence. ", "Third sentence. ", "Fourth sentence."]
+    client.delay = 0
+    output_manager._ChatManager__config.number_words_tts = 1
+    mock_queue.is_more_to_come = True
+
+    generation = threading.Thread(target=output_manager.generate_response, args=[mock_messages, example_characters_pc_to_npc, mock_queue, mock_actions])
+    generation.start()
+    synthesis_started.wait(1)
+    start = time.time()
+    output_manager.stop_generation()
+    elapsed = time.time() - start
+    generation.join(1)
+
+    assert elapsed < 0.2 # does not wait for the running synthesis to finish
+    time.sleep(0.5) # give a wrongly continuing pipeline the chance to voice more sentences
+    assert output_manager.tts.synthesize.call_count == 1
+    assert [s.content.text for s in get_sentence_list_from_queue(mock_queue)] == [""]
+
+
+def test_generations_share_one_event_loop(output_manager: ChatManager, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action]):
+    """Test that consecutive generations run on the same long-lived event loop instead of a new one per turn"""
+    client = output_manager._ChatManager__client
+    original_streaming_call = client.streaming_call
+    loops = []
+    async def recording_streaming_call(*args, **kwargs):
+        loops.append(asyncio.get_running_loop())
+        async for chunk in original_streaming_call(*args, **kwargs):
+            yield chunk
+    client.streaming_call = recording_streaming_call
+
+    for _ in range(2):
+        cancellation = output_manager.start_generation(mock_messages, example_characters_pc_to_npc, mock_queue, mock_actions)
+        assert mock_queue.is_more_to_come
+        output_sentences = get_sentence_list_from_queue(mock_queue)
+        assert cancellation.wait_until_finished(1)
+        assert [s.content.text.strip() for s in output_sentences] == ["Hello there.", ""]
+
+    assert len(loops) == 2
+    assert loops[0] is loops[1]
+    assert not loops[0].is_closed()
+
+
+@pytest.mark.parametrize("words_per_sentence", [12, None])
+def test_process_response_long_stream_benchmark(default_config: ConfigLoader, piper: Piper, example_skyrim_npc_character: Character, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, monkeypatch, words_per_sentence: int | None):
+    """Micro-benchmark: stream 10k tokens through process_response, with regular sentence ends and without any at all"""
+    token_count = 10000
+    if words_per_sentence:
+        words = [f"word{i}." if (i + 1) % words_per_sentence == 0 else f"word{i}" for i in range(token_count)]
+    else:
+        words = [f"word{i}" for i in range(token_count)]
+    piper.synthesize = MagicMock(return_value="mock_audio_file.wav")
+    monkeypatch.setattr('src.utils.get_audio_duration', lambda *args, **kwargs: 1.0)
+    default_config.max_response_sentences_single = token_count
+    default_config.number_words_tts = 1
+    output_manager = ChatManager(default_config, piper, LLMTestClient([" ".join(words)]))
+
+    start = time.perf_counter()
+    asyncio.run(output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, []))
+    elapsed = time.perf_counter() - start
+
+    output_sentences = get_sentence_list_from_queue(mock_queue)
+    expected_sentence_count = token_count // words_per_sentence if words_per_sentence else 0
+    assert len(output_sentences) == expected_sentence_count + 1
+    assert elapsed < 10
+
+
+@pytest.mark.asyncio
+async def test_process_response_early_clause_cut_lowers_first_audio_latency(output_manager: ChatManager, example_skyrim_npc_character: Character, example_characters_pc_to_npc: Characters, mock_messages: message_thread, mock_actions: list[Action]):
+    """Benchmark: with early clause cut the first voiceline is ready as soon as the first clause has been streamed instead of the whole sentence"""
+    client = output_manager._ChatManager__client
+    client.response_pattern = ["Well", " met", " traveller", " of", " the", " north,", " it", " is", " rather", " cold", " in", " these", " parts", " today", " my", " friend.", " Stay", " warm."]
+    client.delay = 0.05
+    config = output_manager._ChatManager__config
+    config.number_words_tts = 3
+    config.early_clause_cut_min_words = 4
+
+    latencies: dict[bool, float] = {}
+    texts: dict[bool, list[str]] = {}
+    for early_clause_cut in [False, True]:
+        config.early_clause_cut = early_clause_cut
+        queue = SentenceQueue()
+        await output_manager.process_response(example_skyrim_npc_character, queue, mock_messages, example_characters_pc_to_npc, mock_actions)
+        latencies[early_clause_cut] = output_manager.first_audio_latency
+        texts[early_clause_cut] = [s.content.text.strip() for s in get_sentence_list_from_queue(queue)]
+
+    assert texts[False] == ["Well met traveller of the north, it is rather cold in these parts today my friend.", "Stay warm.", ""]
+    assert texts[True] == ["Well met traveller of the north,", "it is rather cold in these parts today my friend.", "Stay warm.", ""]
+    # The first clause is complete after 6 of the 16 chunks of the first sentence
+    assert latencies[True] < latencies[False] - 0.3
+
+
+@pytest.mark.asyncio
+async def test_process_response_synthesizes_speakers_in_parallel(default_config: ConfigLoader, piper: Piper, example_skyrim_npc_character: Character, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action], monkeypatch):
+    """Test that the lines of different speakers are voiced on separate TTS workers at the same time and still published in order"""
+    second_npc = Character('1', '1', 'Lydia', 1, '[Race <NordRace (00013746)>]', False, 'You are Lydia.', False, False, 0, False,
+                           'FemaleEvenToned', 'FemaleEvenToned', 'FemaleEvenToned', 'FemaleEvenToned', 'en', None, None)
+    example_characters_pc_to_npc.add_or_update_character(second_npc)
+    tts_duration = 0.2
+    def slow_synthesize(*args, **kwargs):
+        time.sleep(tts_duration)
+        return "mock_audio_file.wav"
+    piper.synthesize = MagicMock(side_effect=slow_synthesize)
+    worker_tts = MagicMock()
+    worker_tts.synthesize = MagicMock(side_effect=slow_synthesize)
+    monkeypatch.setattr('src.utils.get_audio_duration', lambda *args, **kwargs: 1.0)
+    default_config.number_words_tts = 1
+    default_config.max_response_sentences_multi = 10
+    default_config.tts_parallel_workers = 2
+    client = MockAIClient(["Guard: Halt there. ", "Lydia: I am sworn to carry your burdens. ", "Guard: Move along. ", "Lydia: As you wish. "], delay=0)
+    output_manager = ChatManager(default_config, piper, client, tts_factory=lambda worker_id: worker_tts)
+
+    start = time.time()
+    await output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, mock_actions)
+    elapsed = time.time() - start
+
+    output_sentences = get_sentence_list_from_queue(mock_queue)
+    assert [(s.content.speaker.name, s.content.text.strip()) for s in output_sentences] == [
+        ("Guard", "Halt there."), ("Lydia", "I am sworn to carry your burdens."), ("Guard", "Move along."), ("Lydia", "As you wish."), ("Guard", "")]
+    assert piper.synthesize.call_count == 2
+    assert worker_tts.synthesize.call_count == 2
+    # Voiced one after another the four lines would take 0.8 seconds
+    assert elapsed < 0.6
+
+
+def test_preload_voice_runs_on_tts_worker_of_the_voice(default_config: ConfigLoader, piper: Piper, example_skyrim_npc_character: Character, mock_ai_client: MockAIClient, monkeypatch):
+    """Test that a preloaded voice is loaded on the TTS worker that later voices the lines of the character"""
+    used_threads: list[tuple[str, str]] = []
+    def record(name: str, result=None):
+        def called(*args, **kwargs):
+            used_threads.append((name, threading.current_thread().name))
+            return result
+        return called
+    other_tts = MagicMock()
+    other_tts.change_voice = MagicMock(side_effect=record("other change_voice"))
+    piper.change_voice = MagicMock(side_effect=record("change_voice"))
+    piper.synthesize = MagicMock(side_effect=record("synthesize", "mock_audio_file.wav"))
+    monkeypatch.setattr('src.utils.get_audio_duration', lambda *args, **kwargs: 1.0)
+    default_config.tts_parallel_workers = 2
+    output_manager = ChatManager(default_config, piper, mock_ai_client, tts_factory=lambda worker_id: other_tts)
+
+    output_manager.preload_voice(example_skyrim_npc_character).result()
+    output_manager.generate_sentence(SentenceContent(example_skyrim_npc_character, "Halt there.", SentenceTypeEnum.SPEECH))
+
+    assert [name for name, _ in used_threads] == ["change_voice", "synthesize"]
+    assert used_threads[0][1] == used_threads[1][1] != threading.current_thread().name
+    piper.change_voice.assert_called_once_with(example_skyrim_npc_character.tts_voice_model, example_skyrim_npc_character.in_game_voice_model, example_skyrim_npc_character.csv_in_game_voice_model,
+                                               example_skyrim_npc_character.advanced_voice_model, example_skyrim_npc_character.voice_accent,
+                                               voice_gender=example_skyrim_npc_character.gender, voice_race=example_skyrim_npc_character.race)
+
+
+@pytest.mark.asyncio
+async def test_process_response_marks_only_first_line_of_response(default_config: ConfigLoader, piper: Piper, example_skyrim_npc_character: Character, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action], monkeypatch):
+    """Test that only the first line of a response is synthesized as such, even if the lines are voiced on several TTS workers at once"""
+    second_npc = Character('1', '1', 'Lydia', 1, '[Race <NordRace (00013746)>]', False, 'You are Lydia.', False, False, 0, False,
+                           'FemaleEvenToned', 'FemaleEvenToned', 'FemaleEvenToned', 'FemaleEvenToned', 'en', None, None)
+    example_characters_pc_to_npc.add_or_update_character(second_npc)
+    first_lines: dict[str, bool] = {}
+    def synthesize(voice, text, *args):
+        time.sleep(0.05)
+        first_lines[text.strip()] = args[3].is_first_line_of_response
+        return "mock_audio_file.wav"
+    piper.synthesize = MagicMock(side_effect=synthesize)
+    worker_tts = MagicMock()
+    worker_tts.synthesize = MagicMock(side_effect=synthesize)
+    monkeypatch.setattr('src.utils.get_audio_duration', lambda *args, **kwargs: 1.0)
+    default_config.number_words_tts = 1
+    default_config.max_response_sentences_multi = 10
+    default_config.tts_parallel_workers = 2
+    client = MockAIClient(["Guard: Halt there. ", "Lydia: I am sworn to carry your burdens. ", "Guard: Move along. "], delay=0)
+    output_manager = ChatManager(default_config, piper, client, tts_factory=lambda worker_id: worker_tts)
+
+    await output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, mock_actions)
+
+    assert first_lines == {"Halt there.": True, "I am sworn to carry your burdens.": False, "Move along.": False}
+
+@pytest.mark.asyncio
+async def test_process_response_voices_text_held_back_at_end_of_stream(output_manager: ChatManager, example_skyrim_npc_character: Character, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action], monkeypatch):
+    """Test that output the delta coalescer still holds back when the stream ends gets voiced"""
+    # a coalescer without triggers or budget holds back the whole response until the end of the stream
+    monkeypatch.setattr('src.output_manager.delta_coalescer', lambda *args, **kwargs: delta_coalescer(['\0'], max_delay=60, max_chars=10000))
+    client = output_manager._ChatManager__client
+    client.response_pattern = ["Hello there. ", "How are", " you?"]
+    output_manager._ChatManager__config.number_words_tts = 1
+
+    await output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, mock_actions)
+
+    output_sentences = get_sentence_list_from_queue(mock_queue)
+    assert [s.content.text.strip() for s in output_sentences] == ["Hello there.", "How are you?", ""]
+
+@pytest.mark.asyncio
+async def test_process_response_records_turn_timeline(output_manager: ChatManager, example_skyrim_npc_character: Character, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action]):
+    """Test that a response records its milestones in the timeline of the current turn"""
+    client = output_manager._ChatManager__client
+    client.response_pattern = ["Hello there. ", "How are you?"]
+    output_manager._ChatManager__config.number_words_tts = 1
+    turn = TurnTimelineRecorder.get_shared().start_turn(TurnTimeline.PLAYER_INPUT_RECEIVED)
+
+    await output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, mock_actions)
+
+    assert TurnTimelineRecorder.get_shared().current_turn is turn
+    events = [event["event"] for event in turn.to_dict()["events"]]
+    assert events[:3] == ["player_input_received", "request_sent", "first_token"]
+    assert events.count("sentence_cut") == 2
+    assert events.count("tts_start") == 2 and events.count("tts_end") == 2
+    assert events[-1] == "response_finished"
+    assert {"llm_first_token", "first_sentence_cut", "first_tts", "first_audio", "response"} <= turn.get_breakdown().keys()
+
+    # a follow-up response without new player input gets a turn of its own
+    await output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, mock_actions)
+    assert TurnTimelineRecorder.get_shared().current_turn.trigger == TurnTimeline.GENERATION_STARTED
+
+
+@pytest.mark.asyncio
+async def test_synthesis_gets_timeline_of_its_own_turn(output_manager: ChatManager, piper: Piper, example_skyrim_npc_character: Character, example_characters_pc_to_npc: Characters, mock_queue: SentenceQueue, mock_messages: message_thread, mock_actions: list[Action]):
+    """Test that the TTS records into the turn of the response, even if the next turn has started while it is still synthesizing"""
+    output_manager._ChatManager__client.response_pattern = ["Hello there. ", "How are you?"]
+    output_manager._ChatManager__config.number_words_tts = 1
+    turn = TurnTimelineRecorder.get_shared().start_turn(TurnTimeline.PLAYER_INPUT_RECEIVED)
+    timelines: list[TurnTimeline | None] = []
+    def synthesize(voice, text, *args):
+        timelines.append(args[3].timeline)
+        TurnTimelineRecorder.get_shared().start_turn(TurnTimeline.PLAYER_INPUT_RECEIVED) # the player has already said something new
+        return "mock_audio_file.wav"
+    piper.synthesize = MagicMock(side_effect=synthesize)
+
+    await output_manager.process_response(example_skyrim_npc_character, mock_queue, mock_messages, example_characters_pc_to_npc, mock_actions)
+
+    assert timelines == [turn, turn]
@@ -0,0 +1,50 @@
+import json
+import time
+from src.turn_timeline import TurnTimeline, TurnTimelineRecorder
+
+
+def test_breakdown_measures_to_first_occurrence():
+    timeline = TurnTimeline(1, TurnTimeline.PLAYER_INPUT_RECEIVED)
+    timeline.record(TurnTimeline.REQUEST_SENT)
+    time.sleep(0.02)
+    timeline.record(TurnTimeline.FIRST_TOKEN)
+    timeline.record(TurnTimeline.SENTENCE_CUT, text="Hello.")
+    timeline.record(TurnTimeline.SENTENCE_CUT, text="Goodbye.")
+
+    breakdown = timeline.get_breakdown()
+
+    assert breakdown["llm_first_token"] >= 20
+    assert breakdown["first_sentence_cut"] >= breakdown["llm_first_token"]
+    assert "first_audio" not in breakdown # has not happened yet
+    events = timeline.to_dict()["events"]
+    assert [event["event"] for event in events] == ["player_input_received", "request_sent", "first_token", "sentence_cut", "sentence_cut"]
+    assert events[3]["text"] == "Hello."
+
+
+def test_recorder_keeps_only_most_recent_turns():
+    recorder = TurnTimelineRecorder(capacity=3)
+    recorder.record(TurnTimeline.REQUEST_SENT) # no turn yet, nothing to record to
+
+    for _ in range(5):
+        recorder.start_turn(TurnTimeline.PLAYER_INPUT_RECEIVED)
+        recorder.record(TurnTimeline.REQUEST_SENT)
+
+    assert [timeline.turn_id for timeline in recorder.get_turns()] == [3, 4, 5]
+    assert [timeline.turn_id for timeline in recorder.get_turns(2)] == [4, 5]
+    assert recorder.get_turn(1) is None
+    assert recorder.current_turn.turn_id == 5
+    assert recorder.current_turn.has_event(TurnTimeline.REQUEST_SENT)
+
+
+def test_dump_jsonl_appends_one_line_per_turn(tmp_path):
+    recorder = TurnTimelineRecorder()
+    recorder.start_turn(TurnTimeline.PLAYER_INPUT_RECEIVED)
+    recorder.start_turn(TurnTimeline.GENERATION_STARTED)
+    file_path = str(tmp_path / "data" / "turn_timelines.jsonl")
+
+    assert recorder.dump_jsonl(file_path) == 2
+    assert recorder.dump_jsonl(file_path) == 2
+
+    with open(file_path, encoding='utf-8') as file:
+        lines = [json.loads(line) for line in file]
+    assert [line["trigger"] for line in lines] == ["player_input_received", "generation_started"] * 2
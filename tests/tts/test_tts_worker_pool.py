@@ -0,0 +1,64 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from src.tts.tts_worker_pool import TTSWorkerPool
+
+
+def test_single_worker_without_factory():
+    tts = MagicMock()
+    pool = TTSWorkerPool(tts, None, 4)
+
+    results = [pool.submit(voice, lambda used_tts: used_tts).result() for voice in ["A", "B", "C"]]
+
+    assert results == [tts, tts, tts]
+    assert pool.worker_count == 1
+
+
+def test_voices_stick_to_their_worker():
+    created = []
+    def factory(worker_id: int):
+        created.append(worker_id)
+        return MagicMock(name=f"worker{worker_id}")
+    main_tts = MagicMock(name="worker0")
+    pool = TTSWorkerPool(main_tts, factory, 2)
+
+    used = [pool.submit(voice, lambda tts: tts).result() for voice in ["A", "B", "A", "B", "A"]]
+
+    assert used[0] is main_tts and used[2] is main_tts and used[4] is main_tts
+    assert used[1] is used[3] and used[1] is not main_tts
+    assert created == [1]
+
+
+def test_different_voices_synthesize_at_the_same_time():
+    pool = TTSWorkerPool(MagicMock(), lambda worker_id: MagicMock(), 2)
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+    def slow_synthesis(tts):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.1)
+        with lock:
+            running -= 1
+
+    start = time.time()
+    futures = [pool.submit(voice, slow_synthesis) for voice in ["A", "B", "A", "B"]]
+    for future in futures:
+        future.result()
+
+    assert max_running == 2
+    assert time.time() - start < 0.35
+
+
+def test_failing_worker_falls_back_to_remaining_workers():
+    main_tts = MagicMock()
+    def failing_factory(worker_id: int):
+        raise RuntimeError("piper.exe not found")
+    pool = TTSWorkerPool(main_tts, failing_factory, 2)
+
+    assert pool.submit("A", lambda tts: tts).result() is main_tts
+    assert pool.submit("B", lambda tts: tts).result() is main_tts
+    assert pool.worker_count == 1
+    assert pool.max_workers == 1